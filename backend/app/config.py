@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 from pydantic import field_validator
-from typing import Annotated, List, Union
+from typing import Annotated, Dict, List, Union
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,100 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str
     GEMINI_MODEL: str = "gemini-flash-latest"
 
+    # Routage entre niveaux de modèles (principal / rapide)
+    GEMINI_FAST_MODEL: str = "gemini-flash-lite-latest"
+    MODEL_ROUTING_ENABLED: bool = True
+    # Essai gratuit (/free-analysis) sur le niveau rapide
+    FREE_TRIAL_FAST_TIER: bool = True
+    # Budget de latence (secondes) par cas d'usage : au-delà de la latence prévue, autre niveau
+    MODEL_LATENCY_BUDGETS: Dict[str, float] = {
+        "compare": 60.0,
+        "requirements": 30.0,
+        "questions": 20.0,
+        "analysis": 30.0,
+    }
+    MODEL_MAX_ERROR_RATE: float = 0.3
+    MODEL_ROUTING_MIN_SAMPLES: int = 5
+    # Échantillons de santé expirés au-delà : un modèle dégradé se rétablit
+    MODEL_HEALTH_WINDOW_SECONDS: float = 300.0
+
+    # Cache des résultats IA (LRU mémoire + Redis)
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_TTL_SECONDS: int = 24 * 3600
+    AI_CACHE_MAX_ENTRIES: int = 256
+
+    # Comparaison en deux étapes : exigences de l'offre extraites une fois, puis matching
+    COMPARISON_TWO_STAGE: bool = False
+    OFFER_REQUIREMENTS_TTL_SECONDS: int = 7 * 24 * 3600
+    # Nombre maximal de questions d'entretien par génération (imposé côté serveur)
+    INTERVIEW_MAX_QUESTIONS: int = 20
+    # Questions d'entretien réutilisées pour un même CV / offre / nombre de questions
+    INTERVIEW_QUESTIONS_TTL_SECONDS: int = 7 * 24 * 3600
+    # Pré-génération des questions après une comparaison (basse priorité)
+    SPECULATIVE_QUESTIONS_ENABLED: bool = True
+    SPECULATIVE_QUESTIONS_COUNT: int = 5
+    SPECULATIVE_MAX_TASKS: int = 2
+    # Part maximale des créneaux du limiteur occupés pour démarrer une pré-génération
+    SPECULATIVE_MAX_LOAD: float = 0.5
+    SPECULATIVE_START_TIMEOUT: float = 60.0
+
+    # Limiteur des appels Gemini (par processus)
+    MAX_CONCURRENT_REQUESTS: int = 10
+    LLM_MAX_QUEUE: int = 50
+    LLM_QUEUE_TIMEOUT: float = 30.0
+    SSE_TIMEOUT: int = 300  # délai max d'un appel modèle (secondes)
+
+    # Diffusion SSE des comparaisons
+    SSE_ITEM_DELAY_MS: int = 0  # pause entre deux trames d'items (0 = aucune)
+    SSE_COMBINED_ITEMS: bool = False
+    SSE_MAX_BATCH_ITEMS: int = 20
+    SSE_HEARTBEAT_SECONDS: float = 15.0  # commentaire SSE pendant les attentes
+    # Jobs reprenables : trames conservées par job et durée de rétention
+    STREAM_JOB_MAX_EVENTS: int = 500
+    STREAM_JOB_TTL_SECONDS: int = 900
+    # Job sans client pendant ce délai : annulé avec son appel Gemini
+    JOB_ORPHAN_GRACE_SECONDS: float = 30.0
+    # File de jobs : "local" (tâche du processus web) ou "redis" (python -m app.worker)
+    JOB_QUEUE_BACKEND: str = "local"
+    JOB_WORKER_CONCURRENCY: int = 10
+    # Workers : publication de leur état (limiteur, disjoncteur, métriques) dans Redis
+    JOB_WORKER_REPORT_SECONDS: float = 5.0
+    # Admission (mode redis) : jobs en attente tolérés par créneau de worker avant 503
+    JOB_QUEUE_MAX_BACKLOG_PER_SLOT: float = 1.0
+
+    # Persistance différée de l'historique (INSERT par lots)
+    PERSIST_QUEUE_MAX_SIZE: int = 1000
+    PERSIST_BATCH_SIZE: int = 100
+    PERSIST_FLUSH_INTERVAL: float = 0.5
+    PERSIST_MAX_RETRIES: int = 5
+    PERSIST_RETRY_BASE_DELAY: float = 0.5
+    PERSIST_RETRY_MAX_DELAY: float = 10.0
+
+    # Résilience des appels Gemini (retries, hedging, disjoncteur)
+    LLM_ATTEMPT_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_COOLDOWN_SECONDS: float = 30.0
+
+    # Tarifs Gemini (USD par million de tokens) pour l'estimation des coûts
+    LLM_INPUT_PRICE_PER_MTOK: float = 0.30
+    LLM_OUTPUT_PRICE_PER_MTOK: float = 2.50
+    LLM_CACHED_INPUT_PRICE_PER_MTOK: float = 0.075
+
+    # Budget (tokens estimés) par document inséré dans un prompt, après compression
+    PROMPT_DOCUMENT_TOKENS: int = 3000
+    # Offres plus longues : découpées en morceaux comparés en parallèle (map-reduce)
+    COMPARISON_MAX_CHUNKS: int = 4
+
+    # Comparaisons en lot (/compare-batch, /compare-offers)
+    BATCH_MAX_CVS: int = 50
+    BATCH_MAX_OFFERS: int = 30
+    BATCH_CONCURRENCY: int = 4
+
     # Google OAuth (connexion utilisateurs)
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
@@ -6,13 +6,20 @@ from fastapi.middleware.gzip import GZipMiddleware
 
 from app.config import settings
 from app.db import init_db
-from app.routers import auth, compare, comparisons, free_analysis, health, interview, interviews, upload
+from app.routers import auth, compare, comparisons, free_analysis, health, interview, interviews, jobs, upload
+from app.services.interview_service import cancel_question_pregeneration
+from app.services.persistence_queue import persistence_queue
+from app.services.stream_jobs import cancel_stream_jobs
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     init_db()
     yield
+    cancel_question_pregeneration()
+    cancel_stream_jobs()
+    # Historique en attente écrit avant l'arrêt
+    persistence_queue.close()
 
 
 app = FastAPI(
@@ -40,3 +47,4 @@ app.include_router(comparisons.router, prefix="/api", tags=["comparisons"])
 app.include_router(free_analysis.router, prefix="/api", tags=["free-analysis"])
 app.include_router(interview.router, prefix="/api", tags=["interview"])
 app.include_router(interviews.router, prefix="/api", tags=["interviews"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
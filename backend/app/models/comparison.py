@@ -1,18 +1,98 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, model_validator
+from typing import Annotated, Any, Dict, List, Literal, Optional
+
+ComparisonStatus = Literal["match", "missing", "unclear"]
+
+
+# Normalisations appliquées pendant la validation (un seul passage par item)
+def _clean_text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def _optional_text(value: Any) -> Optional[str]:
+    return str(value).strip() or None if value else None
+
+
+def _status(value: Any) -> str:
+    status = str(value or "missing").lower().strip()
+    return status if status in {"match", "missing", "unclear"} else "missing"
+
+
+def _confidence(value: Any) -> float:
+    try:
+        confidence = float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, min(1.0, confidence))
+
+
+def _suggestions(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(s).strip() for s in value if str(s).strip()][:3]
+
 
 class ComparisonRequest(BaseModel):
     offer_text: str
     cv_text: str
+    mode: Optional[str] = None  # "fast" : moteur lexical local, sans appel Gemini
 
-class ComparisonItem(BaseModel):
+class OfferRequirement(BaseModel):
+    """Exigence extraite de l'offre (schéma de réponse Gemini)."""
+    category: Annotated[str, BeforeValidator(lambda v: str(v or "autres"))] = "autres"
+    offerText: Annotated[str, BeforeValidator(_clean_text), Field(min_length=1)]
+
+    model_config = ConfigDict(json_schema_extra={"required": ["category", "offerText"]})
+
+class RequirementEvaluation(BaseModel):
+    """Évaluation d'une exigence dans le CV : statut normalisé, confiance bornée."""
+    cvText: Annotated[Optional[str], BeforeValidator(_optional_text)] = None
+    status: Annotated[ComparisonStatus, BeforeValidator(_status)] = "missing"
+    confidence: Annotated[float, BeforeValidator(_confidence)] = Field(
+        default=0.0, json_schema_extra={"minimum": 0, "maximum": 1}
+    )
+    suggestions: Annotated[Optional[List[str]], BeforeValidator(_suggestions)] = None
+
+    model_config = ConfigDict(
+        json_schema_extra={"required": ["cvText", "status", "confidence", "suggestions"]}
+    )
+
+    @model_validator(mode="after")
+    def _drop_match_suggestions(self):
+        if self.status == "match" or not self.suggestions:
+            self.suggestions = None
+        return self
+
+class ComparisonItemDraft(RequirementEvaluation, OfferRequirement):
+    """Item tel que produit par le modèle, avant attribution de l'id."""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "required": ["category", "offerText", "cvText", "status", "confidence", "suggestions"]
+        }
+    )
+
+class ComparisonItem(ComparisonItemDraft):
     id: str
-    category: str
-    offerText: str
-    cvText: Optional[str] = None
-    status: str  # 'match', 'missing', 'unclear'
-    confidence: float
-    suggestions: Optional[List[str]] = None
+
+class RequirementMatch(RequirementEvaluation):
+    """Étape 2 du mode deux étapes : évaluation rattachée à l'exigence par index."""
+    index: int
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "required": ["index", "cvText", "status", "confidence", "suggestions"]
+        }
+    )
+
+# Enveloppes des réponses JSON de Gemini (response_schema)
+class ComparisonDraft(BaseModel):
+    items: List[ComparisonItemDraft]
+
+class OfferRequirementsDraft(BaseModel):
+    requirements: List[OfferRequirement]
+
+class RequirementMatchesDraft(BaseModel):
+    items: List[RequirementMatch]
 
 class CategoryStats(BaseModel):
     description: str
@@ -33,4 +113,4 @@ class ComparisonSummary(BaseModel):
 
 class ComparisonResponse(BaseModel):
     items: List[ComparisonItem]
-    summary: ComparisonSummary 
\ No newline at end of file
+    summary: ComparisonSummary
@@ -0,0 +1,71 @@
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+from typing import Annotated, Any, List, Literal
+
+SuggestionPriority = Literal["haute", "moyenne", "basse"]
+
+
+def _clean_text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def _score(value: Any) -> int:
+    try:
+        score = round(float(value))
+    except (TypeError, ValueError):
+        return 0
+    return max(0, min(10, score))
+
+
+def _priority(value: Any) -> str:
+    priority = str(value or "").lower().strip()
+    return priority if priority in {"haute", "moyenne", "basse"} else "moyenne"
+
+
+def _text_list(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+class InterviewQuestion(BaseModel):
+    text: Annotated[str, BeforeValidator(_clean_text), Field(min_length=1)]
+    category: Annotated[str, BeforeValidator(lambda v: str(v or "Général"))] = "Général"
+
+    model_config = ConfigDict(json_schema_extra={"required": ["text", "category"]})
+
+class InterviewSuggestion(BaseModel):
+    titre: Annotated[str, BeforeValidator(_clean_text)]
+    description: Annotated[str, BeforeValidator(_clean_text)] = ""
+    priorite: Annotated[SuggestionPriority, BeforeValidator(_priority)] = "moyenne"
+
+    model_config = ConfigDict(
+        json_schema_extra={"required": ["titre", "description", "priorite"]}
+    )
+
+class InterviewAdvice(BaseModel):
+    question: Annotated[str, BeforeValidator(_clean_text)] = ""
+    conseil: Annotated[str, BeforeValidator(_clean_text)]
+
+    model_config = ConfigDict(json_schema_extra={"required": ["question", "conseil"]})
+
+class InterviewAnalysis(BaseModel):
+    """Analyse des réponses d'entretien (schéma de réponse Gemini, score sur 10)."""
+    score_global: Annotated[int, BeforeValidator(_score)] = Field(
+        json_schema_extra={"minimum": 0, "maximum": 10}
+    )
+    points_forts: Annotated[List[str], BeforeValidator(_text_list)] = []
+    points_amelioration: Annotated[List[str], BeforeValidator(_text_list)] = []
+    suggestions: List[InterviewSuggestion] = []
+    conseils_specifiques: List[InterviewAdvice] = []
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "required": [
+                "score_global",
+                "points_forts",
+                "points_amelioration",
+                "suggestions",
+                "conseils_specifiques",
+            ]
+        }
+    )
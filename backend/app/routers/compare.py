@@ -1,21 +1,33 @@
 import json
 import asyncio
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.config import settings
 from app.models.comparison import ComparisonRequest
-from app.models.comparison_record import ComparisonRecord
+from app.models.comparison_record import ComparisonRecord, _excerpt
 from app.models.user import User
 from app.services.auth_service import AuthService
-from app.services.comparison_service import stream_comparison
+from app.services.batch_service import (
+    BatchCandidate,
+    stream_batch_comparison,
+    stream_offer_ranking,
+)
+from app.services.comparison_service import FAST_MODE
+from app.services.job_queue import COMPARISON_JOB, enqueue_job, ensure_job_capacity
+from app.services.llm_limiter import ensure_llm_capacity
+from app.services.persistence_queue import persistence_queue
+from app.services.stream_jobs import follow_job
+from app.routers.jobs import stream_job_events
+from app.services.upload_service import UploadService
 
 router = APIRouter()
 security = HTTPBearer()
 auth_service = AuthService()
+upload_service = UploadService()
 
 
 def _sse_headers() -> dict[str, str]:
@@ -52,26 +64,168 @@ async def test_stream():
 async def compare_cv_offer_stream(
     request: ComparisonRequest,
     user: User = Depends(auth_service.verify_token),
-    db: Session = Depends(get_db),
 ):
-    """Compare CV ↔ offre via un seul appel Gemini, puis stream SSE des items."""
+    """
+    Compare CV ↔ offre via un seul appel Gemini, puis stream SSE des items.
+    L'analyse est mise en file (job) : trames numérotées, reprise via
+    GET /compare-stream/{job_id} si la connexion tombe.
+    """
+    if request.mode != FAST_MODE:
+        # Appels Gemini dans les workers (mode redis) : admission sur leur file
+        await ensure_job_capacity()
 
-    def persist(items, summary) -> None:
+    job_id = await enqueue_job(
+        COMPARISON_JOB,
+        user.id,
+        {
+            "offer_text": request.offer_text,
+            "cv_text": request.cv_text,
+            "mode": request.mode,
+        },
+    )
+    frames = await follow_job(job_id, user.id)
+    if frames is None:
+        # Propriétaire non enregistré (Redis indisponible à la mise en file)
+        raise HTTPException(status_code=500, detail="Job introuvable après sa mise en file")
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={**_sse_headers(), "X-Job-Id": job_id},
+    )
+
+
+@router.get("/compare-stream/{job_id}")
+async def resume_compare_stream(
+    job_id: str,
+    last_event_id: Optional[str] = Header(default=None),
+    user: User = Depends(auth_service.verify_token),
+):
+    """Reprend le flux d'une comparaison (alias de /jobs/{job_id}/events)."""
+    return await stream_job_events(job_id, last_event_id, user)
+
+
+async def _batch_candidates(
+    cv_texts: list[str], cv_files: list[UploadFile]
+) -> list[BatchCandidate]:
+    candidates = [
+        BatchCandidate(label=f"CV {index}", text=text)
+        for index, text in enumerate(cv_texts, start=1)
+        if text.strip()
+    ]
+    for upload in cv_files:
+        label = upload.filename or f"CV {len(candidates) + 1}"
+        if not label.lower().endswith(".pdf"):
+            candidates.append(BatchCandidate(label, "", "Seuls les fichiers PDF sont acceptés"))
+            continue
+        if upload.size and upload.size > settings.MAX_FILE_SIZE:
+            candidates.append(BatchCandidate(label, "", "Le fichier est trop volumineux (max 10MB)"))
+            continue
+        try:
+            text = await asyncio.to_thread(upload_service.extract_text_from_pdf, upload)
+        except HTTPException as exc:
+            candidates.append(BatchCandidate(label, "", str(exc.detail)))
+            continue
+        if not text.strip():
+            candidates.append(BatchCandidate(label, "", "Aucun texte n'a pu être extrait du PDF"))
+            continue
+        candidates.append(BatchCandidate(label, text))
+    return candidates
+
+
+@router.post("/compare-batch")
+async def compare_batch_stream(
+    offer_text: str = Form(...),
+    cv_texts: List[str] = Form(default=[]),
+    cv_files: List[UploadFile] = File(default=[]),
+    concurrency: Optional[int] = Form(default=None),
+    user: User = Depends(auth_service.verify_token),
+):
+    """Classe N CV (textes ou PDF) face à une offre ; résultats SSE au fil de l'eau."""
+    if not offer_text.strip():
+        raise HTTPException(status_code=400, detail="Le texte de l'offre est vide")
+
+    candidates = await _batch_candidates(cv_texts, cv_files)
+    if not candidates:
+        raise HTTPException(status_code=400, detail="Aucun CV fourni")
+    if len(candidates) > settings.BATCH_MAX_CVS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de CV dans le lot (max {settings.BATCH_MAX_CVS})",
+        )
+    ensure_llm_capacity()
+
+    limit = min(concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+
+    def persist(_offer_text, cv_text, result) -> str | None:
+        record = ComparisonRecord.from_analysis(
+            user_id=user.id,
+            offer_text=offer_text,
+            cv_text=cv_text,
+            items=result["items"],
+            summary=result["summary"],
+        )
+        return persistence_queue.enqueue(record)
+
+    return StreamingResponse(
+        stream_batch_comparison(
+            offer_text,
+            candidates,
+            concurrency=limit,
+            on_result=persist,
+        ),
+        media_type="text/event-stream",
+        headers=_sse_headers(),
+    )
+
+
+@router.post("/compare-offers")
+async def compare_offers_stream(
+    offer_texts: List[str] = Form(...),
+    cv_text: Optional[str] = Form(default=None),
+    cv_file: Optional[UploadFile] = File(default=None),
+    concurrency: Optional[int] = Form(default=None),
+    user: User = Depends(auth_service.verify_token),
+):
+    """Classe N offres face à un CV (texte ou PDF) ; leaderboard SSE au fil des résultats."""
+    if cv_file is not None:
+        candidates = await _batch_candidates([], [cv_file])
+        if candidates[0].error is not None:
+            raise HTTPException(status_code=400, detail=candidates[0].error)
+        cv_text = candidates[0].text
+    if not cv_text or not cv_text.strip():
+        raise HTTPException(status_code=400, detail="Aucun CV fourni")
+
+    offers = [
+        BatchCandidate(label=_excerpt(text.strip().splitlines()[0], limit=80), text=text)
+        for text in offer_texts
+        if text.strip()
+    ]
+    if not offers:
+        raise HTTPException(status_code=400, detail="Aucune offre fournie")
+    if len(offers) > settings.BATCH_MAX_OFFERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop d'offres dans le lot (max {settings.BATCH_MAX_OFFERS})",
+        )
+    ensure_llm_capacity()
+
+    limit = min(concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+
+    def persist(offer_text, _cv_text, result) -> str | None:
         record = ComparisonRecord.from_analysis(
             user_id=user.id,
-            offer_text=request.offer_text,
-            cv_text=request.cv_text,
-            items=items,
-            summary=summary,
+            offer_text=offer_text,
+            cv_text=cv_text,
+            items=result["items"],
+            summary=result["summary"],
         )
-        db.add(record)
-        db.commit()
+        return persistence_queue.enqueue(record)
 
     return StreamingResponse(
-        stream_comparison(
-            request.offer_text,
-            request.cv_text,
-            intro_message="Début de l'analyse…",
+        stream_offer_ranking(
+            cv_text,
+            offers,
+            concurrency=limit,
             on_result=persist,
         ),
         media_type="text/event-stream",
@@ -6,7 +6,9 @@ from fastapi.responses import StreamingResponse
 
 from app.models.comparison import ComparisonRequest
 from app.models.upload import PDFUploadResponse
-from app.services.comparison_service import stream_comparison
+from app.services.comparison_service import FAST_MODE, stream_comparison
+from app.services.llm_limiter import ensure_llm_capacity
+from app.services.model_router import FREE_TIER
 from app.services.redis_service import redis_service
 from app.services.upload_service import UploadService
 
@@ -43,6 +45,9 @@ async def free_compare_cv_offer_stream(
             detail="Vous avez déjà utilisé votre analyse gratuite. Veuillez créer un compte pour continuer.",
         )
 
+    # Avant le marquage : un 503 ne doit pas consommer l'essai gratuit
+    if request.mode != FAST_MODE:
+        ensure_llm_capacity()
     mark_free_analysis_used(client_id)
 
     return StreamingResponse(
@@ -50,6 +55,8 @@ async def free_compare_cv_offer_stream(
             request.offer_text,
             request.cv_text,
             intro_message="Début de l'analyse gratuite…",
+            mode=request.mode,
+            tier=FREE_TIER,
         ),
         media_type="text/event-stream",
         headers={
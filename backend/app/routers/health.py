@@ -1,6 +1,20 @@
 from fastapi import APIRouter
-import os
+from app.config import settings
+from app.services.cache_service import (
+    comparison_cache,
+    interview_questions_cache,
+    offer_requirements_cache,
+)
+from app.services.comparison_service import coalescing_stats, flight_stats
+from app.services.interview_service import speculation_stats
+from app.services.job_queue import job_queue_stats, worker_states
+from app.services.llm_limiter import llm_limiter
+from app.services.llm_metrics import llm_metrics
+from app.services.llm_resilience import resilience_stats
+from app.services.model_router import model_router
+from app.services.persistence_queue import persistence_queue
 from app.services.redis_service import redis_service
+from app.services.stream_jobs import job_stats, stream_job_stats
 
 router = APIRouter()
 
@@ -13,8 +27,9 @@ async def health_check():
         "features": {
             "sse": True,
             "streaming": True,
-            "timeout": os.getenv("SSE_TIMEOUT", "300")
-        }
+            "timeout": str(settings.SSE_TIMEOUT)
+        },
+        "llm": llm_limiter.stats(),
     }
 
 @router.get("/health/sse")
@@ -23,8 +38,47 @@ async def sse_health_check():
     return {
         "status": "healthy",
         "sse_support": True,
-        "timeout_seconds": int(os.getenv("SSE_TIMEOUT", "300")),
-        "max_concurrent": int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
+        "timeout_seconds": settings.SSE_TIMEOUT,
+        "max_concurrent": llm_limiter.limit,
+        "queue_depth": llm_limiter.queue_depth,
+        "limiter": llm_limiter.stats(),
+        "jobs": stream_job_stats(),
+        "queue": job_queue_stats(),
+        "persistence": persistence_queue.stats(),
+    }
+
+@router.get("/health/llm")
+async def llm_health_check():
+    """État du disjoncteur Gemini, retries/hedging et limite de concurrence courante"""
+    resilience = resilience_stats()
+    # Mode redis : les appels Gemini des jobs tournent dans les workers
+    workers = [
+        {"worker": state["worker"], "limiter": state["limiter"], "resilience": state["resilience"]}
+        for state in worker_states()
+    ]
+    circuits = [resilience["circuit"]] + [w["resilience"]["circuit"] for w in workers]
+    return {
+        "status": "degraded" if any(c["state"] != "closed" for c in circuits) else "healthy",
+        "model": settings.GEMINI_MODEL,
+        "limiter": llm_limiter.stats(),
+        "resilience": resilience,
+        "workers": workers,
+        "speculation": speculation_stats(),
+        "routing": model_router.stats(),
+    }
+
+@router.get("/health/llm/metrics")
+async def llm_metrics_check():
+    """Histogrammes par cas d'usage : durée, premier octet, tokens et coût estimé"""
+    return {
+        "status": "healthy",
+        **llm_metrics.snapshot(),
+        "workers": {state["worker"]: state["metrics"] for state in worker_states()},
+        # Travail abandonné faute de client (les appels annulés sont dans les séries)
+        "cancelled_work": {
+            "flights": flight_stats["cancelled"],
+            "orphaned_jobs": job_stats["orphaned"],
+        },
     }
 
 @router.get("/health/redis")
@@ -38,4 +92,18 @@ async def redis_health_check():
         "redis_connected": redis_health,
         "stats": stats,
         "service": "free_analysis_tracking"
-    } 
\ No newline at end of file
+    }
+
+@router.get("/health/cache")
+async def cache_health_check():
+    """Compteurs hit/miss du cache des résultats IA"""
+    return {
+        "status": "healthy",
+        "redis_connected": redis_service.redis_available,
+        "caches": [
+            comparison_cache.stats(),
+            offer_requirements_cache.stats(),
+            interview_questions_cache.stats(),
+        ],
+        "coalescing": coalescing_stats(),
+    }
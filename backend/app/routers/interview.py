@@ -1,15 +1,23 @@
+import asyncio
 import json
 from typing import Optional
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from app.db import get_db
 from app.models.interview_record import InterviewRecord
 from app.models.user import User
 from app.services.auth_service import get_current_user
-from app.services.interview_service import InterviewService
+from app.services.interview_service import InterviewService, stream_interview_questions
+from app.services.job_queue import INTERVIEW_ANALYSIS_JOB, enqueue_job, ensure_job_capacity
+from app.services.llm_limiter import (
+    LLMOverloadedError,
+    ensure_llm_capacity,
+    overloaded_http_exception,
+)
+from app.services.llm_metrics import collect_llm_calls, summarize_usage
+from app.services.persistence_queue import persistence_queue
+from app.services.stream_jobs import follow_job
 
 router = APIRouter(prefix="/interview", tags=["interview"])
 
@@ -25,9 +33,14 @@ async def generate_interview_questions(
     cv_file: UploadFile = File(...),
     job_text: str = Form(...),
     num_questions: Optional[int] = Form(default=10),
+    regenerate: bool = Form(default=False),
     user: User = Depends(get_current_user),
 ):
-    """Génère des questions d'entretien basées sur le CV et l'offre d'emploi."""
+    """
+    Génère des questions d'entretien basées sur le CV et l'offre d'emploi.
+    Les questions déjà générées pour ce CV / cette offre sont réutilisées,
+    sauf avec regenerate=true ; seul un appel Gemini est refusé (503) si saturé.
+    """
     try:
         if not cv_file.filename or not cv_file.filename.lower().endswith((".pdf", ".txt")):
             raise HTTPException(status_code=400, detail="Le CV doit être au format PDF ou TXT")
@@ -37,7 +50,8 @@ async def generate_interview_questions(
         result = await interview_service.generate_interview_questions(
             cv_content,
             job_text,
-            num_questions or 10,
+            num_questions,
+            regenerate=regenerate,
         )
 
         if result["success"]:
@@ -46,6 +60,8 @@ async def generate_interview_questions(
 
     except HTTPException:
         raise
+    except LLMOverloadedError as e:
+        raise overloaded_http_exception(e) from e
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -53,6 +69,42 @@ async def generate_interview_questions(
         ) from e
 
 
+@router.post("/generate-questions-stream")
+async def generate_interview_questions_stream(
+    cv_file: UploadFile = File(...),
+    job_text: str = Form(...),
+    num_questions: Optional[int] = Form(default=10),
+    regenerate: bool = Form(default=False),
+    user: User = Depends(get_current_user),
+):
+    """
+    Variante SSE de /generate-questions : un appel Gemini court par catégorie
+    en parallèle, chaque question diffusée dès le retour de son groupe. Questions
+    en cache servies même saturé ; sinon, événement d'erreur avec retry_after.
+    """
+    if not cv_file.filename or not cv_file.filename.lower().endswith((".pdf", ".txt")):
+        raise HTTPException(status_code=400, detail="Le CV doit être au format PDF ou TXT")
+    cv_content = await cv_file.read()
+
+    return StreamingResponse(
+        stream_interview_questions(
+            cv_content,
+            job_text,
+            num_questions,
+            regenerate=regenerate,
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Methods": "*",
+        },
+    )
+
+
 @router.post("/analyze-responses")
 async def analyze_interview_responses(
     questions: str = Form(...),
@@ -61,20 +113,21 @@ async def analyze_interview_responses(
     job_text: str = Form(...),
     duration_seconds: int = Form(default=0),
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Analyse les réponses d'entretien, génère des suggestions et enregistre l'historique."""
+    ensure_llm_capacity()
     try:
         questions_list = json.loads(questions)
         answers_list = json.loads(answers)
 
         interview_service = InterviewService()
-        result = await interview_service.analyze_responses(
-            questions_list,
-            answers_list,
-            cv_text,
-            job_text,
-        )
+        with collect_llm_calls() as llm_calls:
+            result = await interview_service.analyze_responses(
+                questions_list,
+                answers_list,
+                cv_text,
+                job_text,
+            )
 
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -86,23 +139,24 @@ async def analyze_interview_responses(
             cv_text=cv_text,
             questions=questions_list,
             answers=answers_list,
-            analysis=analysis,
+            analysis={**analysis, "usage": summarize_usage(llm_calls)},
             duration_seconds=duration_seconds,
         )
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+        # Écriture immédiate : la page de résultats relit l'entretien aussitôt
+        interview_id = await asyncio.to_thread(persistence_queue.write, record)
 
         return JSONResponse(
             content={
                 **result,
-                "interview_id": str(record.id),
+                "interview_id": interview_id,
             },
             status_code=200,
         )
 
     except HTTPException:
         raise
+    except LLMOverloadedError as e:
+        raise overloaded_http_exception(e) from e
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=400, detail=f"Format JSON invalide: {str(e)}") from e
     except Exception as e:
@@ -110,3 +164,54 @@ async def analyze_interview_responses(
             status_code=500,
             detail=f"Erreur lors de l'analyse des réponses: {str(e)}",
         ) from e
+
+
+@router.post("/analyze-responses-stream")
+async def analyze_interview_responses_stream(
+    questions: str = Form(...),
+    answers: str = Form(...),
+    cv_text: str = Form(...),
+    job_text: str = Form(...),
+    duration_seconds: int = Form(default=0),
+    user: User = Depends(get_current_user),
+):
+    """
+    Variante SSE de /analyze-responses : score, points forts, axes d'amélioration,
+    suggestions et conseils diffusés dès leur décodage ; historique enregistré à la fin.
+    L'analyse est un job mis en file, reprenable via /jobs/{job_id}/events.
+    """
+    await ensure_job_capacity()
+    try:
+        questions_list = json.loads(questions)
+        answers_list = json.loads(answers)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Format JSON invalide: {str(e)}") from e
+
+    job_id = await enqueue_job(
+        INTERVIEW_ANALYSIS_JOB,
+        user.id,
+        {
+            "questions": questions_list,
+            "answers": answers_list,
+            "cv_text": cv_text,
+            "job_text": job_text,
+            "duration_seconds": duration_seconds,
+        },
+    )
+    frames = await follow_job(job_id, user.id)
+    if frames is None:
+        # Propriétaire non enregistré (Redis indisponible à la mise en file)
+        raise HTTPException(status_code=500, detail="Job introuvable après sa mise en file")
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Methods": "*",
+            "X-Job-Id": job_id,
+        },
+    )
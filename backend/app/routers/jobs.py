@@ -0,0 +1,45 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.models.user import User
+from app.services.auth_service import get_current_user
+from app.services.stream_jobs import follow_job, job_status
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str, user: User = Depends(get_current_user)):
+    """Statut d'un job mis en file (queued, running, done, failed, cancelled)."""
+    status = await job_status(job_id, user.id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré")
+    return status
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    last_event_id: Optional[str] = Header(default=None),
+    user: User = Depends(get_current_user),
+):
+    """Flux SSE d'un job : rejoue les trames après Last-Event-ID puis suit le direct."""
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID invalide")
+    frames = await follow_job(job_id, user.id, after)
+    if frames is None:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré")
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "X-Job-Id": job_id,
+        },
+    )
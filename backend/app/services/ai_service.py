@@ -2,15 +2,158 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
-import re
+import time
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 
 from google import genai
 from google.genai import types
+from pydantic import BaseModel, ValidationError
 
 from app.config import settings
+from app.models.comparison import (
+    ComparisonDraft,
+    ComparisonItemDraft,
+    OfferRequirement,
+    OfferRequirementsDraft,
+    RequirementMatchesDraft,
+)
+from app.models.interview import InterviewAnalysis, InterviewQuestion
+from app.services.cache_service import (
+    comparison_cache,
+    content_key,
+    interview_questions_cache,
+    offer_requirements_cache,
+)
+from app.services.llm_limiter import LLMOverloadedError, llm_limiter
+from app.services.llm_metrics import record_llm_call
+from app.services.llm_resilience import (
+    circuit_breaker,
+    is_transient_error,
+    resilient_call,
+)
+from app.services.model_router import FREE_TIER, current_tier, model_router
+from app.services.prompt_instructions import (
+    ANALYSIS_INSTRUCTIONS,
+    COMPARE_INSTRUCTIONS,
+    MATCH_INSTRUCTIONS,
+    QUESTIONS_INSTRUCTIONS,
+    REQUIREMENTS_INSTRUCTIONS,
+)
+from app.utils.json_stream import JsonArrayStreamParser, JsonMember, JsonObjectStreamParser
+from app.utils.prompt_compression import compress_document, split_document
+from app.utils.text_tokens import estimate_tokens, tokenize
+
+# À incrémenter à chaque modification d'un prompt (invalide le cache associé)
+COMPARE_PROMPT_VERSION = "compare-v4"
+TWO_STAGE_PROMPT_VERSION = "compare-2stage-v4"
+REQUIREMENTS_PROMPT_VERSION = "requirements-v4"
+QUESTIONS_PROMPT_VERSION = "questions-v3"
+
+# Deux exigences issues de morceaux différents sont fusionnées au-delà de ce recouvrement
+NEAR_DUPLICATE_JACCARD = 0.8
+MAX_REQUIREMENTS = 18
+MAX_CHUNKED_REQUIREMENTS = 30
+# Fin du flux d'un morceau (mode map-reduce en streaming)
+_CHUNK_DONE = object()
+# Une génération de questions par catégorie en mode fan-out
+QUESTION_CATEGORIES = ("Expérience", "Compétences", "Motivation", "Problème", "Spécifique")
+
+# response_schema passé à Gemini : modèle pydantic ou list[modèle], converti par le SDK
+ResponseSchema = Any
+
+
+class LLMUnavailableError(RuntimeError):
+    """Gemini inutilisable pour le moment (client absent, circuit ouvert…)."""
+
+
+def is_llm_unavailable(exc: BaseException) -> bool:
+    """
+    Erreurs pour lesquelles un mode dégradé local est préférable à un échec :
+    délai dépassé, saturation ou disjoncteur ouvert, quota épuisé (429),
+    erreur serveur (5xx) ou réseau.
+    """
+    if isinstance(exc, (LLMOverloadedError, LLMUnavailableError)):
+        return True
+    return is_transient_error(exc)
+
+
+def is_near_duplicate(terms: frozenset[str], seen: list[frozenset[str]]) -> bool:
+    """Jaccard des mots-clés au-delà de NEAR_DUPLICATE_JACCARD avec un texte déjà retenu."""
+    for other in seen:
+        union = terms | other
+        if not union or len(terms & other) / len(union) >= NEAR_DUPLICATE_JACCARD:
+            return True
+    return False
+
+
+def question_category_counts(num_questions: int) -> list[tuple[str, int]]:
+    """Répartition de num_questions entre les catégories (les premières d'abord)."""
+    base, extra = divmod(num_questions, len(QUESTION_CATEGORIES))
+    counts = [
+        (category, base + (1 if index < extra else 0))
+        for index, category in enumerate(QUESTION_CATEGORIES)
+    ]
+    return [(category, count) for category, count in counts if count]
+
+
+class ComparisonAccumulator:
+    """Compteurs et categoryStats construits item par item (un seul passage)."""
+
+    def __init__(self) -> None:
+        self.items: list[dict[str, Any]] = []
+        self.counts = {"match": 0, "missing": 0, "unclear": 0}
+        self.category_stats: dict[str, dict[str, Any]] = {}
+        self._seen_terms: list[frozenset[str]] = []
+
+    def add(self, item: dict[str, Any]) -> None:
+        self.items.append(item)
+        status = item["status"]
+        self.counts[status] += 1
+
+        stats = self.category_stats.get(item["category"])
+        if stats is None:
+            stats = self.category_stats[item["category"]] = {
+                "description": item["category"],
+                "color": "#6366f1",
+                "total": 0,
+                "matches": 0,
+                "missing": 0,
+                "unclear": 0,
+                "match_percentage": 0.0,
+            }
+        stats["total"] += 1
+        stats["matches" if status == "match" else status] += 1
+        stats["match_percentage"] = (stats["matches"] / stats["total"]) * 100
+
+    def add_unique(self, item: dict[str, Any]) -> bool:
+        """
+        Fusion map-reduce : ignore un item dont l'exigence reprend quasiment
+        (Jaccard des mots-clés) une exigence déjà retenue. True si ajouté.
+        """
+        terms = frozenset(tokenize(item["offerText"]))
+        if is_near_duplicate(terms, self._seen_terms):
+            return False
+        self._seen_terms.append(terms)
+        self.add(item)
+        return True
+
+    def summary(self) -> dict[str, Any]:
+        total = len(self.items)
+        return {
+            "totalItems": total,
+            "matches": self.counts["match"],
+            "missing": self.counts["missing"],
+            "unclear": self.counts["unclear"],
+            "matchPercentage": self.counts["match"] / total if total else 0.0,
+            "categoryStats": self.category_stats,
+        }
+
+    def result(self) -> dict[str, Any]:
+        return {"items": self.items, "summary": self.summary()}
 
 
 class AIService:
@@ -22,24 +165,194 @@ class AIService:
         except Exception as exc:
             print(f"Erreur init Gemini: {exc}")
             self.client = None
+        # Extractions d'exigences en cours, partagées entre comparaisons d'une même offre
+        self._pending_requirements: dict[
+            str, asyncio.Task[tuple[list[dict[str, str]], set[str]]]
+        ] = {}
+        # Générations de questions en cours (pré-génération comprise), par clé de cache
+        self._pending_questions: dict[str, asyncio.Task[list[dict[str, str]]]] = {}
 
-    def _generate_json(self, prompt: str, *, temperature: float = 0.2) -> Any:
-        if not self.client:
-            raise RuntimeError("Client Gemini non initialisé")
-
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=temperature,
-                response_mime_type="application/json",
-            ),
+    @staticmethod
+    def _json_config(
+        temperature: float,
+        schema: ResponseSchema | None = None,
+        instructions: str | None = None,
+    ) -> types.GenerateContentConfig:
+        """
+        Sortie JSON contrainte par le schéma dérivé des modèles pydantic.
+        Les instructions statiques passent en system_instruction : préfixe
+        stable d'un appel à l'autre, couvert par le cache implicite de Gemini.
+        """
+        return types.GenerateContentConfig(
+            temperature=temperature,
+            response_mime_type="application/json",
+            response_schema=schema,
+            system_instruction=instructions,
+        )
+
+    def _route(self, use_case: str, prompt: str, instructions: str | None) -> str:
+        """Modèle de cet appel (niveau utilisateur, taille du prompt, santé des modèles)."""
+        return model_router.choose(
+            use_case,
+            self.model_name,
+            input_tokens=estimate_tokens(prompt) + estimate_tokens(instructions or ""),
         )
+
+    def _keyed_model_served(self, served: set[str]) -> bool:
+        """
+        Les clés de cache portent le modèle principal (ou le niveau gratuit) :
+        un résultat n'est mis en cache que si tous ses appels (`served`, rempli
+        par _generate_json_async / _stream_text_async) ont utilisé ce modèle.
+        """
+        return served <= {model_router.preferred(self.model_name)}
+
+    def _response_json(self, response: Any) -> Any:
         text = (response.text or "").strip()
         if not text:
             raise RuntimeError("Réponse Gemini vide")
         return self._parse_json(text)
 
+    async def _generate_json_async(
+        self,
+        prompt: str,
+        *,
+        temperature: float = 0.2,
+        schema: ResponseSchema | None = None,
+        instructions: str | None = None,
+        use_case: str = "other",
+        served: set[str] | None = None,
+    ) -> Any:
+        """
+        Appel JSON via le client asynchrone natif (client.aio). Chaque tentative
+        prend un créneau du limiteur ; retries, hedging et disjoncteur sont
+        gérés par resilient_call. Le modèle appelé est ajouté à `served`.
+        La latence mesurée est celle de la tentative retenue, une fois le
+        créneau obtenu : attente locale et backoff ne sont pas imputés au modèle.
+        """
+        if not self.client:
+            raise LLMUnavailableError("Client Gemini non initialisé")
+
+        model = self._route(use_case, prompt, instructions)
+        if served is not None:
+            served.add(model)
+        config = self._json_config(temperature, schema, instructions)
+
+        last_started = time.monotonic()
+
+        async def attempt(timeout: float) -> tuple[Any, float]:
+            nonlocal last_started
+            async with llm_limiter.slot():
+                started = last_started = time.monotonic()
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=model, contents=prompt, config=config
+                    ),
+                    timeout,
+                )
+                return response, started
+
+        try:
+            response, started = await resilient_call(attempt)
+        except (Exception, asyncio.CancelledError) as exc:
+            record_llm_call(
+                use_case=use_case, model=model, started=last_started,
+                first_byte_at=None, error=exc,
+            )
+            raise
+        # Réponse non streamée : premier octet ≈ réponse complète
+        record_llm_call(
+            use_case=use_case, model=model, started=started,
+            first_byte_at=time.monotonic(), usage_metadata=getattr(response, "usage_metadata", None),
+        )
+        return self._response_json(response)
+
+    async def _stream_text_async(
+        self,
+        prompt: str,
+        *,
+        temperature: float = 0.2,
+        schema: ResponseSchema | None = None,
+        instructions: str | None = None,
+        use_case: str = "other",
+        served: set[str] | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Fragments de texte d'une réponse JSON en streaming, sous le limiteur.
+        Seule l'ouverture du flux est réessayée : un flux entamé n'est pas rejoué.
+        Le modèle appelé est ajouté à `served`. La latence part de l'ouverture
+        retenue, créneau obtenu.
+        """
+        if not self.client:
+            raise LLMUnavailableError("Client Gemini non initialisé")
+
+        model = self._route(use_case, prompt, instructions)
+        if served is not None:
+            served.add(model)
+        config = self._json_config(temperature, schema, instructions)
+
+        last_started = time.monotonic()
+
+        async def open_stream(timeout: float) -> tuple[Any, float]:
+            nonlocal last_started
+            await llm_limiter.acquire()
+            started = last_started = time.monotonic()
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(
+                        model=model, contents=prompt, config=config
+                    ),
+                    timeout,
+                )
+            except BaseException:
+                llm_limiter.release()
+                raise
+            return stream, started
+
+        # Délai global du flux, attente du créneau comprise
+        deadline = time.monotonic() + settings.SSE_TIMEOUT
+        first_byte_at: float | None = None
+        usage_metadata: Any = None
+        try:
+            stream, started = await resilient_call(open_stream, hedge=False)
+        except (Exception, asyncio.CancelledError) as exc:
+            record_llm_call(
+                use_case=use_case, model=model, started=last_started,
+                first_byte_at=None, error=exc,
+            )
+            raise
+
+        error: BaseException | None = None
+        try:
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        iterator.__anext__(), max(0.0, deadline - time.monotonic())
+                    )
+                except StopAsyncIteration:
+                    break
+                except Exception as exc:
+                    error = exc
+                    circuit_breaker.record_failure(exc)
+                    raise
+                if first_byte_at is None:
+                    first_byte_at = time.monotonic()
+                # Compteurs cumulés : le dernier fragment porte le total
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                if chunk.text:
+                    yield chunk.text
+        except (asyncio.CancelledError, GeneratorExit) as exc:
+            # Client parti : appel abandonné en cours de route
+            error = exc
+            raise
+        finally:
+            llm_limiter.record_call(time.monotonic() - started)
+            llm_limiter.release()
+            record_llm_call(
+                use_case=use_case, model=model, started=started,
+                first_byte_at=first_byte_at, usage_metadata=usage_metadata, error=error,
+            )
+
     @staticmethod
     def _parse_json(text: str) -> Any:
         try:
@@ -57,205 +370,738 @@ class AIService:
             raise
 
     @staticmethod
-    def _clip(text: str, max_chars: int = 12000) -> str:
-        text = re.sub(r"\s+", " ", (text or "").strip())
-        if len(text) <= max_chars:
-            return text
-        return text[:max_chars] + "…"
-
-    def compare_offer_and_cv(self, offer_text: str, cv_text: str) -> dict[str, Any]:
-        """
-        Une seule requête LLM : extraction + matching + suggestions.
-        Retourne { items: [...], summary: {...} } au format frontend.
-        """
-        offer = self._clip(offer_text)
-        cv = self._clip(cv_text)
-
-        prompt = f"""Tu es un expert ATS / recrutement. Compare l'offre et le CV.
-
-OBJECTIF
-- Extraire les exigences clés de l'offre (8 à 18 max, les plus importantes).
-- Pour chacune, évaluer la présence dans le CV.
-- Produire un JSON STRICT conforme au schéma.
-
-STATUTS
-- "match" : clairement présent dans le CV
-- "unclear" : partiellement / implicitement présent
-- "missing" : absent du CV
-- confidence : nombre entre 0 et 1
-
-CATÉGORIES possibles (choisir la plus pertinente) :
-"langues", "soft skills", "expérience et niveau", "formation et certification",
-"domaine métier", "compétences techniques", "autres"
-
-Pour missing/unclear : 1 à 3 suggestions concrètes et actionnables pour le CV.
-Pour match : suggestions = [] ou null.
-
-SCHÉMA JSON
-{{
-  "items": [
-    {{
-      "category": "compétences techniques",
-      "offerText": "exigence de l'offre",
-      "cvText": "extrait/preuves du CV ou null",
-      "status": "match|missing|unclear",
-      "confidence": 0.0,
-      "suggestions": ["..."]
-    }}
-  ]
-}}
-
-OFFRE:
+    def _compress(text: str, reference: str | None = None, *, share: float = 1.0) -> str:
+        """
+        Document prêt pour le prompt : boilerplate et doublons retirés, sections
+        les plus pertinentes pour `reference` gardées dans le budget de tokens.
+        """
+        budget = max(1, int(settings.PROMPT_DOCUMENT_TOKENS * share))
+        return compress_document(text, reference, budget_tokens=budget)
+
+    def comparison_cache_key(
+        self, offer_text: str, cv_text: str, *, two_stage: bool | None = None
+    ) -> str:
+        if two_stage is None:
+            two_stage = settings.COMPARISON_TWO_STAGE
+        version = TWO_STAGE_PROMPT_VERSION if two_stage else COMPARE_PROMPT_VERSION
+        if current_tier() == FREE_TIER and settings.FREE_TRIAL_FAST_TIER:
+            # Résultats du niveau rapide (essai gratuit) non servis aux comptes
+            return content_key(offer_text, cv_text, self.model_name, version, FREE_TIER)
+        return content_key(offer_text, cv_text, self.model_name, version)
+
+    @staticmethod
+    def get_cached_comparison_by_key(cache_key: str) -> dict[str, Any] | None:
+        return comparison_cache.get(cache_key)
+
+    async def compare_offer_and_cv_async(self, offer_text: str, cv_text: str) -> dict[str, Any]:
+        """
+        Une seule requête LLM : extraction + matching + suggestions, au format
+        frontend { items: [...], summary: {...} }, mise en cache par contenu
+        normalisé (client.aio, sans thread).
+        Avec COMPARISON_TWO_STAGE, les exigences de l'offre sont extraites une
+        fois (cache par offre) puis le CV est évalué avec un prompt court.
+        """
+        cache_key = self.comparison_cache_key(offer_text, cv_text)
+        cached = comparison_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        served: set[str] = set()
+        requirements = None
+        if settings.COMPARISON_TWO_STAGE:
+            requirements = await self.extract_offer_requirements_async(offer_text, served=served)
+            prompt = self._build_match_prompt(requirements, cv_text)
+            schema, instructions = RequirementMatchesDraft, MATCH_INSTRUCTIONS
+        else:
+            chunks = self._offer_chunks(offer_text, cv_text)
+            if len(chunks) > 1:
+                result, complete = await self._compare_chunks_async(chunks, cv_text, served)
+                if complete and self._keyed_model_served(served):
+                    comparison_cache.set(cache_key, result)
+                return result
+            prompt = self._build_compare_prompt(offer_text, cv_text)
+            schema, instructions = ComparisonDraft, COMPARE_INSTRUCTIONS
+
+        raw = await self._generate_json_async(
+            prompt,
+            temperature=0.15,
+            schema=schema,
+            instructions=instructions,
+            use_case="compare",
+            served=served,
+        )
+        result = self._normalize_comparison(raw, requirements)
+        if self._keyed_model_served(served):
+            comparison_cache.set(cache_key, result)
+        return result
+
+    def _offer_chunks(self, offer_text: str, reference: str | None = None) -> list[str]:
+        """
+        Morceaux de l'offre d'au plus PROMPT_DOCUMENT_TOKENS. Au-delà de
+        COMPARISON_MAX_CHUNKS morceaux, l'offre est d'abord compressée.
+        """
+        budget = settings.PROMPT_DOCUMENT_TOKENS
+        offer = compress_document(
+            offer_text,
+            reference,
+            budget_tokens=budget * max(1, settings.COMPARISON_MAX_CHUNKS),
+        )
+        return split_document(offer, budget_tokens=budget) or [offer]
+
+    async def _compare_chunks_async(
+        self, chunks: list[str], cv_text: str, served: set[str]
+    ) -> tuple[dict[str, Any], bool]:
+        """
+        Map : un appel par morceau d'offre, en parallèle (sous le limiteur).
+        Reduce : fusion des items sans quasi-doublons, summary calculé une fois.
+        Renvoie (résultat, complet) ; un résultat partiel n'est pas mis en cache.
+        """
+        raws = await asyncio.gather(
+            *(
+                self._generate_json_async(
+                    self._build_compare_prompt(chunk, cv_text, part=(index, len(chunks))),
+                    temperature=0.15,
+                    schema=ComparisonDraft,
+                    instructions=COMPARE_INSTRUCTIONS,
+                    use_case="compare",
+                    served=served,
+                )
+                for index, chunk in enumerate(chunks, start=1)
+            ),
+            return_exceptions=True,
+        )
+
+        accumulator = ComparisonAccumulator()
+        errors: list[BaseException] = []
+        for raw in raws:
+            if isinstance(raw, BaseException):
+                print(f"Erreur comparaison morceau d'offre: {raw!r}")
+                errors.append(raw)
+                continue
+            rows = raw.get("items") if isinstance(raw, dict) else raw
+            for row in rows if isinstance(rows, list) else []:
+                item = self._normalize_item(row)
+                if item is not None:
+                    accumulator.add_unique(item)
+
+        if not accumulator.items:
+            if errors:
+                raise errors[0]
+            raise RuntimeError("Aucun item valide après parsing Gemini")
+        return accumulator.result(), not errors
+
+    async def extract_offer_requirements_async(
+        self, offer_text: str, *, served: set[str] | None = None
+    ) -> list[dict[str, str]]:
+        """
+        Étape 1 du mode deux étapes : exigences clés de l'offre, mises en cache
+        par empreinte de l'offre. Les appels concurrents pour la même offre
+        partagent une seule extraction, dont les modèles sont ajoutés à `served`.
+        """
+        key = content_key(offer_text, self.model_name, REQUIREMENTS_PROMPT_VERSION)
+        cached = offer_requirements_cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._pending_requirements.get(key)
+        if task is None:
+            task = asyncio.create_task(self._extract_offer_requirements(key, offer_text))
+            self._pending_requirements[key] = task
+            task.add_done_callback(lambda _: self._pending_requirements.pop(key, None))
+        requirements, models = await asyncio.shield(task)
+        if served is not None:
+            served |= models
+        return requirements
+
+    async def _extract_offer_requirements(
+        self, key: str, offer_text: str
+    ) -> tuple[list[dict[str, str]], set[str]]:
+        served: set[str] = set()
+        # Longue offre : extraction par morceau en parallèle, puis fusion
+        chunks = self._offer_chunks(offer_text)
+        raws = await asyncio.gather(
+            *(
+                self._generate_json_async(
+                    self._build_requirements_prompt(chunk),
+                    temperature=0.1,
+                    schema=OfferRequirementsDraft,
+                    instructions=REQUIREMENTS_INSTRUCTIONS,
+                    use_case="requirements",
+                    served=served,
+                )
+                for chunk in chunks
+            )
+        )
+        rows = [
+            row
+            for raw in raws
+            for row in (raw.get("requirements") if isinstance(raw, dict) else raw) or []
+        ]
+        requirements = self._normalize_requirements(
+            rows, limit=MAX_REQUIREMENTS if len(chunks) == 1 else MAX_CHUNKED_REQUIREMENTS
+        )
+        if not requirements:
+            raise RuntimeError("Gemini n'a extrait aucune exigence de l'offre")
+        if self._keyed_model_served(served):
+            offer_requirements_cache.set(key, requirements)
+        return requirements, served
+
+    def _build_requirements_prompt(self, offer_text: str) -> str:
+        """Contenu variable ; les consignes sont dans REQUIREMENTS_INSTRUCTIONS."""
+        return f"""OFFRE:
+\"\"\"{self._compress(offer_text)}\"\"\"
+"""
+
+    @staticmethod
+    def _normalize_requirements(
+        raw: Any, limit: int = MAX_REQUIREMENTS
+    ) -> list[dict[str, str]]:
+        rows = raw.get("requirements") if isinstance(raw, dict) else raw
+        if not isinstance(rows, list):
+            return []
+        requirements: list[dict[str, str]] = []
+        seen: set[str] = set()
+        for row in rows:
+            try:
+                requirement = OfferRequirement.model_validate(row)
+            except ValidationError:
+                continue
+            if requirement.offerText.lower() in seen:
+                continue
+            seen.add(requirement.offerText.lower())
+            requirements.append(requirement.model_dump())
+            if len(requirements) == limit:
+                break
+        return requirements
+
+    def _build_match_prompt(self, requirements: list[dict[str, str]], cv_text: str) -> str:
+        """
+        Étape 2 : prompt court, le modèle ne renvoie que l'évaluation par index
+        (consignes dans MATCH_INSTRUCTIONS).
+        """
+        numbered = "\n".join(
+            f"{index}. [{req['category']}] {req['offerText']}"
+            for index, req in enumerate(requirements, start=1)
+        )
+        cv = self._compress(cv_text, " ".join(req["offerText"] for req in requirements))
+        return f"""EXIGENCES:
+{numbered}
+
+CV:
+\"\"\"{cv}\"\"\"
+"""
+
+    @staticmethod
+    def _merge_requirement(
+        row: Any, requirements: list[dict[str, str]] | None
+    ) -> Any:
+        """Réassocie une évaluation (index) à l'exigence extraite à l'étape 1."""
+        if requirements is None or not isinstance(row, dict):
+            return row
+        try:
+            index = int(row.get("index")) - 1
+        except (TypeError, ValueError):
+            return row
+        if not 0 <= index < len(requirements):
+            return row
+        return {**row, **requirements[index]}
+
+    def _build_compare_prompt(
+        self, offer_text: str, cv_text: str, *, part: tuple[int, int] | None = None
+    ) -> str:
+        """Contenu variable ; les consignes sont dans COMPARE_INSTRUCTIONS."""
+        offer = self._compress(offer_text, cv_text)
+        cv = self._compress(cv_text, offer_text)
+        scope = ""
+        if part is not None:
+            scope = (
+                f"L'offre est longue : voici l'extrait {part[0]}/{part[1]}. "
+                "Ne traite que les exigences présentes dans cet extrait.\n\n"
+            )
+
+        return f"""{scope}OFFRE:
 \"\"\"{offer}\"\"\"
 
 CV:
 \"\"\"{cv}\"\"\"
 """
 
-        raw = self._generate_json(prompt, temperature=0.15)
+    @staticmethod
+    def _normalize_item(row: Any) -> dict[str, Any] | None:
+        """
+        Validation compilée (pydantic-core) d'une ligne brute Gemini : statut
+        normalisé, confiance bornée, suggestions nettoyées. None si inexploitable.
+        """
+        try:
+            draft = ComparisonItemDraft.model_validate(row)
+        except ValidationError:
+            return None
+        return {"id": str(uuid.uuid4()), **draft.model_dump()}
+
+    @classmethod
+    def _normalize_comparison(
+        cls, raw: Any, requirements: list[dict[str, str]] | None = None
+    ) -> dict[str, Any]:
         items_raw = raw.get("items") if isinstance(raw, dict) else raw
         if not isinstance(items_raw, list) or not items_raw:
             raise RuntimeError("Gemini n'a renvoyé aucun item de comparaison")
 
-        items: list[dict[str, Any]] = []
-        matches = missing = unclear = 0
+        # Même fusion que le flux : exigences quasi identiques retenues une fois
+        accumulator = ComparisonAccumulator()
+        for row in items_raw:
+            item = cls._normalize_item(cls._merge_requirement(row, requirements))
+            if item is not None:
+                accumulator.add_unique(item)
 
-        for index, row in enumerate(items_raw):
-            if not isinstance(row, dict):
-                continue
-            status = str(row.get("status") or "missing").lower().strip()
-            if status not in {"match", "missing", "unclear"}:
-                status = "missing"
+        if not accumulator.items:
+            raise RuntimeError("Aucun item valide après parsing Gemini")
+        return accumulator.result()
 
-            try:
-                confidence = float(row.get("confidence") or 0.0)
-            except (TypeError, ValueError):
-                confidence = 0.0
-            confidence = max(0.0, min(1.0, confidence))
-
-            suggestions = row.get("suggestions") or []
-            if not isinstance(suggestions, list):
-                suggestions = []
-            suggestions = [str(s).strip() for s in suggestions if str(s).strip()][:3]
-            if status == "match":
-                suggestions = []
-
-            if status == "match":
-                matches += 1
-            elif status == "unclear":
-                unclear += 1
-            else:
-                missing += 1
-
-            cv_text_val = row.get("cvText")
-            items.append(
-                {
-                    "id": str(uuid.uuid4()),
-                    "category": str(row.get("category") or "autres"),
-                    "offerText": str(row.get("offerText") or "").strip(),
-                    "cvText": str(cv_text_val).strip() if cv_text_val else None,
-                    "status": status,
-                    "confidence": confidence,
-                    "suggestions": suggestions or None,
-                }
+    async def stream_compare_offer_and_cv(
+        self, offer_text: str, cv_text: str
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Streaming token par token : chaque élément de `items` est normalisé et
+        émis dès qu'il est entièrement décodé, puis un événement summary final.
+        Événements : {"type": "item", "item"} puis {"type": "summary", "summary"}.
+        Un résultat en cache est rejoué directement.
+        """
+        cache_key = self.comparison_cache_key(offer_text, cv_text)
+        cached = comparison_cache.get(cache_key)
+        if cached is not None:
+            for item in cached["items"]:
+                yield {"type": "item", "item": item}
+            yield {"type": "summary", "summary": cached["summary"], "cached": True}
+            return
+
+        served: set[str] = set()
+        requirements = None
+        errors: list[BaseException] = []
+        if settings.COMPARISON_TWO_STAGE:
+            requirements = await self.extract_offer_requirements_async(offer_text, served=served)
+            rows = self._stream_rows(
+                self._build_match_prompt(requirements, cv_text),
+                RequirementMatchesDraft,
+                MATCH_INSTRUCTIONS,
+                served,
             )
+        else:
+            chunks = self._offer_chunks(offer_text, cv_text)
+            if len(chunks) > 1:
+                rows = self._stream_chunk_rows(chunks, cv_text, errors, served)
+            else:
+                rows = self._stream_rows(
+                    self._build_compare_prompt(offer_text, cv_text),
+                    ComparisonDraft,
+                    COMPARE_INSTRUCTIONS,
+                    served,
+                )
 
-        # Filtrer les lignes vides
-        items = [i for i in items if i["offerText"]]
-        total = len(items)
-        if total == 0:
+        accumulator = ComparisonAccumulator()
+        async for row in rows:
+            item = self._normalize_item(self._merge_requirement(row, requirements))
+            if item is not None and accumulator.add_unique(item):
+                yield {"type": "item", "item": item}
+
+        if not accumulator.items:
+            if errors:
+                raise errors[0]
             raise RuntimeError("Aucun item valide après parsing Gemini")
 
-        # Recalculer compteurs après filtre
-        matches = sum(1 for i in items if i["status"] == "match")
-        missing = sum(1 for i in items if i["status"] == "missing")
-        unclear = sum(1 for i in items if i["status"] == "unclear")
-
-        category_stats: dict[str, dict[str, Any]] = {}
-        for item in items:
-            cat = item["category"]
-            if cat not in category_stats:
-                category_stats[cat] = {
-                    "description": cat,
-                    "color": "#6366f1",
-                    "total": 0,
-                    "matches": 0,
-                    "missing": 0,
-                    "unclear": 0,
-                    "match_percentage": 0.0,
-                }
-            category_stats[cat]["total"] += 1
-            if item["status"] == "match":
-                category_stats[cat]["matches"] += 1
-            elif item["status"] == "missing":
-                category_stats[cat]["missing"] += 1
-            else:
-                category_stats[cat]["unclear"] += 1
+        result = accumulator.result()
+        # Un morceau en échec : résultat partiel, non mis en cache
+        if not errors and self._keyed_model_served(served):
+            comparison_cache.set(cache_key, result)
+        yield {"type": "summary", "summary": result["summary"], "cached": False}
 
-        for stats in category_stats.values():
-            if stats["total"]:
-                stats["match_percentage"] = (stats["matches"] / stats["total"]) * 100
+    async def _stream_rows(
+        self, prompt: str, schema: ResponseSchema, instructions: str, served: set[str]
+    ) -> AsyncIterator[Any]:
+        """Lignes brutes de `items` décodées au fil du flux (parsing global en secours)."""
+        parser = JsonArrayStreamParser("items")
+        streamed = False
+        async for text in self._stream_text_async(
+            prompt,
+            temperature=0.15,
+            schema=schema,
+            instructions=instructions,
+            use_case="compare",
+            served=served,
+        ):
+            for row in parser.feed(text):
+                streamed = True
+                yield row
+        if streamed:
+            return
 
-        return {
-            "items": items,
-            "summary": {
-                "totalItems": total,
-                "matches": matches,
-                "missing": missing,
-                "unclear": unclear,
-                "matchPercentage": matches / total if total else 0.0,
-                "categoryStats": category_stats,
-            },
-        }
+        # Flux non décodable au fil de l'eau (JSON enveloppé…) : parsing global
+        text = parser.raw_text.strip()
+        if not text:
+            raise RuntimeError("Réponse Gemini vide")
+        raw = self._parse_json(text)
+        rows = raw.get("items") if isinstance(raw, dict) else raw
+        if not isinstance(rows, list) or not rows:
+            raise RuntimeError("Gemini n'a renvoyé aucun item de comparaison")
+        for row in rows:
+            yield row
 
-    def generate_interview_questions(
-        self, cv_text: str, job_offer_text: str, num_questions: int = 10
-    ) -> list[dict[str, str]]:
-        prompt = f"""Tu es un expert recrutement. Génère exactement {num_questions} questions d'entretien.
+    async def _stream_chunk_rows(
+        self,
+        chunks: list[str],
+        cv_text: str,
+        errors: list[BaseException],
+        served: set[str],
+    ) -> AsyncIterator[Any]:
+        """
+        Map en streaming : un flux par morceau d'offre, en parallèle ; les lignes
+        sont rendues dans leur ordre d'arrivée. Les échecs sont ajoutés à `errors`.
+        """
+        queue: asyncio.Queue[Any] = asyncio.Queue()
 
-CV (extrait):
-\"\"\"{self._clip(cv_text, 8000)}\"\"\"
+        async def run(index: int, chunk: str) -> None:
+            try:
+                prompt = self._build_compare_prompt(chunk, cv_text, part=(index, len(chunks)))
+                async for row in self._stream_rows(
+                    prompt, ComparisonDraft, COMPARE_INSTRUCTIONS, served
+                ):
+                    queue.put_nowait(row)
+            except Exception as exc:
+                print(f"Erreur comparaison morceau d'offre {index}: {exc!r}")
+                errors.append(exc)
+            finally:
+                queue.put_nowait(_CHUNK_DONE)
 
-OFFRE (extrait):
-\"\"\"{self._clip(job_offer_text, 8000)}\"\"\"
+        tasks = [
+            asyncio.create_task(run(index, chunk))
+            for index, chunk in enumerate(chunks, start=1)
+        ]
+        try:
+            pending = len(tasks)
+            while pending:
+                row = await queue.get()
+                if row is _CHUNK_DONE:
+                    pending -= 1
+                    continue
+                yield row
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
-Retourne un JSON array:
-[
-  {{"text": "Question complète ?", "category": "Expérience|Compétences|Motivation|Problème|Spécifique"}}
-]
+    def questions_cache_key(self, cv_text: str, job_offer_text: str, num_questions: int) -> str:
+        return content_key(
+            cv_text, job_offer_text, num_questions, self.model_name, QUESTIONS_PROMPT_VERSION
+        )
 
-Questions variées, spécifiques au profil et au poste. JSON uniquement."""
+    async def generate_interview_questions_async(
+        self,
+        cv_text: str,
+        job_offer_text: str,
+        num_questions: int = 10,
+        *,
+        regenerate: bool = False,
+    ) -> list[dict[str, str]]:
+        """
+        Questions mises en cache par CV / offre / nombre ; `regenerate` ignore
+        l'entrée existante et la remplace. Les questions de secours ne sont pas
+        mises en cache. Une génération déjà en cours pour le même contenu
+        (pré-génération) est partagée.
+        """
+        cache_key = self.questions_cache_key(cv_text, job_offer_text, num_questions)
+        if not regenerate:
+            cached = interview_questions_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
         try:
-            raw = self._generate_json(prompt, temperature=0.4)
-            questions = raw if isinstance(raw, list) else raw.get("questions", [])
-            cleaned: list[dict[str, str]] = []
-            for q in questions:
-                if not isinstance(q, dict):
-                    continue
-                text = str(q.get("text") or "").strip()
-                if not text:
-                    continue
-                cleaned.append(
-                    {
-                        "text": text,
-                        "category": str(q.get("category") or "Général"),
-                    }
+            task = None if regenerate else self._pending_questions.get(cache_key)
+            if task is not None and not task.cancelled():
+                cleaned = await asyncio.shield(task)
+            else:
+                # Seul un nouvel appel Gemini est soumis à la capacité du limiteur
+                llm_limiter.check_admission()
+                cleaned = await self._generate_questions(
+                    cache_key, cv_text, job_offer_text, num_questions
                 )
             if cleaned:
-                return cleaned[:num_questions]
+                return cleaned
+        except LLMOverloadedError:
+            raise
         except Exception as exc:
             print(f"Erreur génération questions: {exc}")
 
         return self._fallback_questions(num_questions)
 
-    def analyze_interview_responses(
+    async def stream_interview_questions(
+        self,
+        cv_text: str,
+        job_offer_text: str,
+        num_questions: int = 10,
+        *,
+        regenerate: bool = False,
+    ) -> AsyncIterator[dict[str, str]]:
+        """
+        Fan-out : un appel court par catégorie, en parallèle (sous le limiteur).
+        Chaque question est rendue dès le retour de son groupe, sans quasi-doublons ;
+        groupes en échec complétés par les questions de secours. Le résultat complet
+        est mis en cache sous la même clé que generate_interview_questions_async.
+        """
+        cache_key = self.questions_cache_key(cv_text, job_offer_text, num_questions)
+        if not regenerate:
+            cached = interview_questions_cache.get(cache_key)
+            if cached is not None:
+                for question in cached:
+                    yield question
+                return
+
+        # Seul le chemin Gemini est soumis à la capacité du limiteur
+        llm_limiter.check_admission()
+        served: set[str] = set()
+        queue: asyncio.Queue[Any] = asyncio.Queue()
+
+        async def run(category: str, count: int) -> None:
+            try:
+                raw = await self._generate_json_async(
+                    self._build_questions_prompt(
+                        cv_text, job_offer_text, count, category=category
+                    ),
+                    temperature=0.4,
+                    schema=list[InterviewQuestion],
+                    instructions=QUESTIONS_INSTRUCTIONS,
+                    use_case="questions",
+                    served=served,
+                )
+                queue.put_nowait(self._normalize_questions(raw, count))
+            except Exception as exc:
+                print(f"Erreur génération questions ({category}): {exc!r}")
+                queue.put_nowait(exc)
+
+        tasks = [
+            asyncio.create_task(run(category, count))
+            for category, count in question_category_counts(num_questions)
+        ]
+        questions: list[dict[str, str]] = []
+        seen: list[frozenset[str]] = []
+        errors: list[BaseException] = []
+        try:
+            for _ in tasks:
+                result = await queue.get()
+                if isinstance(result, BaseException):
+                    errors.append(result)
+                    continue
+                for question in result:
+                    terms = frozenset(tokenize(question["text"]))
+                    if is_near_duplicate(terms, seen):
+                        continue
+                    seen.append(terms)
+                    questions.append(question)
+                    yield question
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if not questions and any(isinstance(exc, LLMOverloadedError) for exc in errors):
+            raise next(exc for exc in errors if isinstance(exc, LLMOverloadedError))
+        if errors or not questions:
+            for question in self._fallback_questions(num_questions):
+                if len(questions) >= num_questions:
+                    break
+                terms = frozenset(tokenize(question["text"]))
+                if not is_near_duplicate(terms, seen):
+                    seen.append(terms)
+                    questions.append(question)
+                    yield question
+        elif self._keyed_model_served(served):
+            interview_questions_cache.set(cache_key, questions)
+
+    def start_questions_generation(
+        self,
+        cv_text: str,
+        job_offer_text: str,
+        num_questions: int,
+        focus: list[str] | None = None,
+    ) -> asyncio.Task[list[dict[str, str]]]:
+        """
+        Génération en tâche de fond, partagée avec generate_interview_questions_async
+        (même clé de cache) ; `focus` : écarts à approfondir en entretien.
+        """
+        cache_key = self.questions_cache_key(cv_text, job_offer_text, num_questions)
+        task = self._pending_questions.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(
+                self._generate_questions(cache_key, cv_text, job_offer_text, num_questions, focus)
+            )
+            self._pending_questions[cache_key] = task
+            task.add_done_callback(lambda _: self._pending_questions.pop(cache_key, None))
+        return task
+
+    async def _generate_questions(
+        self,
+        cache_key: str,
+        cv_text: str,
+        job_offer_text: str,
+        num_questions: int,
+        focus: list[str] | None = None,
+    ) -> list[dict[str, str]]:
+        """Questions validées et mises en cache ; [] si Gemini n'en renvoie aucune."""
+        served: set[str] = set()
+        raw = await self._generate_json_async(
+            self._build_questions_prompt(cv_text, job_offer_text, num_questions, focus),
+            temperature=0.4,
+            schema=list[InterviewQuestion],
+            instructions=QUESTIONS_INSTRUCTIONS,
+            use_case="questions",
+            served=served,
+        )
+        cleaned = self._normalize_questions(raw, num_questions)
+        if cleaned and self._keyed_model_served(served):
+            interview_questions_cache.set(cache_key, cleaned)
+        return cleaned
+
+    def _build_questions_prompt(
+        self,
+        cv_text: str,
+        job_offer_text: str,
+        num_questions: int,
+        focus: list[str] | None = None,
+        *,
+        category: str | None = None,
+    ) -> str:
+        """Contenu variable ; les consignes sont dans QUESTIONS_INSTRUCTIONS."""
+        points = ""
+        if category:
+            points += f"Catégorie imposée : {category}\n"
+        if focus:
+            points += "\nPOINTS À APPROFONDIR:\n" + "\n".join(f"- {point}" for point in focus) + "\n"
+        return f"""Nombre de questions : {num_questions}
+{points}
+CV (extrait):
+\"\"\"{self._compress(cv_text, job_offer_text, share=2 / 3)}\"\"\"
+
+OFFRE (extrait):
+\"\"\"{self._compress(job_offer_text, cv_text, share=2 / 3)}\"\"\"
+"""
+
+    @staticmethod
+    def _normalize_questions(raw: Any, num_questions: int) -> list[dict[str, str]]:
+        questions = raw if isinstance(raw, list) else raw.get("questions", [])
+        cleaned: list[dict[str, str]] = []
+        for q in questions:
+            try:
+                cleaned.append(InterviewQuestion.model_validate(q).model_dump())
+            except ValidationError:
+                continue
+            if len(cleaned) == num_questions:
+                break
+        return cleaned
+
+    async def analyze_interview_responses_async(
         self,
         questions: list[dict[str, str]],
         answers: list[dict[str, str]],
         cv_text: str,
         job_text: str,
     ) -> dict[str, Any]:
+        prompt = self._build_analysis_prompt(questions, answers, cv_text, job_text)
+        try:
+            raw = await self._generate_json_async(
+                prompt,
+                temperature=0.3,
+                schema=InterviewAnalysis,
+                instructions=ANALYSIS_INSTRUCTIONS,
+                use_case="analysis",
+            )
+            return {"success": True, "analysis": self._normalize_analysis(raw)}
+        except LLMOverloadedError:
+            raise
+        except Exception as exc:
+            print(f"Erreur analyse entretien: {exc}")
+
+        return self._fallback_analysis()
+
+    async def stream_interview_analysis(
+        self,
+        questions: list[dict[str, str]],
+        answers: list[dict[str, str]],
+        cv_text: str,
+        job_text: str,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Analyse en streaming : {"type": "field"} pour score_global, puis
+        {"type": "entry"} pour chaque point fort, axe d'amélioration,
+        suggestion ou conseil dès son décodage, enfin {"type": "analysis"}
+        avec l'objet complet validé. Échec avant tout événement : analyse de
+        secours, comme analyze_interview_responses_async.
+        """
+        prompt = self._build_analysis_prompt(questions, answers, cv_text, job_text)
+        parser = JsonObjectStreamParser()
+        collected: dict[str, Any] = {}
+        emitted = False
+        try:
+            async for text in self._stream_text_async(
+                prompt,
+                temperature=0.3,
+                schema=InterviewAnalysis,
+                instructions=ANALYSIS_INSTRUCTIONS,
+                use_case="analysis",
+            ):
+                for member in parser.feed(text):
+                    if member.element:
+                        collected.setdefault(member.key, []).append(member.value)
+                    else:
+                        collected[member.key] = member.value
+                    event = self._analysis_event(member)
+                    if event is not None:
+                        emitted = True
+                        yield event
+            # Flux non décodable au fil de l'eau (JSON enveloppé…) : parsing global
+            raw = collected if parser.done else self._parse_json(parser.raw_text.strip())
+            analysis = self._normalize_analysis(raw)
+        except LLMOverloadedError:
+            raise
+        except Exception as exc:
+            if emitted:
+                raise
+            print(f"Erreur analyse entretien (streaming): {exc}")
+            analysis = self._fallback_analysis()["analysis"]
+        yield {"type": "analysis", "analysis": analysis}
+
+    @staticmethod
+    def _analysis_event(member: JsonMember) -> dict[str, Any] | None:
+        """Membre décodé validé avec le modèle InterviewAnalysis (champ par champ)."""
+        if member.key not in InterviewAnalysis.model_fields:
+            return None
+        value = [member.value] if member.element else member.value
+        try:
+            partial = InterviewAnalysis.model_validate({"score_global": 0, member.key: value})
+        except ValidationError:
+            return None
+        value = getattr(partial, member.key)
+        if not member.element:
+            return {"type": "field", "field": member.key, "value": value}
+        if not value:
+            return None
+        item = value[0]
+        return {
+            "type": "entry",
+            "field": member.key,
+            "item": item.model_dump() if isinstance(item, BaseModel) else item,
+        }
+
+    @staticmethod
+    def _normalize_analysis(raw: Any) -> dict[str, Any]:
+        """Score borné à 0–10, listes nettoyées ; ValidationError si inexploitable."""
+        return InterviewAnalysis.model_validate(raw).model_dump()
+
+    def _build_analysis_prompt(
+        self,
+        questions: list[dict[str, str]],
+        answers: list[dict[str, str]],
+        cv_text: str,
+        job_text: str,
+    ) -> str:
+        """Contenu variable ; les consignes sont dans ANALYSIS_INSTRUCTIONS."""
         qa_block = []
         for i, (question, answer) in enumerate(zip(questions, answers)):
             qa_block.append(
@@ -263,35 +1109,12 @@ Questions variées, spécifiques au profil et au poste. JSON uniquement."""
                 f"R: {answer.get('answer', 'Aucune réponse')}"
             )
 
-        prompt = f"""Tu es coach entretien. Analyse les réponses.
-
-CV: \"\"\"{self._clip(cv_text, 6000)}\"\"\"
-OFFRE: \"\"\"{self._clip(job_text, 6000)}\"\"\"
+        return f"""CV: \"\"\"{self._compress(cv_text, job_text, share=0.5)}\"\"\"
+OFFRE: \"\"\"{self._compress(job_text, cv_text, share=0.5)}\"\"\"
 
 ÉCHANGES:
 {chr(10).join(qa_block)}
-
-JSON uniquement:
-{{
-  "score_global": 7,
-  "points_forts": ["..."],
-  "points_amelioration": ["..."],
-  "suggestions": [
-    {{"titre": "...", "description": "...", "priorite": "haute|moyenne|basse"}}
-  ],
-  "conseils_specifiques": [
-    {{"question": "...", "conseil": "..."}}
-  ]
-}}"""
-
-        try:
-            analysis = self._generate_json(prompt, temperature=0.3)
-            if isinstance(analysis, dict):
-                return {"success": True, "analysis": analysis}
-        except Exception as exc:
-            print(f"Erreur analyse entretien: {exc}")
-
-        return self._fallback_analysis()
+"""
 
     @staticmethod
     def _fallback_questions(num_questions: int) -> list[dict[str, str]]:
@@ -0,0 +1,170 @@
+"""Comparaisons en lot : une offre ↔ N CV (ou un CV ↔ N offres), parallélisme borné."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from app.services.ai_service import ai_service
+from app.services.comparison_service import sse_event
+
+# Reçoit (offer_text, cv_text, résultat) ; renvoie l'id de l'enregistrement persisté
+BatchPersistCallback = Callable[[str, str, dict[str, Any]], str | None]
+
+
+@dataclass
+class BatchCandidate:
+    label: str
+    text: str
+    error: str | None = None
+
+
+def _ranking(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    ranked = sorted(
+        (e for e in entries if e.get("error") is None),
+        key=lambda e: e["matchPercentage"],
+        reverse=True,
+    )
+    return [{"rank": position, **entry} for position, entry in enumerate(ranked, start=1)]
+
+
+async def _fan_out(
+    pairs: list[tuple[str, str]],
+    candidates: list[BatchCandidate],
+    concurrency: int,
+    tasks: list[asyncio.Task[Any]],
+) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+    """Lance les comparaisons (offre, CV) sous sémaphore ; rend (index, résultat) à la fin de chacune."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int) -> tuple[int, dict[str, Any]]:
+        candidate = candidates[index]
+        if candidate.error is not None:
+            return index, {"error": candidate.error}
+        offer_text, cv_text = pairs[index]
+        async with semaphore:
+            try:
+                result = await ai_service.compare_offer_and_cv_async(offer_text, cv_text)
+            except Exception as exc:
+                print(f"Erreur comparaison lot ({candidate.label}): {exc}")
+                return index, {"error": str(exc)}
+        return index, result
+
+    tasks.extend(asyncio.create_task(run(i)) for i in range(len(pairs)))
+    for finished in asyncio.as_completed(tasks):
+        yield await finished
+
+
+async def _stream_fan_out(
+    pairs: list[tuple[str, str]],
+    candidates: list[BatchCandidate],
+    *,
+    concurrency: int,
+    on_result: BatchPersistCallback | None,
+    status_message: str,
+    leaderboard: bool,
+) -> AsyncIterator[bytes]:
+    total = len(candidates)
+    tasks: list[asyncio.Task[Any]] = []
+    entries: list[dict[str, Any]] = []
+    try:
+        yield sse_event({"type": "status", "message": status_message})
+        yield sse_event({"type": "progress", "value": 0, "current": 0, "total": total})
+
+        done_count = 0
+        async for index, result in _fan_out(pairs, candidates, concurrency, tasks):
+            done_count += 1
+            entry: dict[str, Any] = {
+                "index": index,
+                "label": candidates[index].label,
+                "error": result.get("error"),
+            }
+
+            if entry["error"] is None:
+                summary = result["summary"]
+                entry["matchPercentage"] = summary.get("matchPercentage") or 0.0
+                entry["comparison_id"] = None
+                if on_result is not None:
+                    try:
+                        entry["comparison_id"] = on_result(*pairs[index], result)
+                    except Exception as persist_exc:
+                        print(f"Erreur persistance comparaison lot: {persist_exc}")
+                yield sse_event(
+                    {
+                        "type": "result",
+                        **entry,
+                        "items": result["items"],
+                        "summary": summary,
+                    }
+                )
+            else:
+                yield sse_event({"type": "result", **entry})
+
+            entries.append(entry)
+            if leaderboard:
+                yield sse_event({"type": "leaderboard", "leaderboard": _ranking(entries)})
+            yield sse_event(
+                {
+                    "type": "progress",
+                    "value": done_count / max(total, 1) * 100,
+                    "current": done_count,
+                    "total": total,
+                }
+            )
+
+        yield sse_event({"type": "ranking", "ranking": _ranking(entries)})
+        yield sse_event({"type": "complete"})
+
+    except Exception as exc:
+        print(f"Erreur comparaison lot: {exc}")
+        yield sse_event({"type": "error", "message": str(exc)})
+    finally:
+        # Client déconnecté ou erreur : ne pas laisser de comparaisons orphelines
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def stream_batch_comparison(
+    offer_text: str,
+    candidates: list[BatchCandidate],
+    *,
+    concurrency: int,
+    on_result: BatchPersistCallback | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Une offre ↔ N CV. Flux SSE :
+    - un événement `result` par CV dès que sa comparaison se termine
+    - un événement `ranking` final trié par matchPercentage, puis `complete`
+    """
+    return _stream_fan_out(
+        [(offer_text, c.text) for c in candidates],
+        candidates,
+        concurrency=concurrency,
+        on_result=on_result,
+        status_message=f"Analyse de {len(candidates)} CV en parallèle (max {concurrency})…",
+        leaderboard=False,
+    )
+
+
+def stream_offer_ranking(
+    cv_text: str,
+    offers: list[BatchCandidate],
+    *,
+    concurrency: int,
+    on_result: BatchPersistCallback | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Un CV ↔ N offres. Le CV brut est transmis à chaque comparaison (même clé de
+    cache qu'une comparaison unitaire) ; un `leaderboard` trié est émis à chaque résultat.
+    """
+    return _stream_fan_out(
+        [(o.text, cv_text) for o in offers],
+        offers,
+        concurrency=concurrency,
+        on_result=on_result,
+        status_message=f"Analyse du CV face à {len(offers)} offres (max {concurrency} en parallèle)…",
+        leaderboard=True,
+    )
@@ -0,0 +1,163 @@
+"""Cache de résultats IA à deux niveaux : LRU en mémoire (TTL) + Redis partagé."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from app.config import settings
+from app.services.redis_service import redis_service
+
+
+def normalize_text(text: str) -> str:
+    """Normalisation utilisée pour les clés : NFC + espaces compactés."""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_key(*parts: Any) -> str:
+    """Empreinte SHA-256 stable des textes normalisés et des paramètres."""
+    digest = hashlib.sha256()
+    for part in parts:
+        value = normalize_text(part) if isinstance(part, str) else json.dumps(part)
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Niveau 1 : LRU en mémoire du processus, avec TTL.
+    Niveau 2 : Redis (connexion de redis_service), partagé entre workers.
+    Les valeurs sont stockées sérialisées en JSON : chaque lecture renvoie une copie.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        ttl_seconds: int | None = None,
+        max_entries: int | None = None,
+    ) -> None:
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds or settings.AI_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.AI_CACHE_MAX_ENTRIES
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Appelé depuis la boucle asyncio et depuis des threads (to_thread)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"ai_cache:{self.namespace}:{key}"
+
+    def _memory_get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def _memory_set(self, key: str, payload: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Any | None:
+        if not settings.AI_CACHE_ENABLED:
+            return None
+
+        payload = self._memory_get(key)
+        if payload is not None:
+            self.memory_hits += 1
+            return json.loads(payload)
+
+        if redis_service.redis_available:
+            try:
+                payload = redis_service.redis_client.get(self._redis_key(key))
+            except Exception as exc:
+                print(f"Erreur Redis lecture cache {self.namespace}: {exc}")
+                payload = None
+            if payload is not None:
+                self.redis_hits += 1
+                self._memory_set(key, payload, self.ttl_seconds)
+                return json.loads(payload)
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, *, ttl_seconds: int | None = None) -> None:
+        if not settings.AI_CACHE_ENABLED:
+            return
+
+        ttl = ttl_seconds or self.ttl_seconds
+        payload = json.dumps(value, ensure_ascii=False)
+        self._memory_set(key, payload, ttl)
+        self.writes += 1
+
+        if redis_service.redis_available:
+            try:
+                redis_service.redis_client.setex(self._redis_key(key), ttl, payload)
+            except Exception as exc:
+                print(f"Erreur Redis écriture cache {self.namespace}: {exc}")
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        if redis_service.redis_available:
+            try:
+                redis_service.redis_client.delete(self._redis_key(key))
+            except Exception as exc:
+                print(f"Erreur Redis invalidation cache {self.namespace}: {exc}")
+
+    def clear(self) -> None:
+        """Vide le niveau mémoire (Redis expire seul via TTL)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        hits = self.memory_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "enabled": settings.AI_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+# Résultats de compare_offer_and_cv_async
+comparison_cache = ResultCache("comparison")
+
+# Exigences extraites d'une offre (mode deux étapes), réutilisées pour chaque CV
+offer_requirements_cache = ResultCache(
+    "offer_requirements",
+    ttl_seconds=settings.OFFER_REQUIREMENTS_TTL_SECONDS,
+)
+
+# Questions d'entretien générées pour un couple CV / offre (simulateur rouvert)
+interview_questions_cache = ResultCache(
+    "interview_questions",
+    ttl_seconds=settings.INTERVIEW_QUESTIONS_TTL_SECONDS,
+)
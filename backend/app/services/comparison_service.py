@@ -1,19 +1,296 @@
-"""Comparaison CV ↔ offre : 1 appel Gemini puis streaming progressif des items."""
+"""Comparaison CV ↔ offre : streaming Gemini, items diffusés dès leur décodage."""
 
 from __future__ import annotations
 
 import asyncio
 import json
+import os
+import socket
+import time
 from collections.abc import AsyncIterator, Callable
 from typing import Any
 
-from app.services.ai_service import ai_service
+from app.config import settings
+from app.services.ai_service import ai_service, is_llm_unavailable
+from app.services.lexical_engine import compare_locally
+from app.services.llm_metrics import collect_llm_calls, summarize_usage
+from app.services.model_router import STANDARD_TIER, routing_tier
+from app.services.redis_service import redis_service
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : repli sur json
+    orjson = None
 
 PersistCallback = Callable[[list[Any], dict[str, Any]], None]
 
+FAST_MODE = "fast"
+# Commentaire SSE : garde la connexion active (proxys) et révèle les clients partis
+SSE_HEARTBEAT = b": ping\n\n"
+FLIGHT_KEY_PREFIX = "comparison:flight"
+# Intervalle de consultation du résultat d'un appel mené par un autre worker
+_REMOTE_POLL_SECONDS = 0.5
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Flight:
+    """
+    Un appel LLM partagé par toutes les requêtes concurrentes au même contenu.
+    Les événements sont conservés : chaque abonné rejoue depuis le début puis
+    suit le flux en direct, avec son propre flux SSE.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.events: list[dict[str, Any]] = []
+        self.finished = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task[None] | None = None
+        self._updated = asyncio.Event()
+
+    def publish(self, event: dict[str, Any]) -> None:
+        self.events.append(event)
+        self._wake()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.finished = True
+        self.error = error
+        self._wake()
+
+    def _wake(self) -> None:
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[dict[str, Any]]:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._updated.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished and self.task is not None:
+                # Plus personne n'attend ce résultat : libérer le quota
+                _forget_flight(self)
+                self.task.cancel()
+                flight_stats["cancelled"] += 1
+
+
+_flights: dict[str, _Flight] = {}
+flight_stats = {"started": 0, "coalesced": 0, "remote_followed": 0, "cancelled": 0}
+
+
+def _forget_flight(flight: _Flight) -> None:
+    if _flights.get(flight.key) is flight:
+        del _flights[flight.key]
+
+
+def _flight_redis_key(key: str) -> str:
+    return f"{FLIGHT_KEY_PREFIX}:{key}"
+
+
+def _try_lead_remote_flight(key: str) -> bool:
+    """Verrou Redis : True si ce worker exécute l'appel (ou si Redis est absent)."""
+    if not redis_service.redis_available:
+        return True
+    try:
+        acquired = redis_service.redis_client.set(
+            _flight_redis_key(key), WORKER_ID, nx=True, ex=settings.SSE_TIMEOUT
+        )
+        return bool(acquired)
+    except Exception as exc:
+        print(f"Erreur Redis verrou comparaison: {exc}")
+        return True
+
+
+def _flight_result_key(key: str) -> str:
+    return f"{_flight_redis_key(key)}:result"
+
+
+def _release_remote_flight(key: str, result: dict[str, Any] | None) -> None:
+    if not redis_service.redis_available:
+        return
+    try:
+        if result is not None:
+            # Résultat non mis en cache (ex. modèle de repli) : transmis aux suiveurs
+            redis_service.redis_client.set(
+                _flight_result_key(key),
+                json.dumps(result, ensure_ascii=False),
+                ex=settings.SSE_TIMEOUT,
+            )
+        redis_service.redis_client.delete(_flight_redis_key(key))
+    except Exception as exc:
+        print(f"Erreur Redis publication comparaison: {exc}")
+
 
-def _sse(payload: dict[str, Any]) -> str:
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+def _remote_result(key: str) -> tuple[bool, dict[str, Any] | None]:
+    """(terminé, résultat) de l'appel mené par le worker leader."""
+    cached = ai_service.get_cached_comparison_by_key(key)
+    if cached is not None:
+        return True, cached
+    published = redis_service.redis_client.get(_flight_result_key(key))
+    if published is not None:
+        return True, json.loads(published)
+    return not redis_service.redis_client.exists(_flight_redis_key(key)), None
+
+
+async def _wait_remote_result(key: str) -> dict[str, Any] | None:
+    """
+    Attend le résultat du worker leader en consultant Redis à intervalle
+    régulier (annulable, sans thread réservé). None si le leader a disparu
+    sans résultat ou délai dépassé.
+    """
+    deadline = time.monotonic() + settings.SSE_TIMEOUT
+    while time.monotonic() < deadline:
+        done, result = await asyncio.to_thread(_remote_result, key)
+        if done:
+            return result
+        await asyncio.sleep(_REMOTE_POLL_SECONDS)
+    return None
+
+
+async def _run_flight(flight: _Flight, offer_text: str, cv_text: str) -> None:
+    leader = _try_lead_remote_flight(flight.key)
+    result: dict[str, Any] | None = None
+    try:
+        if not leader:
+            flight_stats["remote_followed"] += 1
+            try:
+                result = await _wait_remote_result(flight.key)
+            except Exception as exc:
+                print(f"Erreur Redis attente comparaison: {exc}")
+            if result is not None:
+                for item in result["items"]:
+                    flight.publish({"type": "item", "item": item})
+                flight.publish({"type": "summary", "summary": result["summary"]})
+                flight.finish()
+                return
+
+        items: list[dict[str, Any]] = []
+        async for event in ai_service.stream_compare_offer_and_cv(offer_text, cv_text):
+            if event["type"] == "item":
+                items.append(event["item"])
+            else:
+                result = {"items": items, "summary": event["summary"]}
+            flight.publish(event)
+        flight.finish()
+    except asyncio.CancelledError:
+        flight.finish(RuntimeError("Analyse annulée"))
+        raise
+    except Exception as exc:
+        flight.finish(exc)
+    finally:
+        _forget_flight(flight)
+        if leader and redis_service.redis_available:
+            await asyncio.to_thread(_release_remote_flight, flight.key, result)
+
+
+def coalesced_comparison_events(
+    offer_text: str, cv_text: str
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Single-flight : les requêtes simultanées pour le même contenu partagent un
+    seul appel Gemini (dans le worker, et entre workers via verrou + résultat Redis).
+    """
+    key = ai_service.comparison_cache_key(offer_text, cv_text)
+    flight = _flights.get(key)
+    if flight is None:
+        flight = _Flight(key)
+        _flights[key] = flight
+        flight.task = asyncio.create_task(_run_flight(flight, offer_text, cv_text))
+        flight_stats["started"] += 1
+    else:
+        flight_stats["coalesced"] += 1
+    return flight.subscribe()
+
+
+def coalescing_stats() -> dict[str, Any]:
+    return {**flight_stats, "in_flight": len(_flights)}
+
+
+def sse_event(payload: dict[str, Any]) -> bytes:
+    """Trame SSE encodée directement en octets (orjson si disponible)."""
+    if orjson is not None:
+        return b"data: " + orjson.dumps(payload) + b"\n\n"
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return f"data: {body}\n\n".encode()
+
+
+async def _event_batches(
+    events: AsyncIterator[dict[str, Any]],
+    max_items: int,
+    heartbeat: float | None = None,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Regroupe les événements déjà disponibles (jusqu'à `max_items`) sans en
+    attendre de nouveaux : un lot par item en streaming Gemini, un seul lot
+    pour le moteur local ou un résultat rejoué. Lot vide après `heartbeat`
+    secondes sans événement (attente du modèle).
+    """
+    queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for event in events:
+                queue.put_nowait(("event", event))
+        except Exception as exc:
+            queue.put_nowait(("error", exc))
+        else:
+            queue.put_nowait(("done", None))
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield []
+                continue
+            batch: list[dict[str, Any]] = []
+            while True:
+                if kind == "error":
+                    if batch:
+                        yield batch
+                    raise value
+                if kind == "done":
+                    if batch:
+                        yield batch
+                    return
+                batch.append(value)
+                if len(batch) >= max_items or queue.empty():
+                    break
+                kind, value = queue.get_nowait()
+            yield batch
+    finally:
+        # Client parti : l'abonnement (et l'appel Gemini s'il est seul) est annulé
+        task.cancel()
+
+
+def _progress(count: int) -> dict[str, Any]:
+    # Total inconnu pendant le streaming : progression asymptotique vers 95 %
+    return {
+        "type": "progress",
+        "value": 95 - 80 * (0.85 ** count),
+        "current": count,
+        "total": count,
+    }
+
+
+async def _local_comparison_events(
+    offer_text: str, cv_text: str
+) -> AsyncIterator[dict[str, Any]]:
+    result = compare_locally(offer_text, cv_text)
+    for item in result["items"]:
+        yield {"type": "item", "item": item}
+    yield {"type": "summary", "summary": result["summary"]}
 
 
 async def stream_comparison(
@@ -22,69 +299,114 @@ async def stream_comparison(
     *,
     intro_message: str = "Début de l'analyse…",
     on_result: PersistCallback | None = None,
-) -> AsyncIterator[str]:
+    mode: str | None = None,
+    tier: str = STANDARD_TIER,
+) -> AsyncIterator[bytes]:
     """
-    Flux SSE optimisé :
-    1) statuts pendant l'appel LLM unique
-    2) items diffusés un par un pour une UI progressive
-    3) summary + complete
+    Flux SSE :
+    1) statuts pendant l'attente du premier token
+    2) chaque item émis dès qu'il est décodé de la réponse Gemini en streaming
+    3) summary (construit incrémentalement) + complete
+    En mode « fast », ou si Gemini est indisponible avant le premier item
+    (délai, saturation, quota), le moteur lexical local prend le relais.
+    `tier` : niveau de l'utilisateur pour le routage des modèles (essai gratuit).
+    Aucun délai artificiel entre les items (SSE_ITEM_DELAY_MS) ; avec
+    SSE_COMBINED_ITEMS, les items déjà disponibles partent dans une seule
+    trame « items » qui porte aussi la progression. Pendant l'attente du
+    modèle, un commentaire SSE toutes les SSE_HEARTBEAT_SECONDS.
     """
+    items: list[dict[str, Any]] = []
+    state: dict[str, Any] = {"summary": {}}
+    combine = settings.SSE_COMBINED_ITEMS
+    delay = settings.SSE_ITEM_DELAY_MS / 1000
+
+    def frames(batch: list[dict[str, Any]]) -> list[bytes]:
+        new_items = []
+        for event in batch:
+            if event["type"] == "summary":
+                state["summary"] = event["summary"]
+            else:
+                new_items.append(event["item"])
+        if not new_items:
+            return []
+        first = len(items) + 1
+        items.extend(new_items)
+        if combine:
+            return [
+                sse_event(
+                    {"type": "items", "items": new_items, "progress": _progress(len(items))}
+                )
+            ]
+        out = []
+        for count, item in enumerate(new_items, start=first):
+            out.append(sse_event(_progress(count)))
+            out.append(sse_event({"type": "item", "item": item}))
+        return out
+
+    async def relay(events: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
+        batch_size = settings.SSE_MAX_BATCH_ITEMS if combine else 1
+        async for batch in _event_batches(events, batch_size, settings.SSE_HEARTBEAT_SECONDS):
+            if not batch:
+                yield SSE_HEARTBEAT
+                continue
+            for frame in frames(batch):
+                yield frame
+            if delay:
+                await asyncio.sleep(delay)
+
     try:
-        yield _sse({"type": "status", "message": intro_message})
-        yield _sse(
+        fast = mode == FAST_MODE
+        yield sse_event({"type": "status", "message": intro_message})
+        yield sse_event(
             {
                 "type": "status",
-                "message": "Analyse ATS par Gemini (extraction + matching)…",
+                "message": (
+                    "Analyse locale rapide (mots-clés)…"
+                    if fast
+                    else "Analyse ATS par Gemini (extraction + matching)…"
+                ),
             }
         )
-        yield _sse({"type": "progress", "value": 12, "current": 0, "total": 1})
+        yield sse_event({"type": "progress", "value": 12, "current": 0, "total": 1})
 
-        result = await asyncio.to_thread(
-            ai_service.compare_offer_and_cv,
-            offer_text,
-            cv_text,
-        )
+        # La tâche de l'appel partagé hérite de la liste et du niveau utilisateur
+        with collect_llm_calls() as llm_calls, routing_tier(tier):
+            if fast:
+                events = _local_comparison_events(offer_text, cv_text)
+            else:
+                events = coalesced_comparison_events(offer_text, cv_text)
+        try:
+            async for frame in relay(events):
+                yield frame
+        except Exception as llm_exc:
+            if fast or items or not is_llm_unavailable(llm_exc):
+                raise
+            print(f"Gemini indisponible, bascule sur le moteur local: {llm_exc!r}")
+            yield sse_event(
+                {
+                    "type": "status",
+                    "message": "Gemini indisponible — analyse locale rapide…",
+                }
+            )
+            async for frame in relay(_local_comparison_events(offer_text, cv_text)):
+                yield frame
 
-        items = result["items"]
-        summary = result["summary"]
+        summary = state["summary"]
         total = len(items)
 
         if on_result is not None:
             try:
-                on_result(items, summary)
+                on_result(items, {**summary, "usage": summarize_usage(llm_calls)})
             except Exception as persist_exc:
                 print(f"Erreur persistance comparaison: {persist_exc}")
 
-        yield _sse(
-            {
-                "type": "status",
-                "message": f"{total} exigences analysées — diffusion des résultats…",
-            }
-        )
-        yield _sse({"type": "progress", "value": 35, "current": 0, "total": total})
-
-        for index, item in enumerate(items):
-            # Progress 35% → 95% pendant la diffusion
-            progress = 35 + ((index + 1) / max(total, 1)) * 60
-            yield _sse(
-                {
-                    "type": "progress",
-                    "value": progress,
-                    "current": index + 1,
-                    "total": total,
-                }
-            )
-            yield _sse({"type": "item", "item": item})
-            # Petite pause pour l'animation front (sans ralentir trop)
-            await asyncio.sleep(0.04)
-
-        yield _sse({"type": "progress", "value": 100, "current": total, "total": total})
-        yield _sse({"type": "summary", "summary": summary})
-        yield _sse({"type": "complete"})
+        yield sse_event({"type": "progress", "value": 100, "current": total, "total": total})
+        yield sse_event({"type": "summary", "summary": summary})
+        yield sse_event({"type": "complete"})
 
     except Exception as exc:
         print(f"Erreur stream_comparison: {exc}")
-        yield _sse({"type": "error", "message": str(exc)})
+        yield sse_event({"type": "error", "message": str(exc)})
 
 
 class ComparisonService:
@@ -95,4 +417,4 @@ class ComparisonService:
 
     async def compare_cv_offer_stream(self, offer_text: str, cv_text: str, job_category: str = None):
         # Conservé pour compat éventuelle — préférer stream_comparison
-        return ai_service.compare_offer_and_cv(offer_text, cv_text)
+        return await ai_service.compare_offer_and_cv_async(offer_text, cv_text)
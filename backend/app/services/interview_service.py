@@ -1,27 +1,49 @@
-from typing import Dict, Any
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Dict, Any, Optional
+from app.config import settings
 from app.services.ai_service import ai_service
+from app.services.cache_service import interview_questions_cache
+from app.services.comparison_service import sse_event
+from app.services.llm_limiter import LLMOverloadedError, llm_limiter
+from app.services.llm_resilience import circuit_breaker
+from app.services.llm_metrics import collect_llm_calls, summarize_usage
 from app.services.upload_service import UploadService
 import uuid
 from datetime import datetime
 
+# Reçoit l'analyse (avec usage) et renvoie l'id de l'entretien enregistré
+AnalysisPersistCallback = Callable[[Dict[str, Any]], Optional[str]]
+
+# Écarts de la comparaison transmis comme points à approfondir
+SPECULATIVE_FOCUS_ITEMS = 6
+# Intervalle de vérification de la charge avant de démarrer une pré-génération
+_SPECULATIVE_POLL_SECONDS = 1.0
+
+_speculative_tasks: Dict[str, asyncio.Task] = {}
+_speculation_counters = {"scheduled": 0, "skipped": 0, "completed": 0, "abandoned": 0, "failed": 0}
+
 class InterviewService:
     def __init__(self):
         self.ai_service = ai_service
         self.upload_service = UploadService()
 
     
-    async def generate_interview_questions(self, cv_file: bytes, job_text: str, num_questions: int = 10) -> Dict[str, Any]:
+    async def generate_interview_questions(self, cv_file: bytes, job_text: str, num_questions: int = 10, regenerate: bool = False) -> Dict[str, Any]:
         """
         Génère des questions d'entretien basées sur le CV et l'offre d'emploi.
         
         Args:
             cv_file: Fichier CV en bytes
             job_text: Fichier offre d'emploi en texte
-            num_questions: Nombre de questions à générer
+            num_questions: Nombre de questions à générer (plafonné à INTERVIEW_MAX_QUESTIONS)
+            regenerate: Ignorer les questions en cache pour ce CV / cette offre
             
         Returns:
             Dictionnaire contenant les questions et les métadonnées
         """
+        num_questions = clamp_question_count(num_questions)
         try:
             # Extraire le texte des fichiers
             cv_text = await self._extract_text_from_file(cv_file)
@@ -45,27 +67,21 @@ class InterviewService:
             
             # Générer les questions avec l'IA
             print("Appel du service IA pour générer les questions...")
-            questions = self.ai_service.generate_interview_questions(
+            questions = await self.ai_service.generate_interview_questions_async(
                 cv_text, 
                 job_text, 
-                num_questions
+                num_questions,
+                regenerate=regenerate,
             )
             
-            # Créer une session d'entretien
-            interview_session = {
-                "id": str(uuid.uuid4()),
-                "created_at": datetime.utcnow().isoformat(),
-                "num_questions": len(questions),
-                "estimated_time": len(questions) * 2,  # 2 minutes par question
-                "questions": questions
-            }
-            
             return {
                 "success": True,
-                "interview_session": interview_session,
+                "interview_session": build_interview_session(questions),
                 "message": f"{len(questions)} questions générées avec succès"
             }
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             print(f"Erreur dans generate_interview_questions: {e}")
             import traceback
@@ -119,7 +135,7 @@ class InterviewService:
             Dictionnaire contenant l'analyse
         """
         try:
-            result = self.ai_service.analyze_interview_responses(
+            result = await self.ai_service.analyze_interview_responses_async(
                 questions, 
                 answers, 
                 cv_text, 
@@ -128,10 +144,214 @@ class InterviewService:
             
             return result
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
                 "message": "Erreur lors de l'analyse des réponses"
             }
-    
\ No newline at end of file
+    
+
+
+async def stream_interview_analysis(
+    questions: list,
+    answers: list,
+    cv_text: str,
+    job_text: str,
+    *,
+    on_result: Optional[AnalysisPersistCallback] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Flux SSE de l'analyse d'entretien (même protocole que stream_comparison) :
+    1) statuts pendant l'attente du premier token
+    2) score_global puis chaque point fort / axe / suggestion / conseil dès son décodage
+    3) analysis (objet complet validé, persisté via on_result) + complete
+    """
+    try:
+        yield sse_event({"type": "status", "message": "Analyse de vos réponses…"})
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async for event in ai_service.stream_interview_analysis(
+                    questions, answers, cv_text, job_text
+                ):
+                    queue.put_nowait(event)
+                queue.put_nowait(None)
+            except Exception as exc:
+                queue.put_nowait(exc)
+
+        # La tâche hérite de la liste : appels Gemini de cette analyse
+        with collect_llm_calls() as llm_calls:
+            task = asyncio.create_task(pump())
+        analysis: Dict[str, Any] = {}
+        try:
+            while (event := await queue.get()) is not None:
+                if isinstance(event, Exception):
+                    raise event
+                if event["type"] == "analysis":
+                    analysis = event["analysis"]
+                else:
+                    yield sse_event(event)
+        finally:
+            # Client déconnecté : inutile de poursuivre l'appel Gemini
+            task.cancel()
+
+        interview_id = None
+        if on_result is not None:
+            try:
+                interview_id = await asyncio.to_thread(
+                    on_result, {**analysis, "usage": summarize_usage(llm_calls)}
+                )
+            except Exception as persist_exc:
+                print(f"Erreur persistance entretien: {persist_exc}")
+
+        yield sse_event({"type": "analysis", "analysis": analysis})
+        yield sse_event({"type": "complete", "interview_id": interview_id})
+
+    except Exception as exc:
+        print(f"Erreur stream_interview_analysis: {exc}")
+        yield sse_event({"type": "error", "message": str(exc)})
+
+
+def clamp_question_count(num_questions: Optional[int]) -> int:
+    """Nombre de questions demandé, borné côté serveur (1 à INTERVIEW_MAX_QUESTIONS)."""
+    return max(1, min(settings.INTERVIEW_MAX_QUESTIONS, num_questions or 10))
+
+
+def build_interview_session(questions: list) -> Dict[str, Any]:
+    """Session d'entretien renvoyée au simulateur."""
+    return {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.utcnow().isoformat(),
+        "num_questions": len(questions),
+        "estimated_time": len(questions) * 2,  # 2 minutes par question
+        "questions": questions
+    }
+
+
+async def stream_interview_questions(
+    cv_file: bytes,
+    job_text: str,
+    num_questions: Optional[int] = 10,
+    *,
+    regenerate: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Flux SSE des questions d'entretien (génération en fan-out par catégorie) :
+    1) statuts
+    2) chaque question dès le retour de son groupe, avec la progression
+    3) session (questions fusionnées et dédoublonnées) + complete
+    """
+    total = clamp_question_count(num_questions)
+    try:
+        yield sse_event({"type": "status", "message": "Lecture du CV…"})
+        cv_text = await InterviewService()._extract_text_from_file(cv_file)
+        if not cv_text.strip():
+            raise ValueError("Le fichier CV semble être vide ou corrompu")
+        if not job_text.strip():
+            raise ValueError("Veuillez fournir une description de l'offre d'emploi")
+
+        yield sse_event({"type": "status", "message": "Génération des questions…"})
+        questions: list = []
+        async for question in ai_service.stream_interview_questions(
+            cv_text, job_text, total, regenerate=regenerate
+        ):
+            questions.append(question)
+            yield sse_event(
+                {
+                    "type": "progress",
+                    "value": min(100, len(questions) / total * 100),
+                    "current": len(questions),
+                    "total": total,
+                }
+            )
+            yield sse_event({"type": "question", "question": question})
+
+        yield sse_event({"type": "session", "interview_session": build_interview_session(questions)})
+        yield sse_event({"type": "complete"})
+
+    except LLMOverloadedError as exc:
+        # Flux déjà ouvert : plus de 503 possible, le délai passe dans l'événement
+        yield sse_event({"type": "error", "message": str(exc), "retry_after": exc.retry_after})
+    except Exception as exc:
+        print(f"Erreur stream_interview_questions: {exc}")
+        yield sse_event({"type": "error", "message": str(exc)})
+
+
+def schedule_question_pregeneration(
+    offer_text: str, cv_text: str, items: list
+) -> Optional[asyncio.Task]:
+    """
+    Après une comparaison : pré-génère les questions d'entretien du même couple
+    CV / offre dans le cache, en tâche de fond de basse priorité. Les écarts
+    (missing / unclear) servent de points à approfondir.
+    """
+    if not settings.SPECULATIVE_QUESTIONS_ENABLED:
+        return None
+    num_questions = settings.SPECULATIVE_QUESTIONS_COUNT
+    key = ai_service.questions_cache_key(cv_text, offer_text, num_questions)
+    if (
+        key in _speculative_tasks
+        or len(_speculative_tasks) >= settings.SPECULATIVE_MAX_TASKS
+        or interview_questions_cache.get(key) is not None
+    ):
+        _speculation_counters["skipped"] += 1
+        return None
+
+    focus = [
+        item["offerText"]
+        for item in items
+        if item.get("status") in ("missing", "unclear") and item.get("offerText")
+    ][:SPECULATIVE_FOCUS_ITEMS]
+    task = asyncio.create_task(
+        _pregenerate_questions(cv_text, offer_text, num_questions, focus)
+    )
+    _speculative_tasks[key] = task
+    task.add_done_callback(lambda _: _speculative_tasks.pop(key, None))
+    _speculation_counters["scheduled"] += 1
+    return task
+
+
+async def _pregenerate_questions(
+    cv_text: str, offer_text: str, num_questions: int, focus: list
+) -> None:
+    # Démarre seulement quand le trafic interactif laisse de la marge (ou abandonne)
+    deadline = time.monotonic() + settings.SPECULATIVE_START_TIMEOUT
+    while not (
+        circuit_breaker.state == "closed"
+        and llm_limiter.has_spare_capacity(settings.SPECULATIVE_MAX_LOAD)
+    ):
+        if time.monotonic() >= deadline:
+            _speculation_counters["abandoned"] += 1
+            return
+        await asyncio.sleep(_SPECULATIVE_POLL_SECONDS)
+
+    try:
+        questions = await ai_service.start_questions_generation(
+            cv_text, offer_text, num_questions, focus
+        )
+    except Exception as exc:
+        print(f"Erreur pré-génération questions: {exc!r}")
+        _speculation_counters["failed"] += 1
+        return
+    _speculation_counters["completed" if questions else "failed"] += 1
+
+
+def cancel_question_pregeneration() -> int:
+    """Annule les pré-générations en cours (arrêt du serveur) ; renvoie leur nombre."""
+    tasks = list(_speculative_tasks.values())
+    for task in tasks:
+        task.cancel()
+    return len(tasks)
+
+
+def speculation_stats() -> Dict[str, Any]:
+    return {
+        "enabled": settings.SPECULATIVE_QUESTIONS_ENABLED,
+        "in_flight": len(_speculative_tasks),
+        **_speculation_counters,
+    }
@@ -0,0 +1,267 @@
+"""
+File de jobs : l'API ne fait que mettre en file les comparaisons et analyses
+d'entretien, puis diffuse (ou expose) leur journal de trames (stream_jobs).
+Avec JOB_QUEUE_BACKEND=redis, des workers dédiés (python -m app.worker)
+exécutent les jobs ; sinon, ou si Redis est absent, ils tournent dans une
+tâche du processus web (mode local, développement).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from app.config import settings
+from app.models.comparison_record import ComparisonRecord
+from app.models.interview_record import InterviewRecord
+from app.services.comparison_service import WORKER_ID, stream_comparison
+from app.services.interview_service import (
+    schedule_question_pregeneration,
+    stream_interview_analysis,
+)
+from app.services.llm_limiter import (
+    LLMOverloadedError,
+    llm_limiter,
+    overloaded_http_exception,
+)
+from app.services.llm_metrics import llm_metrics
+from app.services.llm_resilience import resilience_stats
+from app.services.persistence_queue import persistence_queue
+from app.services.redis_service import redis_service
+from app.services.stream_jobs import (
+    StreamJob,
+    announce_job,
+    new_job_id,
+    run_job,
+    start_job,
+    watch_remote_followers,
+)
+
+QUEUE_KEY = "jobs:queue"
+WORKER_KEY_PREFIX = "jobs:worker"
+
+COMPARISON_JOB = "comparison"
+INTERVIEW_ANALYSIS_JOB = "interview_analysis"
+
+JobHandler = Callable[[str, dict[str, Any]], AsyncIterator[bytes]]
+
+queue_stats = {"enqueued": 0, "local": 0, "executed": 0, "unknown": 0, "rejected": 0}
+
+
+def _comparison_job(user_id: str, args: dict[str, Any]) -> AsyncIterator[bytes]:
+    offer_text, cv_text = args["offer_text"], args["cv_text"]
+
+    def persist(items, summary) -> None:
+        persistence_queue.enqueue(
+            ComparisonRecord.from_analysis(
+                user_id=uuid.UUID(user_id),
+                offer_text=offer_text,
+                cv_text=cv_text,
+                items=items,
+                summary=summary,
+            )
+        )
+        # Le simulateur d'entretien suit souvent : questions prêtes en cache
+        schedule_question_pregeneration(offer_text, cv_text, items)
+
+    return stream_comparison(
+        offer_text,
+        cv_text,
+        intro_message="Début de l'analyse…",
+        on_result=persist,
+        mode=args.get("mode"),
+    )
+
+
+def _interview_analysis_job(user_id: str, args: dict[str, Any]) -> AsyncIterator[bytes]:
+    def persist(analysis) -> str | None:
+        # Écriture immédiate : l'identifiant diffusé est relu aussitôt par le client
+        return persistence_queue.write(
+            InterviewRecord.from_session(
+                user_id=uuid.UUID(user_id),
+                job_text=args["job_text"],
+                cv_text=args["cv_text"],
+                questions=args["questions"],
+                answers=args["answers"],
+                analysis=analysis,
+                duration_seconds=args.get("duration_seconds", 0),
+            )
+        )
+
+    return stream_interview_analysis(
+        args["questions"],
+        args["answers"],
+        args["cv_text"],
+        args["job_text"],
+        on_result=persist,
+    )
+
+
+JOB_HANDLERS: dict[str, JobHandler] = {
+    COMPARISON_JOB: _comparison_job,
+    INTERVIEW_ANALYSIS_JOB: _interview_analysis_job,
+}
+
+
+def uses_redis_queue() -> bool:
+    return settings.JOB_QUEUE_BACKEND == "redis" and redis_service.redis_available
+
+
+def publish_worker_state(concurrency: int, running: int) -> None:
+    """
+    Bloquant (worker) : état du worker (créneaux, limiteur, disjoncteur,
+    métriques Gemini) dans Redis, expiré s'il n'est plus rafraîchi.
+    """
+    state = {
+        "worker": WORKER_ID,
+        "concurrency": concurrency,
+        "running": running,
+        "limiter": llm_limiter.stats(),
+        "resilience": resilience_stats(),
+        "metrics": llm_metrics.snapshot(),
+        "updated_at": time.time(),
+    }
+    redis_service.redis_client.set(
+        f"{WORKER_KEY_PREFIX}:{WORKER_ID}",
+        json.dumps(state, ensure_ascii=False),
+        ex=max(1, math.ceil(settings.JOB_WORKER_REPORT_SECONDS * 3)),
+    )
+
+
+def forget_worker_state() -> None:
+    redis_service.redis_client.delete(f"{WORKER_KEY_PREFIX}:{WORKER_ID}")
+
+
+def worker_states() -> list[dict[str, Any]]:
+    """États publiés par les workers vivants (mode redis), [] sinon."""
+    if not uses_redis_queue():
+        return []
+    try:
+        keys = list(redis_service.redis_client.scan_iter(f"{WORKER_KEY_PREFIX}:*"))
+        values = redis_service.redis_client.mget(keys) if keys else []
+    except Exception as exc:
+        print(f"Erreur Redis état des workers: {exc}")
+        return []
+    return [json.loads(value) for value in values if value]
+
+
+def _check_queue_admission() -> None:
+    """
+    Bloquant : les appels Gemini tournent dans les workers, le limiteur de
+    l'API ne les voit pas. Refus si la file dépasse ce que les workers vivants
+    absorbent (JOB_QUEUE_MAX_BACKLOG_PER_SLOT jobs en attente par créneau).
+    """
+    try:
+        depth = redis_service.redis_client.llen(QUEUE_KEY)
+    except Exception as exc:
+        # enqueue_job se repliera sur l'exécution locale
+        print(f"Erreur Redis taille file de jobs: {exc}")
+        llm_limiter.check_admission()
+        return
+    states = worker_states()
+    capacity = sum(state["concurrency"] for state in states)
+    if depth < capacity * settings.JOB_QUEUE_MAX_BACKLOG_PER_SLOT:
+        return
+    queue_stats["rejected"] += 1
+    call_seconds = [state["limiter"]["avg_call_seconds"] for state in states]
+    average = sum(call_seconds) / len(call_seconds) if call_seconds else llm_limiter.avg_call_seconds
+    raise LLMOverloadedError(
+        "Service IA saturé, veuillez réessayer dans quelques instants",
+        max(1, math.ceil((depth + 1) / max(capacity, 1) * average)),
+    )
+
+
+async def ensure_job_capacity() -> None:
+    """
+    À appeler dans les routes avant enqueue_job : 503 + Retry-After si la
+    file des workers (mode redis) ou le limiteur local est saturé.
+    """
+    try:
+        if uses_redis_queue():
+            await asyncio.to_thread(_check_queue_admission)
+        else:
+            llm_limiter.check_admission()
+    except LLMOverloadedError as exc:
+        raise overloaded_http_exception(exc) from exc
+
+
+def _push_job(payload: dict[str, Any]) -> None:
+    """Bloquant (exécuté dans un thread) : annonce du job puis mise en file."""
+    announce_job(payload["job_id"], payload["user_id"])
+    redis_service.redis_client.lpush(QUEUE_KEY, json.dumps(payload, ensure_ascii=False))
+
+
+async def enqueue_job(kind: str, user_id: Any, args: dict[str, Any]) -> str:
+    """
+    Met un job en file et renvoie son identifiant ; la suite se lit via
+    follow_job / job_status. `args` doit être sérialisable en JSON.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Type de job inconnu: {kind}")
+    user_id = str(user_id)
+    if uses_redis_queue():
+        job_id = new_job_id()
+        payload = {"job_id": job_id, "kind": kind, "user_id": user_id, "args": args}
+        try:
+            await asyncio.to_thread(_push_job, payload)
+            queue_stats["enqueued"] += 1
+            return job_id
+        except Exception as exc:
+            print(f"Erreur Redis file de jobs, exécution locale: {exc}")
+    queue_stats["local"] += 1
+    return start_job(user_id, JOB_HANDLERS[kind](user_id, args)).job_id
+
+
+def dequeue_job(timeout: int) -> dict[str, Any] | None:
+    """Bloquant (worker) : prochain job de la file, None après `timeout` secondes."""
+    popped = redis_service.redis_client.brpop(QUEUE_KEY, timeout=timeout)
+    if popped is None:
+        return None
+    return json.loads(popped[1])
+
+
+async def execute_job(payload: dict[str, Any]) -> None:
+    """Exécute un job dépilé par un worker ; la trame 1 a été écrite par l'API."""
+    job = StreamJob(payload["job_id"], payload["user_id"], last_id=1)
+    handler = JOB_HANDLERS.get(payload["kind"])
+    if handler is None:
+        queue_stats["unknown"] += 1
+        print(f"Job ignoré, type inconnu: {payload['kind']}")
+        job.finish("failed")
+        return
+    queue_stats["executed"] += 1
+    task = asyncio.create_task(run_job(job, handler(payload["user_id"], payload["args"])))
+    watchdog = asyncio.create_task(watch_remote_followers(job, task))
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Job annulé faute de client : le worker continue ; sinon, arrêt du worker
+        orphaned = watchdog.done() and not watchdog.cancelled() and watchdog.result()
+        if not orphaned:
+            raise
+    finally:
+        watchdog.cancel()
+
+
+def job_queue_stats() -> dict[str, Any]:
+    depth = None
+    if uses_redis_queue():
+        try:
+            depth = redis_service.redis_client.llen(QUEUE_KEY)
+        except Exception as exc:
+            print(f"Erreur Redis taille file de jobs: {exc}")
+    workers = [
+        {"worker": state["worker"], "concurrency": state["concurrency"], "running": state["running"]}
+        for state in worker_states()
+    ]
+    return {
+        "backend": "redis" if uses_redis_queue() else "local",
+        "depth": depth,
+        "workers": workers,
+        **queue_stats,
+    }
@@ -0,0 +1,180 @@
+"""
+Moteur de comparaison local (sans LLM) : extraction heuristique des exigences,
+score TF-IDF / recouvrement de mots-clés, même format { items, summary } que Gemini.
+Utilisé en mode dégradé (Gemini lent ou indisponible) et en mode « fast ».
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import uuid
+from collections import Counter
+from typing import Any
+
+from app.services.ai_service import ComparisonAccumulator
+from app.utils.categorization import categorize_requirement
+from app.utils.text_tokens import fold, tokenize
+
+MAX_REQUIREMENTS = 18
+MATCH_THRESHOLD = 0.5
+UNCLEAR_THRESHOLD = 0.25
+
+_BULLET_RE = re.compile(r"^\s*(?:[-*•·▪►✓–]|\d+[.)])\s*")
+_SEGMENT_SPLIT_RE = re.compile(r"[\n;•·▪]+|(?<=[a-z\)])\.\s+", re.IGNORECASE)
+_SENIORITY_RE = re.compile(r"\b\d+\s*(?:ans|an|years?)\b|\bbac\b")
+
+# Mots de formulation d'une exigence, sans valeur pour le matching avec le CV
+_REQUIREMENT_FILLERS = frozenset(
+    """
+    maitrise connaissance connaissances competence bonne bon solide solides capacite
+    esprit minimum souhaite souhaitee requis requise exige apprecie idealement forte
+    fort aisance sens gout vous etes avez profil recherche must strong good knowledge
+    required preferred ability
+    """.split()
+)
+
+# Indices qu'une ligne de l'offre exprime une exigence
+_REQUIREMENT_CUES = (
+    "maitrise", "experience", "connaissance", "competence", "diplome", "formation",
+    "requis", "souhaite", "exige", "apprecie", "niveau", "vous etes", "vous avez",
+    "capacite", "aisance", "certification", "must", "required",
+    "experience with", "knowledge", "skills", "proficient", "degree",
+)
+
+# Lignes de présentation / modalités, rarement des exigences
+_BOILERPLATE_CUES = (
+    "postuler", "candidature", "nous sommes", "notre entreprise", "a propos",
+    "avantages", "salaire", "remuneration", "teletravail", "tickets restaurant",
+    "mutuelle", "cookies", "egalite des chances", "rejoignez", "about us", "benefits",
+)
+
+
+def _segments(text: str) -> list[str]:
+    segments: list[str] = []
+    for raw in _SEGMENT_SPLIT_RE.split(text or ""):
+        segment = _BULLET_RE.sub("", raw).strip(" \t:-–.")
+        if 3 <= len(segment) <= 220:
+            segments.append(segment)
+    return segments
+
+
+def extract_requirements(offer_text: str) -> list[str]:
+    """Sélection heuristique des lignes de l'offre qui ressemblent à des exigences."""
+    scored: list[tuple[float, int, str]] = []
+    seen: set[str] = set()
+    lines = (offer_text or "").splitlines()
+    bullet_lines = {_BULLET_RE.sub("", line).strip() for line in lines if _BULLET_RE.match(line)}
+
+    for position, segment in enumerate(_segments(offer_text)):
+        folded = fold(segment)
+        key = " ".join(tokenize(segment))
+        if not key or key in seen:
+            continue
+        seen.add(key)
+
+        score = 0.0
+        if segment in bullet_lines:
+            score += 2
+        if any(cue in folded for cue in _REQUIREMENT_CUES) or _SENIORITY_RE.search(folded):
+            score += 2
+        if categorize_requirement(segment) != "autres":
+            score += 1
+        if any(cue in folded for cue in _BOILERPLATE_CUES):
+            score -= 3
+        if len(segment) > 160:
+            score -= 1
+        scored.append((score, position, segment))
+
+    selected = [entry for entry in scored if entry[0] >= 2]
+    if len(selected) < 3:
+        selected = [entry for entry in scored if entry[0] >= 0]
+    selected = sorted(selected, key=lambda e: (-e[0], e[1]))[:MAX_REQUIREMENTS]
+    return [segment for _, _, segment in sorted(selected, key=lambda e: e[1])]
+
+
+class _TfIdf:
+    def __init__(self, documents: list[list[str]]) -> None:
+        df: Counter[str] = Counter()
+        for tokens in documents:
+            df.update(set(tokens))
+        count = max(len(documents), 1)
+        self.idf = {term: math.log((1 + count) / (1 + freq)) + 1 for term, freq in df.items()}
+
+    def vector(self, tokens: list[str]) -> dict[str, float]:
+        counts = Counter(tokens)
+        return {term: tf * self.idf.get(term, 1.0) for term, tf in counts.items()}
+
+
+def _cosine(left: dict[str, float], right: dict[str, float]) -> float:
+    if not left or not right:
+        return 0.0
+    dot = sum(weight * right.get(term, 0.0) for term, weight in left.items())
+    norm = math.sqrt(sum(w * w for w in left.values())) * math.sqrt(sum(w * w for w in right.values()))
+    return dot / norm if norm else 0.0
+
+
+def _suggestions(status: str, requirement: str, missing_terms: list[str]) -> list[str] | None:
+    if status == "match":
+        return None
+    terms = ", ".join(missing_terms[:4]) or requirement
+    if status == "missing":
+        return [
+            f"Si vous possédez cette compétence, mentionnez explicitement : {terms}.",
+            "Illustrez-la par une réalisation concrète (contexte, action, résultat).",
+        ]
+    return [f"Précisez votre niveau et un exemple concret pour : {terms}."]
+
+
+def compare_locally(offer_text: str, cv_text: str) -> dict[str, Any]:
+    """Comparaison complète en quelques millisecondes, sur CPU, sans appel réseau."""
+    requirements = extract_requirements(offer_text)
+    if not requirements:
+        raise RuntimeError("Aucune exigence détectée dans l'offre")
+
+    cv_segments = _segments(cv_text) or [cv_text or ""]
+    cv_segment_tokens = [tokenize(segment) for segment in cv_segments]
+    requirement_tokens = [
+        [token for token in tokenize(requirement) if token not in _REQUIREMENT_FILLERS]
+        or tokenize(requirement)
+        for requirement in requirements
+    ]
+    cv_vocabulary = {token for tokens in cv_segment_tokens for token in tokens}
+    tfidf = _TfIdf(requirement_tokens + cv_segment_tokens)
+    cv_vectors = [tfidf.vector(tokens) for tokens in cv_segment_tokens]
+
+    accumulator = ComparisonAccumulator()
+    for requirement, tokens in zip(requirements, requirement_tokens):
+        vector = tfidf.vector(tokens)
+        total_weight = sum(vector.values()) or 1.0
+        covered = sum(weight for term, weight in vector.items() if term in cv_vocabulary)
+        overlap = covered / total_weight
+
+        similarities = [_cosine(vector, cv_vector) for cv_vector in cv_vectors]
+        best_index = max(range(len(similarities)), key=similarities.__getitem__)
+        best_similarity = similarities[best_index]
+
+        score = 0.7 * overlap + 0.3 * best_similarity
+        if score >= MATCH_THRESHOLD:
+            status, confidence = "match", score
+        elif score >= UNCLEAR_THRESHOLD:
+            status, confidence = "unclear", 0.5
+        else:
+            status, confidence = "missing", 1.0 - score
+        missing_terms = [term for term in dict.fromkeys(tokens) if term not in cv_vocabulary]
+
+        accumulator.add(
+            {
+                "id": str(uuid.uuid4()),
+                "category": categorize_requirement(requirement),
+                "offerText": requirement,
+                "cvText": cv_segments[best_index] if best_similarity > 0 else None,
+                "status": status,
+                "confidence": round(max(0.0, min(1.0, confidence)), 3),
+                "suggestions": _suggestions(status, requirement, missing_terms),
+            }
+        )
+
+    result = accumulator.result()
+    result["summary"]["engine"] = "lexical"
+    return result
@@ -0,0 +1,170 @@
+"""Limiteur de concurrence des appels Gemini, avec file d'attente bornée."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+
+
+class LLMOverloadedError(RuntimeError):
+    """File d'attente pleine (ou attente trop longue) : réessayer plus tard."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMLimiter:
+    """
+    Plafonne les appels modèle en vol par processus.
+    Au-delà, les appels attendent dans une file FIFO bornée ; quand elle est
+    pleine, l'admission échoue immédiatement (LLMOverloadedError).
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float) -> None:
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        # Moyenne glissante de la durée d'un appel, pour Retry-After
+        self.avg_call_seconds = 5.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        backlog = (self.queue_depth + 1) / self.limit
+        return max(1, math.ceil(backlog * self.avg_call_seconds))
+
+    def has_spare_capacity(self, max_load: float) -> bool:
+        """Travail de basse priorité : file vide et moins de max_load × limit créneaux pris."""
+        return not self._waiters and self.in_flight < self.limit * max_load
+
+    def check_admission(self) -> None:
+        """Échec rapide si un nouvel appel ne pourrait même pas entrer en file."""
+        if self.in_flight >= self.limit and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError(
+                "Service IA saturé, veuillez réessayer dans quelques instants",
+                self.retry_after(),
+            )
+
+    async def acquire(self) -> float:
+        """Réserve un créneau ; renvoie le temps d'attente en secondes."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return 0.0
+
+        self.check_admission()
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            raise LLMOverloadedError(
+                "Délai d'attente du service IA dépassé",
+                self.retry_after(),
+            ) from None
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Créneau attribué pendant l'annulation : le rendre
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def set_limit(self, limit: int) -> None:
+        """Ajuste la limite à chaud (AIMD du disjoncteur) ; les appels en vol terminent."""
+        self.limit = max(1, limit)
+        self._wake_waiters()
+
+    def release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            # Le créneau est transféré au waiter avant son réveil
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def record_call(self, duration: float) -> None:
+        self.avg_call_seconds = 0.8 * self.avg_call_seconds + 0.2 * duration
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_call(time.monotonic() - started)
+            self.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_concurrent": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_timeouts": self.queue_timeouts,
+            "avg_wait_ms": (
+                self.total_wait_seconds / self.admitted * 1000 if self.admitted else 0.0
+            ),
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "avg_call_seconds": round(self.avg_call_seconds, 3),
+        }
+
+
+def overloaded_http_exception(exc: LLMOverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def ensure_llm_capacity() -> None:
+    """À appeler dans les routes avant de démarrer un flux : 503 + Retry-After si saturé."""
+    try:
+        llm_limiter.check_admission()
+    except LLMOverloadedError as exc:
+        raise overloaded_http_exception(exc) from exc
+
+
+llm_limiter = LLMLimiter(
+    settings.MAX_CONCURRENT_REQUESTS,
+    settings.LLM_MAX_QUEUE,
+    settings.LLM_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,243 @@
+"""
+Instrumentation des appels Gemini : durée, temps jusqu'au premier octet,
+tokens (usage_metadata) et coût estimé, agrégés par cas d'usage et modèle.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import settings
+from app.services.llm_limiter import LLMOverloadedError
+from app.services.model_router import model_router
+
+# Bornes supérieures des buckets (ms pour les durées, nombre pour les tokens)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000, 120000)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+@dataclass
+class LLMCall:
+    use_case: str
+    model: str
+    wall_ms: float
+    ttfb_ms: float | None
+    prompt_tokens: int
+    output_tokens: int
+    error: str | None = None
+    # Part de prompt_tokens servie par le cache implicite de Gemini (tarif réduit)
+    cached_tokens: int = 0
+    # Abandonné car plus personne n'attendait le résultat (client parti)
+    cancelled: bool = False
+
+    @property
+    def cost_usd(self) -> float:
+        return (
+            (self.prompt_tokens - self.cached_tokens) * settings.LLM_INPUT_PRICE_PER_MTOK
+            + self.cached_tokens * settings.LLM_CACHED_INPUT_PRICE_PER_MTOK
+            + self.output_tokens * settings.LLM_OUTPUT_PRICE_PER_MTOK
+        ) / 1_000_000
+
+
+class Histogram:
+    """Histogramme à buckets fixes ; percentiles estimés par borne de bucket."""
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def record(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class _SeriesMetrics:
+    def __init__(self) -> None:
+        self.wall_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.ttfb_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.output_tokens = Histogram(TOKEN_BUCKETS)
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.cancelled_wall_ms = 0.0
+        self.prompt_tokens_total = 0
+        self.output_tokens_total = 0
+        self.cached_tokens_total = 0
+        self.cost_usd = 0.0
+
+    def record(self, call: LLMCall) -> None:
+        self.calls += 1
+        self.wall_ms.record(call.wall_ms)
+        if call.cancelled:
+            # Tokens déjà consommés facturés : comptés comme un appel abouti
+            self.cancelled += 1
+            self.cancelled_wall_ms += call.wall_ms
+        elif call.error is not None:
+            self.errors += 1
+            return
+        if call.ttfb_ms is not None:
+            self.ttfb_ms.record(call.ttfb_ms)
+        self.prompt_tokens.record(call.prompt_tokens)
+        self.output_tokens.record(call.output_tokens)
+        self.prompt_tokens_total += call.prompt_tokens
+        self.output_tokens_total += call.output_tokens
+        self.cached_tokens_total += call.cached_tokens
+        self.cost_usd += call.cost_usd
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "cancelled_wall_ms": round(self.cancelled_wall_ms, 1),
+            "prompt_tokens_total": self.prompt_tokens_total,
+            "output_tokens_total": self.output_tokens_total,
+            "cached_tokens_total": self.cached_tokens_total,
+            "cost_usd": round(self.cost_usd, 6),
+            "wall_ms": self.wall_ms.snapshot(),
+            "ttfb_ms": self.ttfb_ms.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "output_tokens": self.output_tokens.snapshot(),
+        }
+
+
+class LLMMetrics:
+    """Agrégats en mémoire du processus, par (cas d'usage, modèle)."""
+
+    def __init__(self) -> None:
+        self._series: dict[tuple[str, str], _SeriesMetrics] = {}
+        self.started_at = time.time()
+
+    def record(self, call: LLMCall) -> None:
+        series = self._series.get((call.use_case, call.model))
+        if series is None:
+            series = self._series[(call.use_case, call.model)] = _SeriesMetrics()
+        series.record(call)
+        collected = _collected_calls.get()
+        if collected is not None:
+            collected.append(call)
+
+    def reset(self) -> None:
+        self._series.clear()
+        self.started_at = time.time()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "since": self.started_at,
+            "series": [
+                {"use_case": use_case, "model": model, **series.snapshot()}
+                for (use_case, model), series in sorted(self._series.items())
+            ],
+        }
+
+
+# Appels enregistrés pendant une requête (persistés avec la comparaison / l'entretien)
+_collected_calls: ContextVar[list[LLMCall] | None] = ContextVar("llm_calls", default=None)
+
+
+@contextmanager
+def collect_llm_calls() -> Iterator[list[LLMCall]]:
+    """
+    Collecte les appels faits dans ce contexte (y compris dans les tâches créées
+    depuis celui-ci, qui héritent de la même liste).
+    """
+    calls: list[LLMCall] = []
+    token = _collected_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _collected_calls.reset(token)
+
+
+def summarize_usage(calls: list[LLMCall]) -> dict[str, Any]:
+    """Résumé stocké dans le JSONB des enregistrements (analyse par utilisateur / jour)."""
+    return {
+        "calls": len(calls),
+        "errors": sum(1 for call in calls if call.error is not None),
+        "cancelled": sum(1 for call in calls if call.cancelled),
+        "models": sorted({call.model for call in calls}),
+        "wall_ms": round(sum(call.wall_ms for call in calls), 1),
+        "prompt_tokens": sum(call.prompt_tokens for call in calls),
+        "output_tokens": sum(call.output_tokens for call in calls),
+        "cached_tokens": sum(call.cached_tokens for call in calls),
+        "cost_usd": round(sum(call.cost_usd for call in calls), 6),
+    }
+
+
+def record_llm_call(
+    *,
+    use_case: str,
+    model: str,
+    started: float,
+    first_byte_at: float | None,
+    usage_metadata: Any = None,
+    error: BaseException | None = None,
+) -> None:
+    """`started` / `first_byte_at` : instants time.monotonic()."""
+    finished = time.monotonic()
+    prompt_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+    cancelled = isinstance(error, (asyncio.CancelledError, GeneratorExit))
+    # Saturation locale, disjoncteur ou annulation : rien sur la santé du modèle
+    if not cancelled and not isinstance(error, LLMOverloadedError):
+        model_router.record(model, use_case, finished - started, prompt_tokens, error is None)
+    output_tokens = (getattr(usage_metadata, "candidates_token_count", None) or 0) + (
+        # Tokens de réflexion facturés comme tokens de sortie
+        getattr(usage_metadata, "thoughts_token_count", None) or 0
+    )
+    llm_metrics.record(
+        LLMCall(
+            use_case=use_case,
+            model=model,
+            wall_ms=(finished - started) * 1000,
+            ttfb_ms=(first_byte_at - started) * 1000 if first_byte_at is not None else None,
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=getattr(usage_metadata, "cached_content_token_count", None) or 0,
+            error=repr(error) if error is not None and not cancelled else None,
+            cancelled=cancelled,
+        )
+    )
+
+
+llm_metrics = LLMMetrics()
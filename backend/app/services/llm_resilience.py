@@ -0,0 +1,250 @@
+"""
+Résilience des appels Gemini : délais par tentative, retries avec backoff
+(jitter) sur 429/5xx, requêtes dupliquées (hedging) au-delà d'un percentile
+de latence, disjoncteur avec limite de concurrence adaptative (AIMD).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import httpx
+from google.genai import errors as genai_errors
+
+from app.config import settings
+from app.services.llm_limiter import LLMOverloadedError, llm_limiter
+
+T = TypeVar("T")
+
+# Une tentative reçoit son délai maximal (secondes) et renvoie la réponse brute
+Attempt = Callable[[float], Awaitable[T]]
+
+
+class CircuitOpenError(LLMOverloadedError):
+    """Disjoncteur ouvert : Gemini échoue en série, appels suspendus."""
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Quota (429), erreur serveur (5xx), délai ou coupure réseau : réessayable."""
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code == 429 or exc.code >= 500
+    return False
+
+
+def _is_quota_error(exc: BaseException) -> bool:
+    return isinstance(exc, genai_errors.APIError) and exc.code == 429
+
+
+class LatencyTracker:
+    """Durées récentes des appels réussis, pour le seuil de hedging."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        # En dessous de 20 échantillons, le percentile n'est pas significatif
+        if len(self._samples) < 20:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    closed → open après N échecs transitoires consécutifs ; open → half_open
+    après le délai de refroidissement ; une sonde réussie referme le circuit.
+    La limite du limiteur suit un AIMD : divisée par deux sur 429, +1 par
+    fenêtre de succès, bornée par MAX_CONCURRENT_REQUESTS.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._successes_since_increase = 0
+
+    def _retry_after(self) -> int:
+        remaining = self.cooldown_seconds - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    "Service IA temporairement indisponible, veuillez réessayer",
+                    self._retry_after(),
+                )
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    "Service IA en cours de rétablissement, veuillez réessayer",
+                    max(1, int(llm_limiter.avg_call_seconds)),
+                )
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.state = "closed"
+        # Additive increase : +1 après `limit` succès consécutifs
+        self._successes_since_increase += 1
+        if self._successes_since_increase >= llm_limiter.limit:
+            self._successes_since_increase = 0
+            if llm_limiter.limit < settings.MAX_CONCURRENT_REQUESTS:
+                llm_limiter.set_limit(llm_limiter.limit + 1)
+
+    def record_failure(self, exc: BaseException) -> None:
+        if not is_transient_error(exc):
+            # Erreur de requête (400…) : ne renseigne pas sur l'état de Gemini
+            self._probe_in_flight = False
+            return
+        if _is_quota_error(exc):
+            # Multiplicative decrease
+            self._successes_since_increase = 0
+            llm_limiter.set_limit(max(1, llm_limiter.limit // 2))
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                print(f"Disjoncteur Gemini ouvert après {self.consecutive_failures} échecs: {exc!r}")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Tentative abandonnée (annulation) : libère la sonde sans verdict."""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "concurrency_limit": llm_limiter.limit,
+            "configured_limit": settings.MAX_CONCURRENT_REQUESTS,
+        }
+
+
+circuit_breaker = CircuitBreaker(
+    settings.CIRCUIT_FAILURE_THRESHOLD,
+    settings.CIRCUIT_COOLDOWN_SECONDS,
+)
+latency_tracker = LatencyTracker()
+resilience_counters = {
+    "calls": 0,
+    "retries": 0,
+    "retry_exhausted": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+}
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponentiel avec full jitter (attempt commence à 1)."""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+async def _hedged(attempt: Attempt[T], timeout: float, hedge: bool) -> T:
+    """
+    Lance la tentative ; si elle dépasse le percentile de latence configuré,
+    une copie est lancée et la première réponse valide l'emporte.
+    """
+    hedge_after = latency_tracker.percentile(settings.LLM_HEDGE_PERCENTILE)
+    if not (hedge and settings.LLM_HEDGE_ENABLED) or hedge_after is None or hedge_after >= timeout:
+        return await attempt(timeout)
+
+    primary = asyncio.ensure_future(attempt(timeout))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            resilience_counters["hedges"] += 1
+            tasks.append(asyncio.ensure_future(attempt(max(0.0, timeout - hedge_after))))
+        error: BaseException | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        resilience_counters["hedge_wins"] += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error or RuntimeError("Aucune réponse Gemini")
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def resilient_call(attempt: Attempt[T], *, hedge: bool = True) -> T:
+    """
+    Exécute `attempt` sous le disjoncteur, avec un délai par tentative
+    (LLM_ATTEMPT_TIMEOUT) et des retries tant que l'échéance globale
+    (SSE_TIMEOUT) le permet.
+    """
+    resilience_counters["calls"] += 1
+    deadline = time.monotonic() + settings.SSE_TIMEOUT
+    retries = 0
+    while True:
+        circuit_breaker.before_call()
+        started = time.monotonic()
+        timeout = min(settings.LLM_ATTEMPT_TIMEOUT, deadline - started)
+        try:
+            result = await _hedged(attempt, timeout, hedge)
+        except asyncio.CancelledError:
+            circuit_breaker.release_probe()
+            raise
+        except LLMOverloadedError:
+            # Saturation locale (file d'attente) : pas un échec de Gemini
+            circuit_breaker.release_probe()
+            raise
+        except Exception as exc:
+            circuit_breaker.record_failure(exc)
+            if not is_transient_error(exc):
+                raise
+            retries += 1
+            delay = backoff_delay(retries)
+            if retries > settings.LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                resilience_counters["retry_exhausted"] += 1
+                raise
+            resilience_counters["retries"] += 1
+            print(f"Appel Gemini en échec ({exc!r}), nouvel essai {retries} dans {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        circuit_breaker.record_success()
+        latency_tracker.record(time.monotonic() - started)
+        return result
+
+
+def resilience_stats() -> dict[str, Any]:
+    p50 = latency_tracker.percentile(0.5)
+    p95 = latency_tracker.percentile(0.95)
+    return {
+        "circuit": circuit_breaker.stats(),
+        **resilience_counters,
+        "latency_p50_ms": p50 * 1000 if p50 is not None else None,
+        "latency_p95_ms": p95 * 1000 if p95 is not None else None,
+        "hedging_enabled": settings.LLM_HEDGE_ENABLED,
+    }
@@ -0,0 +1,168 @@
+"""
+Routage des appels entre les niveaux de modèles Gemini : modèle principal
+(GEMINI_MODEL) ou niveau rapide et moins cher (GEMINI_FAST_MODEL).
+Le choix dépend du cas d'usage, de la taille du prompt, du niveau de
+l'utilisateur (essai gratuit ou compte) et de la santé récente de chaque
+modèle (taux d'erreur, latence prévue face au budget du cas d'usage).
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from app.config import settings
+
+STANDARD_TIER = "standard"
+FREE_TIER = "free"
+
+# Fenêtre glissante par modèle (et par cas d'usage pour la latence)
+_WINDOW = 50
+# Plancher de tokens pour le débit : le coût fixe d'un appel domine les petits prompts
+_MIN_TOKENS = 500
+
+_current_tier: ContextVar[str] = ContextVar("llm_tier", default=STANDARD_TIER)
+
+
+@contextmanager
+def routing_tier(tier: str) -> Iterator[None]:
+    """Niveau utilisateur des appels faits dans ce contexte (tâches créées comprises)."""
+    token = _current_tier.set(tier)
+    try:
+        yield
+    finally:
+        _current_tier.reset(token)
+
+
+def current_tier() -> str:
+    return _current_tier.get()
+
+
+class _ModelHealth:
+    """
+    Échantillons horodatés : ceux plus vieux que MODEL_HEALTH_WINDOW_SECONDS
+    sont ignorés. Un modèle délaissé car dégradé n'en reçoit plus de nouveaux ;
+    sans expiration il ne se rétablirait jamais.
+    """
+
+    def __init__(self) -> None:
+        self.outcomes: deque[tuple[float, bool]] = deque(maxlen=_WINDOW)
+        # Secondes par millier de tokens d'entrée, appels réussis, par cas d'usage
+        self.rates: dict[str, deque[tuple[float, float]]] = {}
+
+    def record(self, use_case: str, seconds: float, input_tokens: int, ok: bool) -> None:
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        if ok and input_tokens:
+            rates = self.rates.setdefault(use_case, deque(maxlen=_WINDOW))
+            rates.append((now, seconds * 1000 / max(input_tokens, _MIN_TOKENS)))
+
+    @staticmethod
+    def _recent(samples: deque) -> list:
+        cutoff = time.monotonic() - settings.MODEL_HEALTH_WINDOW_SECONDS
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return [value for _, value in samples]
+
+    def samples(self) -> int:
+        return len(self._recent(self.outcomes))
+
+    def error_rate(self) -> float | None:
+        outcomes = self._recent(self.outcomes)
+        if len(outcomes) < settings.MODEL_ROUTING_MIN_SAMPLES:
+            return None
+        return outcomes.count(False) / len(outcomes)
+
+    def predicted_seconds(self, use_case: str, input_tokens: int) -> float | None:
+        """p90 du débit observé × taille du prompt ; None sans historique suffisant."""
+        rates = self._recent(self.rates.get(use_case, deque()))
+        if len(rates) < settings.MODEL_ROUTING_MIN_SAMPLES:
+            return None
+        ordered = sorted(rates)
+        p90 = ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+        return p90 * max(input_tokens, _MIN_TOKENS) / 1000
+
+
+class ModelRouter:
+    def __init__(self) -> None:
+        self._health: dict[str, _ModelHealth] = {}
+        self.routed: dict[str, int] = {}
+        self.rerouted = 0
+
+    def record(self, model: str, use_case: str, seconds: float, input_tokens: int, ok: bool) -> None:
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = _ModelHealth()
+        health.record(use_case, seconds, input_tokens, ok)
+
+    def degraded(self, model: str, use_case: str, input_tokens: int) -> bool:
+        """Taux d'erreur excessif ou latence prévue au-delà du budget du cas d'usage."""
+        health = self._health.get(model)
+        if health is None:
+            return False
+        error_rate = health.error_rate()
+        if error_rate is not None and error_rate > settings.MODEL_MAX_ERROR_RATE:
+            return True
+        budget = settings.MODEL_LATENCY_BUDGETS.get(use_case)
+        predicted = health.predicted_seconds(use_case, input_tokens)
+        return budget is not None and predicted is not None and predicted > budget
+
+    def preferred(self, primary: str) -> str:
+        """
+        Modèle choisi quand tout va bien : niveau rapide pour l'essai gratuit,
+        sinon modèle principal (celui que portent les clés de cache).
+        """
+        fast = settings.GEMINI_FAST_MODEL
+        if not settings.MODEL_ROUTING_ENABLED or not fast or fast == primary:
+            return primary
+        if current_tier() == FREE_TIER and settings.FREE_TRIAL_FAST_TIER:
+            return fast
+        return primary
+
+    def choose(self, use_case: str, primary: str, *, input_tokens: int) -> str:
+        """
+        Niveau préféré (voir preferred) ; dégradé, il cède la place à l'autre
+        s'il est en bonne santé.
+        """
+        preferred = self.preferred(primary)
+        fast = settings.GEMINI_FAST_MODEL
+        if not settings.MODEL_ROUTING_ENABLED or not fast or fast == primary:
+            return primary
+        alternative = primary if preferred == fast else fast
+
+        model = preferred
+        if self.degraded(preferred, use_case, input_tokens) and not self.degraded(
+            alternative, use_case, input_tokens
+        ):
+            model = alternative
+            self.rerouted += 1
+        self.routed[model] = self.routed.get(model, 0) + 1
+        return model
+
+    def reset(self) -> None:
+        self._health.clear()
+        self.routed.clear()
+        self.rerouted = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.MODEL_ROUTING_ENABLED,
+            "primary": settings.GEMINI_MODEL,
+            "fast": settings.GEMINI_FAST_MODEL,
+            "routed": dict(self.routed),
+            "rerouted": self.rerouted,
+            "models": {
+                model: {
+                    "error_rate": health.error_rate(),
+                    "samples": health.samples(),
+                }
+                for model, health in self._health.items()
+            },
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,179 @@
+"""
+Persistance différée (write-behind) de l'historique : les comparaisons et
+entretiens terminés sont mis en file, puis un thread d'écriture les insère
+par lots (INSERT multi-lignes), hors de la boucle d'événements. La file est
+bornée, vidée à l'arrêt, et les écritures sont retentées si PostgreSQL est
+brièvement indisponible.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any
+
+from sqlalchemy import insert, inspect
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from app.config import settings
+from app.db import Base, SessionLocal
+
+
+def _row(record: Base) -> dict[str, Any]:
+    """Valeurs de colonnes d'un enregistrement ; None laissé aux défauts serveur."""
+    values = {}
+    for attr in inspect(type(record)).column_attrs:
+        value = getattr(record, attr.key)
+        if value is not None:
+            values[attr.key] = value
+    return values
+
+
+class PersistenceQueue:
+    def __init__(self) -> None:
+        self._pending: deque[Base] = deque()
+        self._lock = threading.Lock()
+        # Une seule écriture à la fois (thread d'écriture ou flush)
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "dropped": 0,
+            "overflow": 0,
+        }
+
+    def enqueue(self, record: Base) -> str | None:
+        """
+        Met l'enregistrement en file et renvoie son identifiant, attribué tout
+        de suite. File pleine : l'enregistrement est abandonné (compteur
+        `overflow`, renvoie None) plutôt que d'écrire depuis la boucle d'événements.
+        """
+        if record.id is None:
+            record.id = uuid.uuid4()
+        self.counters["enqueued"] += 1
+        with self._lock:
+            full = len(self._pending) >= settings.PERSIST_QUEUE_MAX_SIZE
+            if not full:
+                self._pending.append(record)
+                pending = len(self._pending)
+        if full:
+            self.counters["overflow"] += 1
+            print("File de persistance pleine, historique non enregistré")
+            self._wakeup.set()
+            return None
+
+        self._ensure_writer()
+        if pending >= settings.PERSIST_BATCH_SIZE:
+            self._wakeup.set()
+        return str(record.id)
+
+    def write(self, record: Base) -> str | None:
+        """
+        Bloquant (à exécuter dans un thread) : écrit l'enregistrement tout de
+        suite, pour un identifiant relu aussitôt par le client (page de
+        résultats). None si la ligne n'a pas pu être enregistrée.
+        """
+        if record.id is None:
+            record.id = uuid.uuid4()
+        with self._write_lock:
+            written = self._write([record])
+        return str(record.id) if written else None
+
+    def flush(self) -> None:
+        """Écrit tout ce qui est en attente (arrêt du serveur, tests)."""
+        with self._write_lock:
+            while batch := self._take():
+                self._write(batch)
+
+    def close(self) -> None:
+        """Arrête le thread d'écriture après avoir vidé la file."""
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            thread.join(timeout=settings.PERSIST_RETRY_MAX_DELAY * settings.PERSIST_MAX_RETRIES)
+            self._thread = None
+            self._stopping = False
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.counters,
+            "pending": len(self._pending),
+            "max_size": settings.PERSIST_QUEUE_MAX_SIZE,
+        }
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="persistence-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(settings.PERSIST_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+            if self._stopping:
+                return
+
+    def _take(self) -> list[Base]:
+        with self._lock:
+            count = min(len(self._pending), settings.PERSIST_BATCH_SIZE)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _insert(self, batch: list[Base]) -> None:
+        """Un INSERT multi-lignes par modèle, dans une même transaction."""
+        rows_by_model: dict[type, list[dict[str, Any]]] = {}
+        for record in batch:
+            rows_by_model.setdefault(type(record), []).append(_row(record))
+        db = SessionLocal()
+        try:
+            for model, rows in rows_by_model.items():
+                db.execute(insert(model), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, batch: list[Base]) -> int:
+        """Insère le lot ; renvoie le nombre de lignes enregistrées."""
+        delay = settings.PERSIST_RETRY_BASE_DELAY
+        for attempt in range(settings.PERSIST_MAX_RETRIES + 1):
+            try:
+                self._insert(batch)
+                self.counters["written"] += len(batch)
+                self.counters["batches"] += 1
+                return len(batch)
+            except OperationalError as exc:
+                # Base indisponible (redémarrage, coupure réseau) : nouvel essai
+                if attempt == settings.PERSIST_MAX_RETRIES:
+                    break
+                self.counters["retries"] += 1
+                print(f"PostgreSQL indisponible, nouvel essai dans {delay:.1f}s: {exc}")
+                time.sleep(delay)
+                delay = min(delay * 2, settings.PERSIST_RETRY_MAX_DELAY)
+            except SQLAlchemyError as exc:
+                # Ligne refusée (ex. utilisateur supprimé) : isoler les lignes fautives
+                if len(batch) == 1:
+                    self.counters["dropped"] += 1
+                    print(f"Historique non enregistré: {exc}")
+                    return 0
+                return sum(self._write([record]) for record in batch)
+        self.counters["dropped"] += len(batch)
+        print(f"Historique non enregistré après {settings.PERSIST_MAX_RETRIES} essais ({len(batch)} lignes)")
+        return 0
+
+persistence_queue = PersistenceQueue()
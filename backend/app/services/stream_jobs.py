@@ -0,0 +1,375 @@
+"""
+Jobs de comparaison reprenables. Chaque flux SSE reçoit un identifiant de job ;
+ses trames numérotées sont journalisées dans un stream Redis borné (en mémoire
+si Redis est absent). Une connexion coupée reprend via Last-Event-ID sans
+relancer l'appel Gemini, et plusieurs onglets peuvent suivre le même job.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any
+
+from app.config import settings
+from app.services.comparison_service import SSE_HEARTBEAT, sse_event
+from app.services.redis_service import redis_service
+
+JOB_KEY_PREFIX = "comparison:job"
+# Attente maximale d'un XREAD bloquant (suivi d'un job d'un autre worker)
+_REMOTE_BLOCK_MS = 1000
+
+
+def _events_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}:{job_id}:events"
+
+
+def _owner_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}:{job_id}:owner"
+
+
+def _status_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}:{job_id}:status"
+
+
+def _watched_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}:{job_id}:watched"
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def job_frame(job_id: str) -> bytes:
+    """Première trame d'un job : son identifiant, pour la reprise côté client."""
+    return sse_event({"type": "job", "job_id": job_id})
+
+
+def sse_frame(event_id: int, frame: bytes) -> bytes:
+    """Préfixe une trame `data:` de son numéro (`id:`) pour Last-Event-ID."""
+    return b"id: %d\n" % event_id + frame
+
+
+class StreamJob:
+    """Journal borné des trames d'un job, suivi par un ou plusieurs clients."""
+
+    def __init__(self, job_id: str, user_id: str, *, last_id: int = 0) -> None:
+        self.job_id = job_id
+        self.user_id = user_id
+        self.frames: deque[tuple[int, bytes]] = deque(maxlen=settings.STREAM_JOB_MAX_EVENTS)
+        # Trames déjà journalisées ailleurs (annonce faite par l'API)
+        self.last_id = last_id
+        self.status = "running"
+        self.finished = False
+        self.subscribers = 0
+        self.task: asyncio.Task[None] | None = None
+        self._updated = asyncio.Event()
+        # Écritures Redis en attente, envoyées par lots hors de la boucle d'événements
+        self._outbox: list[tuple[Any, ...]] = []
+        self._writer: asyncio.Task[None] | None = None
+
+    def append(self, frame: bytes) -> None:
+        self.last_id += 1
+        self.frames.append((self.last_id, frame))
+        self.send(("event", self.last_id, {"frame": frame.decode()}))
+        self._wake()
+
+    def finish(self, status: str = "done") -> None:
+        self.status = status
+        self.finished = True
+        self.send(("status", status))
+        self.send(("event", self.last_id + 1, {"end": "1"}))
+        self._wake()
+
+    def send(self, operation: tuple[Any, ...]) -> None:
+        """Met une écriture Redis en attente ; un seul envoi en cours, dans l'ordre."""
+        if not redis_service.redis_available:
+            return
+        self._outbox.append(operation)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._outbox:
+            batch, self._outbox = self._outbox, []
+            await asyncio.to_thread(_write_remote, self.job_id, batch)
+
+    async def drain(self) -> None:
+        """Attend l'envoi des écritures en attente (fin de job)."""
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    def _wake(self) -> None:
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def follow(self, after: int = 0) -> AsyncIterator[bytes]:
+        """
+        Rejoue les trames postérieures à `after`, puis suit le job en direct,
+        avec un commentaire SSE après SSE_HEARTBEAT_SECONDS sans trame.
+        """
+        self.subscribers += 1
+        try:
+            while True:
+                for event_id, frame in list(self.frames):
+                    if event_id > after:
+                        after = event_id
+                        yield sse_frame(event_id, frame)
+                if self.finished:
+                    return
+                try:
+                    await asyncio.wait_for(self._updated.wait(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield SSE_HEARTBEAT
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                # Délai de grâce pour une reprise (Last-Event-ID) avant d'annuler
+                asyncio.get_running_loop().call_later(
+                    settings.JOB_ORPHAN_GRACE_SECONDS, self.cancel_if_orphaned
+                )
+
+    def cancel_if_orphaned(self) -> bool:
+        """Annule le job (et son appel Gemini) si plus aucun client ne le suit."""
+        if self.subscribers or self.finished or self.task is None or self.task.done():
+            return False
+        self.task.cancel()
+        job_stats["orphaned"] += 1
+        return True
+
+
+_jobs: dict[str, StreamJob] = {}
+job_stats = {"started": 0, "resumed": 0, "remote_followed": 0, "orphaned": 0}
+
+
+def _write_remote(job_id: str, operations: list[tuple[Any, ...]]) -> None:
+    """
+    Bloquant (exécuté dans un thread) : un lot d'écritures d'un job en un seul
+    aller-retour (pipeline). Opérations : ("owner", user_id), ("status", statut),
+    ("event", numéro, champs).
+    """
+    ttl = settings.STREAM_JOB_TTL_SECONDS
+    try:
+        pipe = redis_service.redis_client.pipeline(transaction=False)
+        for operation in operations:
+            if operation[0] == "owner":
+                pipe.set(_owner_key(job_id), operation[1], ex=ttl)
+            elif operation[0] == "status":
+                key = _status_key(job_id)
+                pipe.hset(key, mapping={"status": operation[1], "updated_at": str(time.time())})
+                pipe.expire(key, ttl)
+            else:
+                _, event_id, fields = operation
+                pipe.xadd(
+                    _events_key(job_id),
+                    fields,
+                    id=f"{event_id}-0",
+                    maxlen=settings.STREAM_JOB_MAX_EVENTS,
+                    approximate=True,
+                )
+        if any(operation[0] == "event" for operation in operations):
+            pipe.expire(_events_key(job_id), ttl)
+        pipe.execute()
+    except Exception as exc:
+        print(f"Erreur Redis journal job: {exc}")
+
+
+def announce_job(job_id: str, user_id: str) -> None:
+    """
+    Bloquant (exécuté dans un thread) : job mis en file pour un worker,
+    propriétaire, statut et trame 1 dans Redis.
+    """
+    _write_remote(
+        job_id,
+        [
+            ("owner", user_id),
+            ("status", "queued"),
+            ("event", 1, {"frame": job_frame(job_id).decode()}),
+        ],
+    )
+
+
+async def run_job(job: StreamJob, frames: AsyncIterator[bytes]) -> None:
+    """Journalise les trames du flux jusqu'à sa fin (API ou worker dédié)."""
+    job.send(("status", "running"))
+    status = "failed"
+    try:
+        async for frame in frames:
+            # Commentaires SSE (battements) : propres à chaque connexion, non journalisés
+            if not frame.startswith(b":"):
+                job.append(frame)
+        status = "done"
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except Exception as exc:
+        print(f"Erreur job {job.job_id}: {exc}")
+        job.append(sse_event({"type": "error", "message": str(exc)}))
+    finally:
+        job.finish(status)
+        # Journal conservé le temps d'une reprise, puis oublié
+        asyncio.get_running_loop().call_later(
+            settings.STREAM_JOB_TTL_SECONDS, _jobs.pop, job.job_id, None
+        )
+        # Trame de fin publiée avant de rendre la main (worker qui s'arrête)
+        await job.drain()
+
+
+def start_job(user_id: Any, frames: AsyncIterator[bytes]) -> StreamJob:
+    """
+    Exécute le flux SSE dans une tâche indépendante de la connexion HTTP.
+    La première trame annonce l'identifiant du job au client.
+    """
+    job = StreamJob(new_job_id(), str(user_id))
+    _jobs[job.job_id] = job
+    job.send(("owner", job.user_id))
+    job.append(job_frame(job.job_id))
+    job.task = asyncio.create_task(run_job(job, frames))
+    job_stats["started"] += 1
+    return job
+
+
+async def _remote_owner(job_id: str) -> str | None:
+    if not redis_service.redis_available:
+        return None
+    try:
+        return await asyncio.to_thread(redis_service.redis_client.get, _owner_key(job_id))
+    except Exception as exc:
+        print(f"Erreur Redis propriétaire job: {exc}")
+        return None
+
+
+def _read_remote(job_id: str, after: int) -> list[tuple[int, dict[str, str]]]:
+    """Bloquant (exécuté dans un thread) : entrées du stream après `after`."""
+    response = redis_service.redis_client.xread(
+        {_events_key(job_id): f"{after}-0"}, count=100, block=_REMOTE_BLOCK_MS
+    )
+    entries = []
+    for _key, messages in response or []:
+        for entry_id, fields in messages:
+            entries.append((int(entry_id.split("-", 1)[0]), fields))
+    return entries
+
+
+def _touch_watched(job_id: str) -> None:
+    """Signale au worker qu'un client suit encore le job (clé à durée de vie courte)."""
+    redis_service.redis_client.set(
+        _watched_key(job_id), "1", ex=max(1, int(settings.JOB_ORPHAN_GRACE_SECONDS))
+    )
+
+
+def _is_watched(job_id: str) -> bool:
+    return bool(redis_service.redis_client.exists(_watched_key(job_id)))
+
+
+async def _follow_remote(job_id: str, after: int) -> AsyncIterator[bytes]:
+    """Job exécuté par un autre worker : lecture du stream Redis jusqu'à la fin."""
+    deadline = time.monotonic() + settings.SSE_TIMEOUT
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            await asyncio.to_thread(_touch_watched, job_id)
+            entries = await asyncio.to_thread(_read_remote, job_id, after)
+        except Exception as exc:
+            print(f"Erreur Redis lecture job: {exc}")
+            return
+        for event_id, fields in entries:
+            if "end" in fields:
+                return
+            after = event_id
+            last_sent = time.monotonic()
+            yield sse_frame(event_id, fields["frame"].encode())
+        if time.monotonic() - last_sent >= settings.SSE_HEARTBEAT_SECONDS:
+            last_sent = time.monotonic()
+            yield SSE_HEARTBEAT
+
+
+async def watch_remote_followers(job: StreamJob, task: asyncio.Task) -> bool:
+    """
+    Worker dédié : annule le job quand aucun client ne l'a suivi depuis
+    JOB_ORPHAN_GRACE_SECONDS (clé rafraîchie par les API qui le diffusent).
+    True si le job a été annulé.
+    """
+    grace = settings.JOB_ORPHAN_GRACE_SECONDS
+    await asyncio.sleep(grace)
+    while not task.done():
+        try:
+            watched = await asyncio.to_thread(_is_watched, job.job_id)
+        except Exception as exc:
+            print(f"Erreur Redis suivi job: {exc}")
+            watched = True
+        if not watched:
+            task.cancel()
+            job_stats["orphaned"] += 1
+            return True
+        await asyncio.sleep(grace / 2)
+    return False
+
+
+async def follow_job(job_id: str, user_id: Any, after: int = 0) -> AsyncIterator[bytes] | None:
+    """
+    Flux d'un job existant à partir de la trame `after` (Last-Event-ID).
+    None si le job est inconnu, expiré ou appartient à un autre utilisateur.
+    """
+    job = _jobs.get(job_id)
+    if job is not None:
+        if job.user_id != str(user_id):
+            return None
+        if after:
+            job_stats["resumed"] += 1
+        return job.follow(after)
+    if await _remote_owner(job_id) != str(user_id):
+        return None
+    job_stats["remote_followed"] += 1
+    return _follow_remote(job_id, after)
+
+
+def _read_status(job_id: str) -> tuple[dict[str, str], list[Any]]:
+    """Bloquant (exécuté dans un thread) : statut et dernière entrée du journal."""
+    fields = redis_service.redis_client.hgetall(_status_key(job_id))
+    last = redis_service.redis_client.xrevrange(_events_key(job_id), count=1)
+    return fields, last
+
+
+async def job_status(job_id: str, user_id: Any) -> dict[str, Any] | None:
+    """Statut d'un job (queued, running, done, failed, cancelled) ; None si inconnu."""
+    job = _jobs.get(job_id)
+    if job is not None:
+        if job.user_id != str(user_id):
+            return None
+        return {"job_id": job_id, "status": job.status, "last_event_id": job.last_id}
+    if await _remote_owner(job_id) != str(user_id):
+        return None
+    try:
+        fields, last = await asyncio.to_thread(_read_status, job_id)
+    except Exception as exc:
+        print(f"Erreur Redis statut job: {exc}")
+        return None
+    last_event_id = int(last[0][0].split("-", 1)[0]) if last else 0
+    if fields.get("status") in ("done", "failed", "cancelled"):
+        # Entrée de fin (non diffusée) exclue
+        last_event_id -= 1
+    return {
+        "job_id": job_id,
+        "status": fields.get("status", "queued"),
+        "last_event_id": last_event_id,
+    }
+
+
+def cancel_stream_jobs() -> int:
+    """Annule les jobs en cours (arrêt du serveur) ; renvoie leur nombre."""
+    tasks = [job.task for job in _jobs.values() if job.task is not None and not job.task.done()]
+    for task in tasks:
+        task.cancel()
+    return len(tasks)
+
+
+def stream_job_stats() -> dict[str, Any]:
+    return {
+        **job_stats,
+        "active": sum(1 for job in _jobs.values() if not job.finished),
+        "retained": len(_jobs),
+    }
@@ -0,0 +1,224 @@
+"""Parsing JSON incrémental pour les réponses Gemini en streaming."""
+
+import json
+import re
+from typing import Any, NamedTuple
+
+_WHITESPACE = " \t\r\n"
+_NUMBER_END = _WHITESPACE + ",}]"
+
+
+class JsonArrayStreamParser:
+    """
+    Extrait les éléments d'un tableau JSON au fil des fragments reçus.
+
+    Le tableau est soit la racine du document, soit la valeur de `key`
+    dans l'objet racine (ex. {"items": [...]}). Chaque élément objet/tableau
+    est renvoyé dès que son accolade fermante est reçue.
+    """
+
+    def __init__(self, key: str = "items") -> None:
+        self._array_start = re.compile(
+            r'^\s*\[|"' + re.escape(key) + r'"\s*:\s*\['
+        )
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escape = False
+        self.received = []  # fragments bruts, pour le fallback de fin de flux
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self.received)
+
+    def feed(self, chunk: str) -> list[Any]:
+        if not chunk:
+            return []
+        self.received.append(chunk)
+        if self._done:
+            return []
+
+        self._text += chunk
+        if not self._in_array:
+            match = self._array_start.search(self._text)
+            if not match:
+                return []
+            self._in_array = True
+            self._text = self._text[match.end():]
+            self._pos = 0
+
+        return self._scan()
+
+    def _scan(self) -> list[Any]:
+        elements: list[Any] = []
+        text = self._text
+        i = self._pos
+
+        while i < len(text):
+            char = text[i]
+            if self._depth == 0:
+                if char in "{[":
+                    self._start = i
+                    self._depth = 1
+                elif char == "]":
+                    self._done = True
+                    break
+                # virgules, espaces et scalaires de premier niveau ignorés
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        elements.append(json.loads(text[self._start : i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    # Libère le texte déjà consommé
+                    text = text[i + 1 :]
+                    i = -1
+                    self._start = -1
+            i += 1
+
+        self._text = text
+        self._pos = i if self._depth else len(text)
+        if self._depth == 0:
+            self._text = text.lstrip(_WHITESPACE + ",")
+            self._pos = 0
+        return elements
+
+
+class JsonMember(NamedTuple):
+    key: str
+    value: Any
+    # True : un élément du tableau `key` ; False : la valeur complète du membre
+    element: bool
+
+
+class JsonObjectStreamParser:
+    """
+    Extrait les membres de l'objet racine au fil des fragments reçus.
+
+    Un membre scalaire ou objet est renvoyé une fois complet ; un membre
+    tableau est renvoyé élément par élément, dès que chacun est complet
+    (ex. {"score": 7, "points": ["a", "b"]} → score, puis "a", puis "b").
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = ""
+        self.received = []  # fragments bruts, pour le fallback de fin de flux
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self.received)
+
+    def feed(self, chunk: str) -> list[JsonMember]:
+        if not chunk:
+            return []
+        self.received.append(chunk)
+        if self.done:
+            return []
+        self._text += chunk
+        members = self._scan()
+        # Libère le texte déjà consommé
+        self._text = self._text[self._pos :]
+        self._pos = 0
+        return members
+
+    def _skip(self, chars: str) -> str | None:
+        while self._pos < len(self._text) and self._text[self._pos] in chars:
+            self._pos += 1
+        return self._text[self._pos] if self._pos < len(self._text) else None
+
+    def _decode(self) -> tuple[bool, Any]:
+        """Valeur JSON complète à la position courante, sinon (False, None)."""
+        try:
+            value, end = self._decoder.raw_decode(self._text, self._pos)
+        except json.JSONDecodeError:
+            return False, None
+        # Un nombre n'est complet qu'une fois son délimiteur reçu : « 7. »,
+        # « 7.5e » ou une fin de tampon peuvent encore recevoir des chiffres
+        number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if number and (end >= len(self._text) or self._text[end] not in _NUMBER_END):
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _scan(self) -> list[JsonMember]:
+        members: list[JsonMember] = []
+        while True:
+            if self._state == "start":
+                char = self._skip(_WHITESPACE)
+                if char is None:
+                    return members
+                self._pos += 1
+                # Texte parasite avant l'objet (balise ```json…) ignoré
+                if char == "{":
+                    self._state = "key"
+            elif self._state == "key":
+                char = self._skip(_WHITESPACE + ",")
+                if char is None:
+                    return members
+                if char == "}":
+                    self._state = "done"
+                    return members
+                start = self._pos
+                complete, key = self._decode()
+                if not complete or self._skip(_WHITESPACE) != ":":
+                    # Clé ou « : » pas encore reçus : reprise au prochain fragment
+                    self._pos = start
+                    return members
+                self._pos += 1
+                self._key = str(key)
+                self._state = "value"
+            elif self._state == "value":
+                char = self._skip(_WHITESPACE)
+                if char is None:
+                    return members
+                if char == "[":
+                    self._pos += 1
+                    self._state = "element"
+                    continue
+                complete, value = self._decode()
+                if not complete:
+                    return members
+                members.append(JsonMember(self._key, value, False))
+                self._state = "key"
+            elif self._state == "element":
+                char = self._skip(_WHITESPACE + ",")
+                if char is None:
+                    return members
+                if char == "]":
+                    self._pos += 1
+                    self._state = "key"
+                    continue
+                complete, value = self._decode()
+                if not complete:
+                    return members
+                members.append(JsonMember(self._key, value, True))
+            else:
+                return members
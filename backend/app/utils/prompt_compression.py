@@ -0,0 +1,207 @@
+"""
+Compression des documents avant prompt : nettoyage (mentions légales, contacts,
+en-têtes répétés, doublons), découpage en sections, classement par pertinence
+lexicale vis-à-vis de l'autre document et sélection dans un budget de tokens.
+"""
+
+import math
+import re
+
+from app.utils.text_tokens import CHARS_PER_TOKEN, estimate_tokens, fold, tokenize
+
+_CONTACT_RE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"
+    r"|(?:\+\d{2}\s?|0)[1-9](?:[\s.-]?\d{2}){4}"
+    r"|https?://\S+|www\.\S+|linkedin\.com/\S+|github\.com/\S+"
+)
+_PAGE_RE = re.compile(r"^(?:page\s*)?\d+\s*(?:/|sur|of)\s*\d+$|^page\s*\d+$")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+")
+
+# Lignes sans valeur pour le matching (pieds de page légaux, RGPD…)
+_LEGAL_CUES = (
+    "rgpd", "donnees personnelles", "loi informatique", "j'autorise le traitement",
+    "tous droits reserves", "mentions legales", "egalite des chances", "cookies",
+    "curriculum vitae", "reference de l'offre", "ref. de l'offre",
+)
+
+# Titres de section usuels des CV et des offres
+_HEADING_WORDS = frozenset(
+    (
+        "experience", "experiences", "experience professionnelle",
+        "experiences professionnelles", "formation", "formations", "competences",
+        "competences techniques", "profil", "profil recherche", "langues", "missions",
+        "vos missions", "le poste", "projets", "certifications", "diplomes", "parcours",
+        "outils", "avantages", "a propos", "centres d'interet", "loisirs", "education",
+        "skills", "languages", "profile", "summary", "projects", "qualifications",
+        "requirements", "responsabilites",
+    )
+)
+
+# Au-delà, une ligne sans retour à la ligne est redécoupée en phrases
+_LONG_LINE_CHARS = 400
+# Taille cible d'une section reconstituée à partir de phrases
+_PSEUDO_SECTION_CHARS = 800
+# Bonus de position : le haut du document (titre, expérience récente) prime
+_POSITION_WEIGHT = 0.5
+
+
+def _is_boilerplate(line: str, folded: str) -> bool:
+    if _PAGE_RE.match(folded):
+        return True
+    if any(cue in folded for cue in _LEGAL_CUES):
+        return True
+    if _CONTACT_RE.search(line):
+        # Ligne de coordonnées : presque rien une fois les contacts retirés
+        return len(tokenize(_CONTACT_RE.sub(" ", line))) < 3
+    return False
+
+
+def _is_heading(line: str, folded: str) -> bool:
+    if len(line) > 40 or line.endswith((".", ",", ";")):
+        return False
+    if folded.strip(" :-–") in _HEADING_WORDS:
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+
+def _split_long_line(line: str) -> list[str]:
+    if len(line) <= _LONG_LINE_CHARS:
+        return [line]
+    return [s for s in _SENTENCE_SPLIT_RE.split(line) if s]
+
+
+def _sections(text: str) -> list[list[str]]:
+    """Lignes nettoyées et dédoublonnées, regroupées en sections."""
+    sections: list[list[str]] = []
+    current: list[str] = []
+    current_chars = 0
+    seen: set[str] = set()
+
+    def close() -> None:
+        nonlocal current, current_chars
+        if current:
+            sections.append(current)
+        current, current_chars = [], 0
+
+    for raw in (text or "").splitlines():
+        line = re.sub(r"\s+", " ", raw).strip()
+        if not line:
+            close()
+            continue
+        parts = _split_long_line(line)
+        for sentence in parts:
+            folded = fold(sentence)
+            if _is_boilerplate(sentence, folded):
+                continue
+            key = re.sub(r"[^a-z0-9]+", " ", folded).strip()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if _is_heading(sentence, folded):
+                close()
+            elif len(parts) > 1 and current_chars + len(sentence) > _PSEUDO_SECTION_CHARS:
+                close()
+            current.append(sentence)
+            current_chars += len(sentence)
+    close()
+    return sections
+
+
+def _render(sections: list[list[str]]) -> str:
+    return "\n\n".join("\n".join(lines) for lines in sections)
+
+
+def _relevance(section: list[str], reference_terms: set[str]) -> float:
+    terms = set(tokenize(" ".join(section)))
+    if not terms or not reference_terms:
+        return 0.0
+    return len(terms & reference_terms) / math.sqrt(len(terms))
+
+
+def compress_document(
+    text: str, reference: str | None = None, *, budget_tokens: int
+) -> str:
+    """
+    Texte nettoyé tenant dans budget_tokens. Si le document est trop long, les
+    sections les plus pertinentes pour `reference` (l'offre pour un CV, le CV
+    pour une offre) sont conservées, dans leur ordre d'origine.
+    """
+    sections = _sections(text)
+    rendered = _render(sections)
+    if estimate_tokens(rendered) <= budget_tokens:
+        return rendered
+
+    reference_terms = set(tokenize(reference or ""))
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: -(
+            _relevance(sections[i], reference_terms) + _POSITION_WEIGHT / (1 + i)
+        ),
+    )
+
+    selected: dict[int, list[str]] = {}
+    remaining = budget_tokens
+    for index in ranked:
+        # Séparateur entre sections compté dans le budget
+        cost = estimate_tokens("\n".join(sections[index])) + 1
+        if cost <= remaining:
+            selected[index] = sections[index]
+            remaining -= cost
+            continue
+        # Section trop longue : en garder le début si la place le permet
+        partial: list[str] = []
+        for line in sections[index]:
+            line_cost = estimate_tokens(line) + 1
+            if line_cost > remaining:
+                break
+            partial.append(line)
+            remaining -= line_cost
+        if partial:
+            selected[index] = partial
+        if remaining <= 0:
+            break
+
+    if not selected:
+        return rendered[: budget_tokens * CHARS_PER_TOKEN].rstrip() + "…"
+    return _render([selected[i] for i in sorted(selected)])
+
+
+def _section_pieces(section: list[str], budget_tokens: int) -> list[list[str]]:
+    """Découpe une section trop longue en groupes de lignes tenant dans le budget."""
+    pieces: list[list[str]] = []
+    current: list[str] = []
+    used = 0
+    for line in section:
+        if estimate_tokens(line) > budget_tokens:
+            line = line[: budget_tokens * CHARS_PER_TOKEN]
+        cost = estimate_tokens(line) + 1
+        if current and used + cost > budget_tokens:
+            pieces.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_document(text: str, *, budget_tokens: int) -> list[str]:
+    """
+    Document nettoyé découpé en morceaux d'au plus budget_tokens, sections
+    regroupées dans leur ordre d'origine (mode map-reduce des longues offres).
+    """
+    chunks: list[list[list[str]]] = []
+    current: list[list[str]] = []
+    used = 0
+    for section in _sections(text):
+        for piece in _section_pieces(section, budget_tokens):
+            cost = estimate_tokens("\n".join(piece)) + 1
+            if current and used + cost > budget_tokens:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append(current)
+    return [_render(chunk) for chunk in chunks]
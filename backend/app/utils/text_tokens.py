@@ -0,0 +1,45 @@
+"""Tokenisation légère partagée (moteur lexical, compression des prompts)."""
+
+import math
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    """
+    a au aux avec ce ces cette dans de des du elle en et etre eux il ils je la le les leur
+    lui ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se
+    ses son sur ta te tes toi ton tu un une vos votre vous c d j l m n s t y est sont ete
+    avoir plus tres bien aussi ainsi dont entre chez afin sein etc tout tous toute toutes
+    the and or of to in for with on at by an be is are as from this that will you your our
+    we it its have has
+    """.split()
+)
+
+# Approximation sans tokenizer distant : ~4 caractères par token (FR/EN)
+CHARS_PER_TOKEN = 4
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents, pour un matching robuste (développeur = developpeur)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS and (len(token) > 1 or token in {"c", "r"})
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
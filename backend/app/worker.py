@@ -0,0 +1,81 @@
+"""
+Worker de jobs : exécute les comparaisons et analyses d'entretien mises en
+file par l'API (JOB_QUEUE_BACKEND=redis), indépendamment des workers web.
+
+    python -m app.worker
+"""
+
+import asyncio
+
+from app.config import settings
+from app.db import init_db
+from app.services.job_queue import (
+    dequeue_job,
+    execute_job,
+    forget_worker_state,
+    publish_worker_state,
+)
+from app.services.persistence_queue import persistence_queue
+from app.services.redis_service import redis_service
+
+# Attente d'un BRPOP, sous le socket_timeout du client Redis (5 s)
+_POLL_SECONDS = 2
+
+
+async def report_state(concurrency: int, running: set[asyncio.Task]) -> None:
+    """État publié pour l'API : admission (503) et /health reflètent la charge réelle."""
+    while True:
+        try:
+            await asyncio.to_thread(publish_worker_state, concurrency, len(running))
+        except Exception as exc:
+            print(f"Erreur Redis publication état worker: {exc}")
+        await asyncio.sleep(settings.JOB_WORKER_REPORT_SECONDS)
+
+
+async def run_worker(concurrency: int) -> None:
+    slots = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+
+    def release(task: asyncio.Task) -> None:
+        running.discard(task)
+        slots.release()
+
+    reporter = asyncio.create_task(report_state(concurrency, running))
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                payload = await asyncio.to_thread(dequeue_job, _POLL_SECONDS)
+            except Exception as exc:
+                print(f"Erreur Redis lecture de la file: {exc}")
+                payload = None
+                await asyncio.sleep(_POLL_SECONDS)
+            if payload is None:
+                slots.release()
+                continue
+            task = asyncio.create_task(execute_job(payload))
+            running.add(task)
+            task.add_done_callback(release)
+    finally:
+        reporter.cancel()
+        for task in running:
+            task.cancel()
+        try:
+            await asyncio.to_thread(forget_worker_state)
+        except Exception as exc:
+            print(f"Erreur Redis état worker: {exc}")
+
+
+def main() -> None:
+    if not redis_service.redis_available:
+        raise SystemExit("Redis est requis pour le worker de jobs")
+    init_db()
+    print(f"Worker de jobs démarré ({settings.JOB_WORKER_CONCURRENCY} jobs simultanés)")
+    try:
+        asyncio.run(run_worker(settings.JOB_WORKER_CONCURRENCY))
+    finally:
+        persistence_queue.close()
+
+
+if __name__ == "__main__":
+    main()
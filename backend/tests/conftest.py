@@ -1,5 +1,7 @@
+import json
 import os
 import uuid
+from types import SimpleNamespace
 
 import pytest
 from fastapi.testclient import TestClient
@@ -11,6 +13,8 @@ from sqlalchemy.pool import NullPool
 os.environ.setdefault("GOOGLE_API_KEY", "test-google-key")
 os.environ.setdefault("SECRET_KEY", "ci-test-secret-key")
 os.environ.setdefault("ENVIRONMENT", "test")
+# Pas d'appels Gemini en tâche de fond pendant les tests d'API
+os.environ.setdefault("SPECULATIVE_QUESTIONS_ENABLED", "false")
 os.environ.setdefault(
     "DATABASE_URL",
     os.environ.get(
@@ -21,6 +25,7 @@ os.environ.setdefault(
 
 from app.db import Base, get_db, _normalize_database_url  # noqa: E402
 from app.main import app  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
 from app.models.comparison_record import ComparisonRecord  # noqa: F401,E402
 from app.models.interview_record import InterviewRecord  # noqa: F401,E402
 from app.models.user import User  # noqa: F401,E402
@@ -28,6 +33,52 @@ from app.models.user import User  # noqa: F401,E402
 
 TEST_DATABASE_URL = _normalize_database_url(os.environ["DATABASE_URL"])
 
+GEMINI_PAYLOAD = {
+    "items": [
+        {
+            "category": "compétences techniques",
+            "offerText": "Python",
+            "cvText": "5 ans de Python",
+            "status": "match",
+            "confidence": 0.9,
+            "suggestions": ["inutile"],
+        },
+        {
+            "category": "langues",
+            "offerText": "Anglais courant",
+            "cvText": None,
+            "status": "missing",
+            "confidence": 1.4,
+            "suggestions": ["Ajouter le niveau d'anglais"],
+        },
+    ]
+}
+
+
+class FakeAsyncModels:
+    """client.aio.models factice : renvoie toujours `payload` (en un bloc ou par fragments)."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+        self.configs = []
+
+    async def generate_content(self, **kwargs):
+        self.calls += 1
+        self.configs.append(kwargs["config"])
+        return SimpleNamespace(text=json.dumps(self.payload))
+
+    async def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        self.configs.append(kwargs["config"])
+        text = json.dumps(self.payload)
+
+        async def chunks():
+            for start in range(0, len(text), 17):
+                yield SimpleNamespace(text=text[start : start + 17])
+
+        return chunks()
+
 
 @pytest.fixture(scope="session")
 def engine():
@@ -89,3 +140,24 @@ def registered_user(client):
 @pytest.fixture
 def auth_headers(registered_user):
     return {"Authorization": f"Bearer {registered_user['token']}"}
+
+
+@pytest.fixture
+def gemini_payload():
+    return GEMINI_PAYLOAD
+
+
+@pytest.fixture
+def make_service():
+    """Fabrique d'AIService sans client réel : (service, models factices)."""
+
+    def build(payload=GEMINI_PAYLOAD, *, models=None):
+        service = AIService.__new__(AIService)
+        service.model_name = "test-model"
+        service._pending_requirements = {}
+        service._pending_questions = {}
+        models = models or FakeAsyncModels(payload)
+        service.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+        return service, models
+
+    return build
@@ -0,0 +1,412 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.comparison import ComparisonDraft
+from app.models.interview import InterviewAnalysis
+from app.services.ai_service import AIService, question_category_counts
+from app.services.cache_service import comparison_cache, interview_questions_cache
+from app.services.llm_limiter import LLMOverloadedError, llm_limiter
+
+
+def test_compare_async_normalizes_and_caches(make_service):
+    comparison_cache.clear()
+    service, models = make_service()
+
+    result = asyncio.run(service.compare_offer_and_cv_async("Offre Python", "CV Python"))
+    assert result["summary"]["totalItems"] == 2
+    assert result["summary"]["matches"] == 1
+    assert result["items"][0]["suggestions"] is None
+    assert result["items"][1]["confidence"] == 1.0
+
+    again = asyncio.run(service.compare_offer_and_cv_async("Offre  Python", "CV Python "))
+    assert again["summary"] == result["summary"]
+    assert models.calls == 1
+    assert models.configs[0].response_schema is ComparisonDraft
+
+
+def test_normalize_item_validates_in_one_pass():
+    item = AIService._normalize_item(
+        {
+            "offerText": "  Docker ",
+            "status": " UNCLEAR",
+            "confidence": "-3",
+            "cvText": "",
+            "suggestions": ["a", " ", "b", "c", "d"],
+        }
+    )
+    assert item["offerText"] == "Docker"
+    assert item["category"] == "autres"
+    assert item["status"] == "unclear"
+    assert item["confidence"] == 0.0
+    assert item["cvText"] is None
+    assert item["suggestions"] == ["a", "b", "c"]
+    assert AIService._normalize_item({"offerText": "  ", "status": "match"}) is None
+    assert AIService._normalize_item("pas un objet") is None
+
+
+def test_analysis_async_uses_schema_and_clamps_score(make_service):
+    service, models = make_service(
+        payload={
+            "score_global": 14,
+            "points_forts": ["Clarté", ""],
+            "points_amelioration": [],
+            "suggestions": [{"titre": "STAR", "description": "", "priorite": "HAUTE"}],
+            "conseils_specifiques": [],
+        }
+    )
+    result = asyncio.run(
+        service.analyze_interview_responses_async(
+            [{"text": "Q ?", "category": "Expérience"}], [{"answer": "R"}], "CV", "Offre"
+        )
+    )
+    analysis = result["analysis"]
+    assert analysis["score_global"] == 10
+    assert analysis["points_forts"] == ["Clarté"]
+    assert analysis["suggestions"][0]["priorite"] == "haute"
+    assert models.configs[0].response_schema is InterviewAnalysis
+
+
+def test_stream_analysis_emits_fields_then_full_analysis(make_service):
+    payload = {
+        "score_global": 12,
+        "points_forts": ["Clair", " "],
+        "points_amelioration": ["Concision"],
+        "suggestions": [{"titre": "STAR", "description": "Structurer", "priorite": "HAUTE"}],
+        "conseils_specifiques": [{"question": "Q1", "conseil": "Chiffrer"}],
+    }
+    service, models = make_service(payload=payload)
+
+    async def run():
+        return [
+            event
+            async for event in service.stream_interview_analysis(
+                [{"text": "Q1", "category": "Motivation"}], [{"answer": "R"}], "CV", "Offre"
+            )
+        ]
+
+    events = asyncio.run(run())
+    assert events[0] == {"type": "field", "field": "score_global", "value": 10}
+    entries = [(e["field"], e["item"]) for e in events if e["type"] == "entry"]
+    assert entries == [
+        ("points_forts", "Clair"),
+        ("points_amelioration", "Concision"),
+        ("suggestions", {"titre": "STAR", "description": "Structurer", "priorite": "haute"}),
+        ("conseils_specifiques", {"question": "Q1", "conseil": "Chiffrer"}),
+    ]
+    assert events[-1]["type"] == "analysis"
+    assert events[-1]["analysis"]["score_global"] == 10
+    assert events[-1]["analysis"]["points_forts"] == ["Clair"]
+    assert models.configs[0].response_schema is InterviewAnalysis
+
+
+def test_generate_questions_async_falls_back_on_invalid_payload(make_service):
+    service, _ = make_service(payload={"questions": []})
+    questions = asyncio.run(service.generate_interview_questions_async("CV", "Offre", 3))
+    assert len(questions) == 3
+    assert all(q["text"] for q in questions)
+
+
+def test_generate_questions_async_reuses_cache_unless_regenerate(make_service):
+    interview_questions_cache.clear()
+    service, models = make_service(
+        payload=[{"text": "Pourquoi FastAPI ?", "category": "Compétences"}]
+    )
+
+    async def run():
+        first = await service.generate_interview_questions_async("CV", "Offre", 1)
+        again = await service.generate_interview_questions_async(" CV", "Offre ", 1)
+        other_count = await service.generate_interview_questions_async("CV", "Offre", 2)
+        forced = await service.generate_interview_questions_async(
+            "CV", "Offre", 1, regenerate=True
+        )
+        return first, again, other_count, forced
+
+    first, again, _, forced = asyncio.run(run())
+    assert first == again == forced
+    # Cache partagé pour le même couple, nouvel appel pour 2 questions et pour regenerate
+    assert models.calls == 3
+
+
+
+def test_cached_questions_are_served_while_llm_is_saturated(make_service, monkeypatch):
+    interview_questions_cache.clear()
+    service, models = make_service(
+        payload=[{"text": "Pourquoi FastAPI ?", "category": "Compétences"}]
+    )
+    first = asyncio.run(service.generate_interview_questions_async("CV", "Offre", 1))
+
+    def saturated():
+        raise LLMOverloadedError("Service IA saturé", 5)
+
+    monkeypatch.setattr(llm_limiter, "check_admission", saturated)
+    assert asyncio.run(service.generate_interview_questions_async("CV", "Offre", 1)) == first
+    with pytest.raises(LLMOverloadedError):
+        asyncio.run(service.generate_interview_questions_async("CV", "Offre", 2))
+    assert models.calls == 1
+
+
+
+def test_streamed_questions_from_cache_bypass_saturation(make_service, monkeypatch):
+    interview_questions_cache.clear()
+    service, models = make_service(models=CategoryModels())
+    first = collect_questions(service, 5)
+
+    def saturated():
+        raise LLMOverloadedError("Service IA saturé", 5)
+
+    monkeypatch.setattr(llm_limiter, "check_admission", saturated)
+    assert collect_questions(service, 5) == first
+    with pytest.raises(LLMOverloadedError):
+        collect_questions(service, 6)
+    assert models.calls == 5
+
+def test_compare_async_merges_near_duplicates_like_the_stream(make_service, gemini_payload):
+    comparison_cache.clear()
+    duplicated = {"items": gemini_payload["items"] + [gemini_payload["items"][0]]}
+    service, _ = make_service(payload=duplicated)
+
+    result = asyncio.run(service.compare_offer_and_cv_async("Offre doublon", "CV"))
+
+    async def stream():
+        return [e async for e in service.stream_compare_offer_and_cv("Offre doublon 2", "CV")]
+
+    streamed = [e for e in asyncio.run(stream()) if e["type"] == "item"]
+    assert result["summary"]["totalItems"] == len(streamed) == 2
+
+def test_stream_compare_emits_items_then_summary_and_caches(make_service):
+    comparison_cache.clear()
+    service, models = make_service()
+
+    async def collect():
+        return [e async for e in service.stream_compare_offer_and_cv("Offre", "CV")]
+
+    events = asyncio.run(collect())
+    assert [e["type"] for e in events] == ["item", "item", "summary"]
+    summary = events[-1]["summary"]
+    assert summary["totalItems"] == 2
+    assert summary["missing"] == 1
+    assert summary["categoryStats"]["langues"]["missing"] == 1
+    assert events[-1]["cached"] is False
+
+    replay = asyncio.run(collect())
+    assert replay[-1]["cached"] is True
+    assert [e["item"]["id"] for e in replay[:-1]] == [e["item"]["id"] for e in events[:-1]]
+    assert models.calls == 1
+
+
+def test_two_stage_mode_reuses_offer_requirements(make_service, monkeypatch):
+    from app.config import settings
+    from app.services.cache_service import offer_requirements_cache
+
+    comparison_cache.clear()
+    offer_requirements_cache.clear()
+    monkeypatch.setattr(settings, "COMPARISON_TWO_STAGE", True)
+
+    requirements = {
+        "requirements": [
+            {"category": "compétences techniques", "offerText": "Python"},
+            {"category": "langues", "offerText": "Anglais courant"},
+        ]
+    }
+    evaluation = {
+        "items": [
+            {"index": 2, "cvText": None, "status": "missing", "confidence": 0.8},
+            {"index": 1, "cvText": "Django", "status": "match", "confidence": 0.9},
+        ]
+    }
+    prompts = []
+
+    class TwoStageModels:
+        async def generate_content(self, **kwargs):
+            instructions = kwargs["config"].system_instruction
+            prompts.append(instructions)
+            payload = requirements if "Extrais les exigences" in instructions else evaluation
+            return SimpleNamespace(text=json.dumps(payload))
+
+    service, _ = make_service(models=TwoStageModels())
+
+    async def run():
+        first = await service.compare_offer_and_cv_async("Offre Python", "CV A")
+        second = await service.compare_offer_and_cv_async("Offre Python", "CV B")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [i["offerText"] for i in first["items"]] == ["Anglais courant", "Python"]
+    assert first["items"][0]["category"] == "langues"
+    assert second["summary"]["matches"] == 1
+    # 1 extraction + 2 matchings : l'offre n'est extraite qu'une fois
+    assert len(prompts) == 3
+    assert sum("Extrais les exigences" in p for p in prompts) == 1
+
+
+class ChunkedModels:
+    """Réponse différente selon l'extrait d'offre présent dans le prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def _payload(self, prompt):
+        if "extrait 1/" in prompt:
+            rows = [("Python avancé", "match"), ("Anglais courant", "missing")]
+        else:
+            rows = [("Python, avancé", "match"), ("Kubernetes", "missing")]
+        return {
+            "items": [
+                {
+                    "category": "compétences techniques",
+                    "offerText": text,
+                    "cvText": None,
+                    "status": status,
+                    "confidence": 0.8,
+                    "suggestions": None,
+                }
+                for text, status in rows
+            ]
+        }
+
+    async def generate_content(self, **kwargs):
+        self.prompts.append(kwargs["contents"])
+        return SimpleNamespace(text=json.dumps(self._payload(kwargs["contents"])))
+
+    async def generate_content_stream(self, **kwargs):
+        self.prompts.append(kwargs["contents"])
+        text = json.dumps(self._payload(kwargs["contents"]))
+
+        async def chunks():
+            for start in range(0, len(text), 11):
+                yield SimpleNamespace(text=text[start : start + 11])
+
+        return chunks()
+
+
+LONG_OFFER = "\n\n".join(
+    f"SECTION {i}\n" + "\n".join(f"Exigence {i}.{j} sur le projet numéro {j}." for j in range(12))
+    for i in range(4)
+)
+
+
+def test_long_offer_is_compared_in_chunks_and_merged(make_service, monkeypatch):
+    from app.config import settings
+
+    comparison_cache.clear()
+    monkeypatch.setattr(settings, "PROMPT_DOCUMENT_TOKENS", 150)
+    service, models = make_service(models=ChunkedModels())
+
+    result = asyncio.run(service.compare_offer_and_cv_async(LONG_OFFER, "CV Python"))
+
+    assert len(models.prompts) > 1
+    assert all("Ne traite que les exigences" in p for p in models.prompts)
+    # "Python avancé" / "Python, avancé" fusionnés, summary recalculé une fois
+    offer_texts = [i["offerText"] for i in result["items"]]
+    assert offer_texts.count("Python avancé") + offer_texts.count("Python, avancé") == 1
+    assert result["summary"]["totalItems"] == 3
+    assert result["summary"]["missing"] == 2
+
+
+def test_stream_long_offer_merges_chunk_streams(make_service, monkeypatch):
+    from app.config import settings
+
+    comparison_cache.clear()
+    monkeypatch.setattr(settings, "PROMPT_DOCUMENT_TOKENS", 150)
+    service, models = make_service(models=ChunkedModels())
+
+    async def collect():
+        return [e async for e in service.stream_compare_offer_and_cv(LONG_OFFER, "CV Python")]
+
+    events = asyncio.run(collect())
+    items = [e["item"] for e in events if e["type"] == "item"]
+    assert len(models.prompts) > 1
+    assert len(items) == 3
+    assert events[-1]["summary"]["totalItems"] == 3
+
+
+class CategoryModels:
+    """Deux questions par catégorie ; « Problème » répète une question d'« Expérience »."""
+
+    def __init__(self, failing=None):
+        self.calls = 0
+        self.failing = failing
+
+    async def generate_content(self, **kwargs):
+        self.calls += 1
+        category = kwargs["contents"].split("Catégorie imposée : ")[1].split("\n")[0]
+        if category == self.failing:
+            raise RuntimeError("groupe en échec")
+        texts = [f"Question {category} numéro un ?", f"Question {category} numéro deux ?"]
+        if category == "Problème":
+            texts[1] = "Question Expérience numéro un ?"
+        count = int(kwargs["contents"].split("Nombre de questions : ")[1].split("\n")[0])
+        payload = [{"text": text, "category": category} for text in texts[:count]]
+        return SimpleNamespace(text=json.dumps(payload))
+
+
+def test_question_category_counts_spread_requested_total():
+    assert question_category_counts(3) == [("Expérience", 1), ("Compétences", 1), ("Motivation", 1)]
+    assert sum(count for _, count in question_category_counts(12)) == 12
+    assert dict(question_category_counts(12))["Expérience"] == 3
+
+
+def collect_questions(service, num_questions):
+    async def run():
+        return [
+            q async for q in service.stream_interview_questions("CV", "Offre", num_questions)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_fan_out_questions_merge_dedupe_and_cache(make_service):
+    interview_questions_cache.clear()
+    service, models = make_service(models=CategoryModels())
+
+    questions = collect_questions(service, 10)
+    texts = [q["text"] for q in questions]
+    assert models.calls == 5
+    assert len(texts) == 9 and len(set(texts)) == 9
+    assert {q["category"] for q in questions} == {
+        "Expérience", "Compétences", "Motivation", "Problème", "Spécifique"
+    }
+
+    # Résultat complet : réutilisé par la génération classique
+    again = asyncio.run(service.generate_interview_questions_async("CV", "Offre", 10))
+    assert again == questions
+    assert models.calls == 5
+
+
+def test_fan_out_failed_group_is_topped_up_and_not_cached(make_service):
+    interview_questions_cache.clear()
+    service, _ = make_service(models=CategoryModels("Motivation"))
+
+    questions = collect_questions(service, 5)
+    assert len(questions) == 5
+    assert not any(q["text"].startswith("Question Motivation") for q in questions)
+    assert interview_questions_cache.get(service.questions_cache_key("CV", "Offre", 5)) is None
+
+
+def test_limiter_queueing_is_not_counted_as_model_latency(make_service, monkeypatch):
+    from app.services.llm_metrics import model_router
+
+    latencies = []
+    acquire = llm_limiter.acquire
+
+    async def queued_acquire():
+        await asyncio.sleep(0.2)  # file d'attente locale saturée
+        return await acquire()
+
+    monkeypatch.setattr(llm_limiter, "acquire", queued_acquire)
+    monkeypatch.setattr(
+        model_router, "record", lambda model, use_case, latency, *args: latencies.append(latency)
+    )
+    service, _ = make_service()
+
+    async def run():
+        await service._generate_json_async("Prompt")
+        async for _ in service._stream_text_async("Prompt"):
+            pass
+
+    asyncio.run(run())
+    assert len(latencies) == 2
+    assert all(latency < 0.1 for latency in latencies)
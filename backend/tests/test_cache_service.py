@@ -0,0 +1,44 @@
+from app.services.cache_service import ResultCache, content_key
+
+
+def test_content_key_ignores_whitespace_differences():
+    assert content_key("Offre  Python\n", "CV") == content_key("Offre Python", " CV ")
+    assert content_key("Offre Python", "CV") != content_key("Offre Python", "CV", "autre-modele")
+
+
+def test_memory_tier_hit_miss_and_copy():
+    cache = ResultCache("test", ttl_seconds=60, max_entries=4)
+    assert cache.get("k") is None
+
+    cache.set("k", {"items": [1, 2]})
+    first = cache.get("k")
+    first["items"].append(3)
+    assert cache.get("k") == {"items": [1, 2]}
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["writes"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache("test-lru", ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_memory_tier_expires_entries(monkeypatch):
+    import app.services.cache_service as module
+
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    cache = ResultCache("test-ttl", ttl_seconds=10, max_entries=4)
+    cache.set("k", "v")
+    now[0] += 11
+    assert cache.get("k") is None
@@ -0,0 +1,116 @@
+import json
+from unittest.mock import patch
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.models.comparison_record import ComparisonRecord
+from app.services.persistence_queue import persistence_queue
+
+
+def fake_result(match_percentage):
+    return {
+        "items": [
+            {
+                "id": "1",
+                "category": "skills",
+                "offerText": "Python",
+                "cvText": None,
+                "status": "match" if match_percentage else "missing",
+                "confidence": 0.9,
+            }
+        ],
+        "summary": {
+            "totalItems": 1,
+            "matches": 1 if match_percentage else 0,
+            "missing": 0 if match_percentage else 1,
+            "unclear": 0,
+            "matchPercentage": match_percentage,
+            "categoryStats": {},
+        },
+    }
+
+
+async def fake_compare(offer_text, cv_text):
+    return fake_result(1.0 if "Python" in cv_text else 0.0)
+
+
+def parse_events(body):
+    return [
+        json.loads(line[len("data: "):])
+        for line in body.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_compare_batch_streams_results_and_ranking(client, auth_headers, db_session, registered_user):
+    with patch(
+        "app.services.batch_service.ai_service.compare_offer_and_cv_async",
+        new=fake_compare,
+    ):
+        with client.stream(
+            "POST",
+            "/api/compare-batch",
+            headers=auth_headers,
+            data={
+                "offer_text": "Développeur Python",
+                "cv_texts": ["CV Java", "CV Python"],
+            },
+        ) as response:
+            assert response.status_code == 200
+            events = parse_events("".join(response.iter_text()))
+
+    results = [e for e in events if e["type"] == "result"]
+    assert len(results) == 2
+    ranking = next(e for e in events if e["type"] == "ranking")["ranking"]
+    assert [r["label"] for r in ranking] == ["CV 2", "CV 1"]
+    assert ranking[0]["rank"] == 1
+    assert events[-1]["type"] == "complete"
+
+    user_id = UUID(registered_user["user"]["id"])
+    persistence_queue.flush()
+    db_session.expire_all()
+    rows = db_session.scalars(
+        select(ComparisonRecord).where(ComparisonRecord.user_id == user_id)
+    ).all()
+    assert len(rows) == 2
+    assert {str(r.id) for r in rows} == {r["comparison_id"] for r in ranking}
+
+
+def test_compare_batch_requires_cvs(client, auth_headers):
+    response = client.post(
+        "/api/compare-batch",
+        headers=auth_headers,
+        data={"offer_text": "Développeur Python"},
+    )
+    assert response.status_code == 400
+
+
+def test_compare_offers_streams_sorted_leaderboard(client, auth_headers):
+    seen_cvs = []
+
+    async def fake_compare_offer(offer_text, cv_text):
+        seen_cvs.append(cv_text)
+        return fake_result(1.0 if "Python" in offer_text else 0.5)
+
+    with patch(
+        "app.services.batch_service.ai_service.compare_offer_and_cv_async",
+        new=fake_compare_offer,
+    ):
+        with client.stream(
+            "POST",
+            "/api/compare-offers",
+            headers=auth_headers,
+            data={
+                "cv_text": "CV   développeur\nPython",
+                "offer_texts": ["Offre Java\nDétails", "Offre Python\nDétails"],
+            },
+        ) as response:
+            assert response.status_code == 200
+            events = parse_events("".join(response.iter_text()))
+
+    leaderboards = [e["leaderboard"] for e in events if e["type"] == "leaderboard"]
+    assert len(leaderboards) == 2
+    assert [r["label"] for r in leaderboards[-1]] == ["Offre Python", "Offre Java"]
+    # CV brut : même clé de cache qu'une comparaison unitaire
+    assert seen_cvs == ["CV   développeur\nPython", "CV   développeur\nPython"]
@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import patch
+
+from app.services import comparison_service
+from app.services.comparison_service import coalesced_comparison_events
+
+
+def make_fake_stream(calls, gate):
+    async def fake_stream(offer_text, cv_text):
+        calls.append((offer_text, cv_text))
+        yield {"type": "item", "item": {"id": "1", "offerText": "Python", "status": "match"}}
+        await gate.wait()
+        yield {"type": "summary", "summary": {"totalItems": 1}}
+
+    return fake_stream
+
+
+def test_concurrent_identical_requests_share_one_llm_call():
+    async def scenario():
+        calls = []
+        gate = asyncio.Event()
+        with patch(
+            "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+            new=make_fake_stream(calls, gate),
+        ):
+            async def consume():
+                return [e["type"] async for e in coalesced_comparison_events("Offre", "CV")]
+
+            first = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            second = asyncio.create_task(consume())
+            await asyncio.sleep(0.01)
+            gate.set()
+            results = await asyncio.gather(first, second)
+
+        assert calls == [("Offre", "CV")]
+        assert results == [["item", "summary"], ["item", "summary"]]
+        assert comparison_service.coalescing_stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_flight_is_cancelled_when_every_subscriber_leaves():
+    async def scenario():
+        calls = []
+        gate = asyncio.Event()
+        with patch(
+            "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+            new=make_fake_stream(calls, gate),
+        ):
+            events = coalesced_comparison_events("Offre annulée", "CV")
+            first = await events.__anext__()
+            assert first["type"] == "item"
+            flight = next(iter(comparison_service._flights.values()))
+            await events.aclose()
+            await asyncio.sleep(0)
+
+        assert flight.task.cancelled()
+        assert comparison_service.coalescing_stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_remote_follower_polls_until_the_leader_finishes(monkeypatch):
+    result = {"items": [], "summary": {"totalItems": 0}}
+    polls = iter([(False, None), (False, None), (True, result)])
+    monkeypatch.setattr(comparison_service, "_REMOTE_POLL_SECONDS", 0.0)
+    monkeypatch.setattr(comparison_service, "_remote_result", lambda key: next(polls))
+
+    assert asyncio.run(comparison_service._wait_remote_result("clé")) == result
+
+
+def test_remote_wait_is_cancellable(monkeypatch):
+    monkeypatch.setattr(comparison_service, "_remote_result", lambda key: (False, None))
+
+    async def scenario():
+        waiter = asyncio.create_task(comparison_service._wait_remote_result("clé"))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return waiter.cancelled()
+
+    assert asyncio.run(scenario())
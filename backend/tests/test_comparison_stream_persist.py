@@ -1,9 +1,13 @@
+import asyncio
+import json
 from unittest.mock import patch
 from uuid import UUID
 
 from sqlalchemy import select
 
 from app.models.comparison_record import ComparisonRecord
+from app.services import job_queue
+from app.services.persistence_queue import persistence_queue
 
 
 FAKE_RESULT = {
@@ -28,10 +32,16 @@ FAKE_RESULT = {
 }
 
 
+async def fake_stream(offer_text, cv_text):
+    for item in FAKE_RESULT["items"]:
+        yield {"type": "item", "item": item}
+    yield {"type": "summary", "summary": FAKE_RESULT["summary"]}
+
+
 def test_compare_stream_persists_history(client, auth_headers, db_session, registered_user):
     with patch(
-        "app.services.comparison_service.ai_service.compare_offer_and_cv",
-        return_value=FAKE_RESULT,
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=fake_stream,
     ):
         with client.stream(
             "POST",
@@ -47,6 +57,7 @@ def test_compare_stream_persists_history(client, auth_headers, db_session, regis
             assert '"type": "complete"' in body or '"type":"complete"' in body
 
     user_id = UUID(registered_user["user"]["id"])
+    persistence_queue.flush()
     db_session.expire_all()
     rows = db_session.scalars(
         select(ComparisonRecord).where(ComparisonRecord.user_id == user_id)
@@ -54,3 +65,90 @@ def test_compare_stream_persists_history(client, auth_headers, db_session, regis
     assert len(rows) == 1
     assert rows[0].match_percentage == 100.0
     assert rows[0].total_items == 1
+    assert rows[0].summary["usage"]["calls"] == 0
+
+
+def _frames(body: str) -> list[tuple[int, dict]]:
+    frames = []
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "data" in lines:
+            frames.append((int(lines["id"]), json.loads(lines["data"])))
+    return frames
+
+
+def test_compare_stream_resumes_from_last_event_id(client, auth_headers, db_session, registered_user):
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=fake_stream,
+    ):
+        response = client.post(
+            "/api/compare-stream",
+            headers=auth_headers,
+            json={"offer_text": "Offre Python", "cv_text": "CV Python"},
+        )
+    frames = _frames(response.text)
+    assert frames[0][1]["type"] == "job"
+    job_id = frames[0][1]["job_id"]
+    assert response.headers["X-Job-Id"] == job_id
+    assert [event_id for event_id, _ in frames] == list(range(1, len(frames) + 1))
+
+    # Connexion coupée après la 3e trame : seules les suivantes sont rejouées
+    resumed = client.get(
+        f"/api/compare-stream/{job_id}",
+        headers={**auth_headers, "Last-Event-ID": "3"},
+    )
+    assert resumed.status_code == 200
+    assert _frames(resumed.text) == frames[3:]
+
+    missing = client.get("/api/compare-stream/inconnu", headers=auth_headers)
+    assert missing.status_code == 404
+
+    user_id = UUID(registered_user["user"]["id"])
+    persistence_queue.flush()
+    db_session.expire_all()
+    rows = db_session.scalars(
+        select(ComparisonRecord).where(ComparisonRecord.user_id == user_id)
+    ).all()
+    assert len(rows) == 1
+
+
+def test_worker_executes_queued_comparison(db_session, registered_user):
+    payload = {
+        "job_id": "job-worker",
+        "kind": job_queue.COMPARISON_JOB,
+        "user_id": registered_user["user"]["id"],
+        "args": {"offer_text": "Offre Python", "cv_text": "CV Python", "mode": "fast"},
+    }
+    asyncio.run(job_queue.execute_job(payload))
+
+    persistence_queue.flush()
+
+    db_session.expire_all()
+    rows = db_session.scalars(
+        select(ComparisonRecord).where(
+            ComparisonRecord.user_id == UUID(registered_user["user"]["id"])
+        )
+    ).all()
+    assert len(rows) == 1
+    assert rows[0].summary["engine"] == "lexical"
+
+
+def test_compare_stream_fails_cleanly_when_job_is_not_found(client, auth_headers):
+    async def lost_job(job_id, user_id, after=0):
+        return None
+
+    async def queued(kind, user_id, args):
+        return "job-perdu"
+
+    with patch("app.routers.compare.enqueue_job", new=queued), patch(
+        "app.routers.compare.follow_job", new=lost_job
+    ):
+        response = client.post(
+            "/api/compare-stream",
+            headers=auth_headers,
+            json={"offer_text": "Offre Python", "cv_text": "CV Python"},
+        )
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Job introuvable après sa mise en file"
@@ -4,3 +4,11 @@ def test_health_ok(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert "features" in data
+
+
+def test_sse_health_reports_limiter(client):
+    response = client.get("/api/health/sse")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["queue_depth"] == 0
+    assert "avg_wait_ms" in data["limiter"]
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import interview_service
+from app.services.cache_service import interview_questions_cache
+from app.services.llm_limiter import llm_limiter
+
+QUESTIONS = [{"text": "Comment avez-vous utilisé Kubernetes ?", "category": "Compétences"}]
+ITEMS = [
+    {"offerText": "Python", "status": "match"},
+    {"offerText": "Kubernetes", "status": "missing"},
+    {"offerText": "Anglais courant", "status": "unclear"},
+]
+
+
+@pytest.fixture
+def speculation(monkeypatch, make_service):
+    interview_questions_cache.clear()
+    monkeypatch.setattr(settings, "SPECULATIVE_QUESTIONS_ENABLED", True)
+    monkeypatch.setattr(settings, "SPECULATIVE_QUESTIONS_COUNT", 1)
+    service, models = make_service(payload=QUESTIONS)
+    monkeypatch.setattr(interview_service, "ai_service", service)
+    yield service, models
+    interview_questions_cache.clear()
+
+
+def test_pregenerated_questions_are_served_from_cache(speculation):
+    service, models = speculation
+
+    async def run():
+        task = interview_service.schedule_question_pregeneration("Offre", "CV", ITEMS)
+        await task
+        return await service.generate_interview_questions_async("CV", "Offre", 1)
+
+    assert asyncio.run(run()) == QUESTIONS
+    assert models.calls == 1
+    # Les écarts de la comparaison orientent les questions
+    prompt = service._build_questions_prompt("CV", "Offre", 1, ["Kubernetes"])
+    assert "POINTS À APPROFONDIR" in prompt and "- Kubernetes" in prompt
+
+
+def test_simulator_joins_pregeneration_in_flight(speculation):
+    service, models = speculation
+
+    async def run():
+        task = interview_service.schedule_question_pregeneration("Offre", "CV", ITEMS)
+        # Laisse la tâche démarrer son appel Gemini avant l'ouverture du simulateur
+        await asyncio.sleep(0)
+        questions = await service.generate_interview_questions_async("CV", "Offre", 1)
+        await task
+        return questions
+
+    assert asyncio.run(run()) == QUESTIONS
+    assert models.calls == 1
+
+
+def test_pregeneration_waits_for_spare_capacity(speculation, monkeypatch):
+    _, models = speculation
+    monkeypatch.setattr(settings, "SPECULATIVE_START_TIMEOUT", 0.0)
+    monkeypatch.setattr(llm_limiter, "in_flight", llm_limiter.limit)
+
+    async def run():
+        await interview_service.schedule_question_pregeneration("Offre", "CV", ITEMS)
+
+    asyncio.run(run())
+    assert models.calls == 0
+    assert interview_service.speculation_stats()["abandoned"] >= 1
@@ -1,5 +1,9 @@
+import json
+from unittest.mock import patch
 from uuid import UUID
 
+from sqlalchemy import select
+
 from app.models.interview_record import InterviewRecord
 
 
@@ -70,3 +74,62 @@ def test_list_and_get_interview(client, auth_headers, db_session, registered_use
 def test_interviews_require_auth(client):
     response = client.get("/api/interviews")
     assert response.status_code in (401, 403)
+
+
+async def fake_analysis_stream(questions, answers, cv_text, job_text):
+    yield {"type": "field", "field": "score_global", "value": 7}
+    yield {"type": "entry", "field": "points_forts", "item": "Clarté"}
+    yield {
+        "type": "analysis",
+        "analysis": {
+            "score_global": 7,
+            "points_forts": ["Clarté"],
+            "points_amelioration": [],
+            "suggestions": [],
+            "conseils_specifiques": [],
+        },
+    }
+
+
+def test_analyze_responses_stream_persists_interview(
+    client, auth_headers, db_session, registered_user
+):
+    with patch(
+        "app.services.interview_service.ai_service.stream_interview_analysis",
+        new=fake_analysis_stream,
+    ):
+        with client.stream(
+            "POST",
+            "/api/interview/analyze-responses-stream",
+            headers=auth_headers,
+            data={
+                "questions": json.dumps([{"text": "Pourquoi nous ?", "category": "Motivation"}]),
+                "answers": json.dumps([{"answer": "Votre produit."}]),
+                "cv_text": "CV Python",
+                "job_text": "Offre Python",
+                "duration_seconds": "90",
+            },
+        ) as response:
+            assert response.status_code == 200
+            events = [
+                json.loads(line[len("data: "):])
+                for line in response.iter_lines()
+                if line.startswith("data: ")
+            ]
+
+    assert [e["type"] for e in events] == ["job", "status", "field", "entry", "analysis", "complete"]
+    interview_id = events[-1]["interview_id"]
+
+    status = client.get(f"/api/jobs/{events[0]['job_id']}", headers=auth_headers).json()
+    assert status["status"] == "done"
+
+    # Écrit avant l'envoi de l'identifiant : aucune attente de la file
+    db_session.expire_all()
+    record = db_session.scalars(
+        select(InterviewRecord).where(
+            InterviewRecord.user_id == UUID(registered_user["user"]["id"])
+        )
+    ).one()
+    assert str(record.id) == interview_id
+    assert record.analysis["score_global"] == 7
+    assert record.analysis["usage"]["calls"] == 0
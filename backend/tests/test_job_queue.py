@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services import job_queue
+from app.services.redis_service import redis_service
+
+
+class FakeRedis:
+    """Sous-ensemble de redis-py utilisé par la file de jobs."""
+
+    def __init__(self):
+        self.values = {}
+        self.queue = []
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def scan_iter(self, pattern):
+        prefix = pattern.rstrip("*")
+        return [key for key in self.values if key.startswith(prefix)]
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def llen(self, key):
+        return len(self.queue)
+
+
+@pytest.fixture
+def redis_queue(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(settings, "JOB_QUEUE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "JOB_QUEUE_MAX_BACKLOG_PER_SLOT", 1.0)
+    monkeypatch.setattr(redis_service, "redis_available", True)
+    monkeypatch.setattr(redis_service, "redis_client", fake)
+    return fake
+
+
+def test_admission_follows_the_worker_backlog(redis_queue):
+    job_queue.publish_worker_state(concurrency=2, running=2)
+    assert [w["running"] for w in job_queue.job_queue_stats()["workers"]] == [2]
+
+    redis_queue.queue = ["job"]
+    asyncio.run(job_queue.ensure_job_capacity())
+
+    redis_queue.queue = ["job", "job"]
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(job_queue.ensure_job_capacity())
+    assert exc_info.value.status_code == 503
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+
+def test_no_live_worker_rejects_queued_jobs(redis_queue):
+    job_queue.publish_worker_state(concurrency=2, running=0)
+    job_queue.forget_worker_state()
+
+    with pytest.raises(HTTPException):
+        asyncio.run(job_queue.ensure_job_capacity())
+    assert job_queue.worker_states() == []
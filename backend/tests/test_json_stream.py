@@ -0,0 +1,69 @@
+from app.utils.json_stream import JsonArrayStreamParser, JsonObjectStreamParser
+
+
+DOCUMENT = '{"items": [{"offerText": "C++ {avancé}", "tags": ["a", "]"]}, {"offerText": "Go \\"1.22\\""}]}'
+
+
+def feed_in_chunks(parser, text, size):
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start : start + size]))
+    return elements
+
+
+def test_items_are_emitted_whatever_the_chunking():
+    for size in (1, 3, 11, len(DOCUMENT)):
+        parser = JsonArrayStreamParser("items")
+        elements = feed_in_chunks(parser, DOCUMENT, size)
+        assert [e["offerText"] for e in elements] == ["C++ {avancé}", 'Go "1.22"']
+        assert parser.done
+
+
+def test_item_is_emitted_as_soon_as_it_closes():
+    parser = JsonArrayStreamParser("items")
+    assert parser.feed('{"items": [{"offerText": "A"}, {"offer') == [{"offerText": "A"}]
+    assert parser.feed('Text": "B"}]}') == [{"offerText": "B"}]
+
+
+def test_top_level_array_is_supported():
+    parser = JsonArrayStreamParser("questions")
+    assert parser.feed('[{"text": "Q1"}, {"text": "Q2"}]') == [{"text": "Q1"}, {"text": "Q2"}]
+
+
+ANALYSIS = (
+    '{"score_global": 7, "points_forts": ["Clair", "Précis \\"chiffré\\""], '
+    '"suggestions": [{"titre": "STAR", "priorite": "haute"}], "conseils_specifiques": []}'
+)
+
+
+def test_object_members_and_array_elements_whatever_the_chunking():
+    for size in (1, 4, 13, len(ANALYSIS)):
+        parser = JsonObjectStreamParser()
+        members = feed_in_chunks(parser, ANALYSIS, size)
+        assert members == [
+            ("score_global", 7, False),
+            ("points_forts", "Clair", True),
+            ("points_forts", 'Précis "chiffré"', True),
+            ("suggestions", {"titre": "STAR", "priorite": "haute"}, True),
+        ]
+        assert parser.done
+
+
+def test_number_is_not_emitted_before_its_delimiter():
+    parser = JsonObjectStreamParser()
+    assert parser.feed('{"score_global": 1') == []
+    assert parser.feed('0, "points_forts": ["A"') == [
+        ("score_global", 10, False),
+        ("points_forts", "A", True),
+    ]
+
+
+def test_float_split_after_its_decimal_point():
+    parser = JsonObjectStreamParser()
+    assert parser.feed('{"score_global": 7.') == []
+    assert parser.feed('5, "points_forts": ["a"') == [
+        ("score_global", 7.5, False),
+        ("points_forts", "a", True),
+    ]
+    assert parser.feed(', "b"]}') == [("points_forts", "b", True)]
+    assert parser.done
@@ -0,0 +1,110 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from app.services import comparison_service
+from app.services.lexical_engine import compare_locally, extract_requirements
+
+
+OFFER = """Développeur backend Python (H/F)
+Nous sommes une startup en forte croissance.
+- Maîtrise de Python et FastAPI
+- Expérience avec PostgreSQL
+- Connaissance de Docker et Kubernetes
+- 3 ans d'expérience minimum
+Avantages : tickets restaurant, mutuelle.
+"""
+
+CV = """Jean Dupont — Développeur Python
+Expériences : API REST avec FastAPI et PostgreSQL, 4 ans d'expérience.
+Compétences : Python, SQL, Git.
+"""
+
+
+def test_extract_requirements_skips_boilerplate():
+    requirements = extract_requirements(OFFER)
+    assert "Maîtrise de Python et FastAPI" in requirements
+    assert not any("tickets restaurant" in r for r in requirements)
+
+
+def test_compare_locally_returns_comparison_shape():
+    result = compare_locally(OFFER, CV)
+    by_text = {item["offerText"]: item for item in result["items"]}
+
+    assert by_text["Maîtrise de Python et FastAPI"]["status"] == "match"
+    assert by_text["Connaissance de Docker et Kubernetes"]["status"] == "missing"
+    assert by_text["Connaissance de Docker et Kubernetes"]["suggestions"]
+    assert result["summary"]["engine"] == "lexical"
+    assert result["summary"]["totalItems"] == len(result["items"])
+
+
+def _events(body: list[str]) -> list[dict]:
+    return [json.loads(frame[len("data: "):]) for frame in body]
+
+
+async def _collect(**kwargs) -> list[dict]:
+    return _events(
+        [frame async for frame in comparison_service.stream_comparison(OFFER, CV, **kwargs)]
+    )
+
+
+def test_stream_falls_back_to_lexical_engine_when_llm_times_out():
+    async def slow_stream(offer_text, cv_text):
+        raise asyncio.TimeoutError()
+        yield  # pragma: no cover
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=slow_stream,
+    ):
+        events = asyncio.run(_collect())
+
+    types = [e["type"] for e in events]
+    assert "error" not in types
+    assert types[-1] == "complete"
+    assert any("indisponible" in e.get("message", "") for e in events if e["type"] == "status")
+    summary = next(e["summary"] for e in events if e["type"] == "summary")
+    assert summary["engine"] == "lexical"
+
+
+def test_stream_fast_mode_never_calls_llm():
+    async def forbidden(offer_text, cv_text):
+        raise AssertionError("Gemini ne doit pas être appelé en mode fast")
+        yield  # pragma: no cover
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=forbidden,
+    ):
+        events = asyncio.run(_collect(mode="fast"))
+
+    assert events[-1]["type"] == "complete"
+    assert any(e["type"] == "item" for e in events)
+
+
+def test_stream_surfaces_non_availability_errors():
+    async def broken(offer_text, cv_text):
+        raise ValueError("Réponse IA invalide")
+        yield  # pragma: no cover
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=broken,
+    ):
+        events = asyncio.run(_collect())
+
+    assert events[-1] == {"type": "error", "message": "Réponse IA invalide"}
+
+
+def test_stream_combines_available_items_in_one_frame(monkeypatch):
+    monkeypatch.setattr(comparison_service.settings, "SSE_COMBINED_ITEMS", True)
+
+    events = asyncio.run(_collect(mode="fast"))
+
+    batches = [e for e in events if e["type"] == "items"]
+    assert len(batches) == 1
+    assert not any(e["type"] == "item" for e in events)
+    count = len(compare_locally(OFFER, CV)["items"])
+    assert len(batches[0]["items"]) == count
+    assert batches[0]["progress"]["current"] == count
+    assert events[-1]["type"] == "complete"
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_limiter import LLMLimiter, LLMOverloadedError
+
+
+def test_limiter_queues_then_rejects_when_queue_is_full():
+    async def scenario():
+        limiter = LLMLimiter(limit=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+
+        with pytest.raises(LLMOverloadedError) as exc_info:
+            limiter.check_admission()
+        assert exc_info.value.retry_after >= 1
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 0
+        stats = limiter.stats()
+        assert stats["rejected"] == 1
+        assert stats["admitted"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_limiter_queue_timeout_raises_overloaded():
+    async def scenario():
+        limiter = LLMLimiter(limit=1, max_queue=5, queue_timeout=0.01)
+        async with limiter.slot():
+            with pytest.raises(LLMOverloadedError):
+                await limiter.acquire()
+        assert limiter.in_flight == 0
+        assert limiter.stats()["queue_timeouts"] == 1
+
+    asyncio.run(scenario())
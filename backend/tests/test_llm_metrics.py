@@ -0,0 +1,59 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.services.cache_service import interview_questions_cache
+from app.services.llm_metrics import Histogram, collect_llm_calls, llm_metrics
+from app.services.model_router import model_router
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = Histogram((10, 100, 1000))
+    for value in (5, 50, 60, 70, 500):
+        histogram.record(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["p50"] == 100
+    assert snapshot["p99"] == 1000
+    assert snapshot["max"] == 500
+
+
+class UsageModels:
+    async def generate_content(self, **kwargs):
+        return SimpleNamespace(
+            text=json.dumps([{"text": "Pourquoi nous ?", "category": "Motivation"}]),
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=1200, candidates_token_count=80, thoughts_token_count=20
+            ),
+        )
+
+
+def test_calls_are_recorded_per_use_case_and_collected(make_service):
+    llm_metrics.reset()
+    interview_questions_cache.clear()
+    model_router.reset()
+    service, _ = make_service(models=UsageModels())
+
+    async def run():
+        with collect_llm_calls() as calls:
+            await service.generate_interview_questions_async("CV", "Offre", 1)
+        return calls
+
+    calls = asyncio.run(run())
+    assert len(calls) == 1
+    assert calls[0].use_case == "questions"
+    assert calls[0].prompt_tokens == 1200
+    assert calls[0].output_tokens == 100
+    assert calls[0].cost_usd > 0
+
+    series = llm_metrics.snapshot()["series"]
+    assert series[0]["use_case"] == "questions"
+    assert series[0]["model"] == "test-model"
+    assert series[0]["prompt_tokens_total"] == 1200
+    assert series[0]["wall_ms"]["count"] == 1
+
+
+def test_llm_metrics_endpoint(client):
+    response = client.get("/api/health/llm/metrics")
+    assert response.status_code == 200
+    assert "series" in response.json()
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from google.genai import errors as genai_errors
+
+from app.config import settings
+from app.services import llm_resilience
+from app.services.llm_limiter import llm_limiter
+from app.services.llm_resilience import CircuitBreaker, CircuitOpenError, resilient_call
+
+
+def quota_error():
+    return genai_errors.ClientError(429, {"error": {"code": 429, "message": "quota"}})
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    fresh = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+    monkeypatch.setattr(llm_resilience, "circuit_breaker", fresh)
+    monkeypatch.setattr(llm_resilience, "latency_tracker", llm_resilience.LatencyTracker())
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    original_limit = llm_limiter.limit
+    yield fresh
+    llm_limiter.set_limit(original_limit)
+
+
+def test_retries_transient_errors_then_succeeds(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            raise genai_errors.ServerError(503, {"error": {"message": "unavailable"}})
+        return "ok"
+
+    assert asyncio.run(resilient_call(attempt)) == "ok"
+    assert len(calls) == 2
+    assert breaker.state == "closed"
+
+
+def test_client_errors_are_not_retried(breaker):
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        raise genai_errors.ClientError(400, {"error": {"message": "bad request"}})
+
+    with pytest.raises(genai_errors.ClientError):
+        asyncio.run(resilient_call(attempt))
+    assert len(calls) == 1
+    assert breaker.consecutive_failures == 0
+
+
+def test_quota_errors_halve_limit_and_open_circuit(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 5)
+    llm_limiter.set_limit(8)
+
+    async def attempt(timeout):
+        raise quota_error()
+
+    # 2 échecs consécutifs : circuit ouvert, l'appel suivant est refusé
+    with pytest.raises(CircuitOpenError) as exc_info:
+        asyncio.run(resilient_call(attempt))
+    assert exc_info.value.retry_after >= 1
+    assert breaker.state == "open"
+    assert llm_limiter.limit == 2
+
+    async def never_called(timeout):
+        raise AssertionError("appel bloqué par le disjoncteur")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(resilient_call(never_called))
+
+
+def test_half_open_probe_closes_circuit_and_limit_grows_back(breaker, monkeypatch):
+    llm_limiter.set_limit(1)
+    breaker.state = "open"
+    breaker.opened_at = 0.0  # refroidissement écoulé
+
+    async def attempt(timeout):
+        return "ok"
+
+    assert asyncio.run(resilient_call(attempt)) == "ok"
+    assert breaker.state == "closed"
+    # Additive increase : +1 après `limit` succès
+    assert llm_limiter.limit == 2
+
+
+def test_hedged_request_wins_when_primary_is_slow(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    for _ in range(30):
+        llm_resilience.latency_tracker.record(0.01)
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+            return "lent"
+        return "rapide"
+
+    hedges_before = llm_resilience.resilience_counters["hedge_wins"]
+    assert asyncio.run(resilient_call(attempt)) == "rapide"
+    assert llm_resilience.resilience_counters["hedge_wins"] == hedges_before + 1
+
+
+def test_llm_health_exports_breaker_state(client):
+    response = client.get("/api/health/llm")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["resilience"]["circuit"]["state"] in {"closed", "open", "half_open"}
+    assert "retries" in data["resilience"]
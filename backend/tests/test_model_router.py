@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.cache_service import comparison_cache
+from app.services.model_router import FREE_TIER, model_router, routing_tier
+
+PRIMARY = "primary-model"
+FAST = "fast-model"
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_FAST_MODEL", FAST)
+    monkeypatch.setattr(settings, "MODEL_ROUTING_ENABLED", True)
+    monkeypatch.setattr(settings, "MODEL_ROUTING_MIN_SAMPLES", 5)
+    model_router.reset()
+    yield model_router
+    model_router.reset()
+
+
+def test_free_trial_runs_on_fast_tier(router):
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == PRIMARY
+    with routing_tier(FREE_TIER):
+        assert router.choose("compare", PRIMARY, input_tokens=2000) == FAST
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == PRIMARY
+
+
+def test_errors_on_primary_reroute_to_fast_tier(router):
+    for ok in (True, False, False, True, False):
+        router.record(PRIMARY, "compare", 2.0, 2000, ok)
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == FAST
+    assert router.stats()["rerouted"] == 1
+
+
+def test_latency_budget_depends_on_input_size(router, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_LATENCY_BUDGETS", {"questions": 20.0})
+    # ~5 s par millier de tokens d'entrée sur le modèle principal
+    for _ in range(5):
+        router.record(PRIMARY, "questions", 10.0, 2000, True)
+    assert router.choose("questions", PRIMARY, input_tokens=2000) == PRIMARY
+    assert router.choose("questions", PRIMARY, input_tokens=8000) == FAST
+    # Autre cas d'usage sans historique : modèle principal
+    assert router.choose("analysis", PRIMARY, input_tokens=8000) == PRIMARY
+
+
+def test_degraded_alternative_keeps_preferred_tier(router):
+    for model in (PRIMARY, FAST):
+        for _ in range(5):
+            router.record(model, "compare", 1.0, 2000, False)
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == PRIMARY
+
+
+def test_free_trial_results_are_cached_separately(router, make_service):
+    service, _ = make_service()
+    standard_key = service.comparison_cache_key("Offre", "CV")
+    with routing_tier(FREE_TIER):
+        assert service.comparison_cache_key("Offre", "CV") != standard_key
+
+
+def test_degraded_primary_recovers_once_samples_expire(router, monkeypatch):
+    for _ in range(5):
+        router.record(PRIMARY, "compare", 1.0, 2000, False)
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == FAST
+
+    monkeypatch.setattr(settings, "MODEL_HEALTH_WINDOW_SECONDS", 0.0)
+    assert router.choose("compare", PRIMARY, input_tokens=2000) == PRIMARY
+    assert router.stats()["models"][PRIMARY]["error_rate"] is None
+
+
+def test_rerouted_results_are_not_cached(router, make_service):
+    comparison_cache.clear()
+    for _ in range(5):
+        router.record("test-model", "compare", 1.0, 2000, False)
+    service, models = make_service()
+
+    asyncio.run(service.compare_offer_and_cv_async("Offre", "CV"))
+    assert router.stats()["rerouted"] >= 1
+    assert comparison_cache.get(service.comparison_cache_key("Offre", "CV")) is None
+
+
+def test_unrelated_reroute_does_not_block_caching(router, make_service):
+    comparison_cache.clear()
+    service, models = make_service()
+    generate = models.generate_content
+
+    async def rerouted_elsewhere(**kwargs):
+        # Une autre requête bascule pendant cet appel, resté sur le modèle principal
+        router.rerouted += 1
+        return await generate(**kwargs)
+
+    models.generate_content = rerouted_elsewhere
+    asyncio.run(service.compare_offer_and_cv_async("Offre", "CV"))
+    assert comparison_cache.get(service.comparison_cache_key("Offre", "CV")) is not None
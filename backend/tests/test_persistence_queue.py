@@ -0,0 +1,86 @@
+from uuid import UUID
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.models.comparison_record import ComparisonRecord
+from app.models.interview_record import InterviewRecord
+from app.services.persistence_queue import PersistenceQueue
+
+SUMMARY = {"totalItems": 1, "matches": 1, "matchPercentage": 100.0}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(settings, "PERSIST_RETRY_BASE_DELAY", 0.0)
+    # Pas de thread d'écriture : les tests vident la file explicitement
+    monkeypatch.setattr(PersistenceQueue, "_ensure_writer", lambda self: None)
+    return PersistenceQueue()
+
+
+def _comparison(user_id):
+    return ComparisonRecord.from_analysis(
+        user_id=user_id, offer_text="Offre", cv_text="CV", items=[], summary=SUMMARY
+    )
+
+
+def _interview(user_id):
+    return InterviewRecord.from_session(
+        user_id=user_id, job_text="Offre", cv_text="CV", questions=[], answers=[],
+        analysis={"score_global": 6},
+    )
+
+
+def test_records_are_written_in_one_batch(queue, db_session, registered_user):
+    user_id = UUID(registered_user["user"]["id"])
+    ids = [queue.enqueue(_comparison(user_id)) for _ in range(3)]
+    interview_id = queue.enqueue(_interview(user_id))
+    assert queue.stats()["pending"] == 4
+
+    queue.flush()
+
+    assert queue.stats()["batches"] == 1
+    db_session.expire_all()
+    stored = db_session.scalars(select(ComparisonRecord.id)).all()
+    assert sorted(str(i) for i in stored) == sorted(ids)
+    assert str(db_session.scalars(select(InterviewRecord.id)).one()) == interview_id
+
+
+def test_batch_is_retried_while_database_is_unavailable(queue, db_session, registered_user):
+    original = queue._insert
+    failures = []
+
+    def flaky(batch):
+        if len(failures) < 2:
+            failures.append(1)
+            raise OperationalError("INSERT", {}, Exception("connexion refusée"))
+        original(batch)
+
+    queue._insert = flaky
+    queue.enqueue(_comparison(UUID(registered_user["user"]["id"])))
+    queue.flush()
+
+    assert queue.stats()["retries"] == 2
+    assert queue.stats()["written"] == 1
+
+
+def test_full_buffer_drops_instead_of_writing_inline(queue, db_session, registered_user, monkeypatch):
+    monkeypatch.setattr(settings, "PERSIST_QUEUE_MAX_SIZE", 1)
+    user_id = UUID(registered_user["user"]["id"])
+    assert queue.enqueue(_comparison(user_id)) is not None
+    # Aucun identifiant pour une ligne qui n'existera jamais
+    assert queue.enqueue(_comparison(user_id)) is None
+
+    stats = queue.stats()
+    assert stats["pending"] == 1 and stats["overflow"] == 1 and stats["written"] == 0
+    queue.flush()
+    assert queue.stats()["written"] == 1
+
+def test_write_commits_before_returning_the_id(queue, db_session, registered_user):
+    interview_id = queue.write(_interview(UUID(registered_user["user"]["id"])))
+
+    assert queue.stats()["pending"] == 0
+    db_session.expire_all()
+    assert str(db_session.scalars(select(InterviewRecord.id)).one()) == interview_id
@@ -0,0 +1,49 @@
+from app.utils.prompt_compression import compress_document
+from app.utils.text_tokens import estimate_tokens
+
+
+CV = """JEAN DUPONT
+jean.dupont@mail.fr | 06 12 34 56 78 | linkedin.com/in/jdupont
+Développeur backend
+
+EXPÉRIENCES
+2021-2024 : Développeur Python chez Acme, API FastAPI, PostgreSQL, Docker.
+2018-2021 : Développeur PHP chez Foo, Symfony, MySQL.
+
+CENTRES D'INTÉRÊT
+Escalade, photographie, cuisine japonaise, voyages en Asie du Sud-Est.
+
+Page 1/2
+JEAN DUPONT
+J'autorise le traitement de mes données personnelles conformément au RGPD.
+"""
+
+OFFER = "Développeur Python FastAPI, PostgreSQL et Docker."
+
+
+def test_compress_drops_boilerplate_and_duplicates():
+    cleaned = compress_document(CV, OFFER, budget_tokens=1000)
+    assert "@" not in cleaned
+    assert "RGPD" not in cleaned
+    assert "Page 1/2" not in cleaned
+    assert cleaned.count("JEAN DUPONT") == 1
+    assert compress_document(cleaned, OFFER, budget_tokens=1000) == cleaned
+
+
+def test_compress_keeps_relevant_sections_within_budget():
+    compressed = compress_document(CV, OFFER, budget_tokens=40)
+    assert estimate_tokens(compressed) <= 40
+    assert "Développeur Python chez Acme" in compressed
+    assert "Escalade" not in compressed
+
+
+def test_compress_returns_short_documents_untouched():
+    assert compress_document("Python, SQL", OFFER, budget_tokens=100) == "Python, SQL"
+
+
+def test_compress_splits_unstructured_text_into_sections():
+    text = " ".join(f"Projet {i} réalisé en cobol sur mainframe." for i in range(200))
+    text += " Projet majeur en Python avec FastAPI et Docker."
+    compressed = compress_document(text, OFFER, budget_tokens=200)
+    assert estimate_tokens(compressed) <= 200
+    assert "Python avec FastAPI" in compressed
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.services import comparison_service, stream_jobs
+from app.services.comparison_service import SSE_HEARTBEAT, stream_comparison
+from app.services.llm_metrics import collect_llm_calls, llm_metrics, record_llm_call
+from app.services.redis_service import redis_service
+
+ITEM = {"id": "1", "offerText": "Python", "status": "match"}
+
+
+@pytest.fixture
+def fast_timers(monkeypatch):
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "JOB_ORPHAN_GRACE_SECONDS", 0.05)
+
+
+async def slow_stream(offer_text, cv_text):
+    await asyncio.sleep(0.05)
+    yield {"type": "item", "item": ITEM}
+    yield {"type": "summary", "summary": {"totalItems": 1}}
+
+
+async def endless_stream(offer_text, cv_text):
+    await asyncio.Event().wait()
+    yield  # pragma: no cover
+
+
+def test_heartbeats_are_sent_but_not_journaled(fast_timers):
+    async def run():
+        frames = [frame async for frame in stream_comparison("Offre lente", "CV")]
+        job = stream_jobs.start_job("user", stream_comparison("Offre lente", "CV bis"))
+        await job.task
+        return frames, [frame for _, frame in job.frames]
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=slow_stream,
+    ):
+        frames, journaled = asyncio.run(run())
+
+    assert SSE_HEARTBEAT in frames
+    assert frames[-1].endswith(b'"complete"}\n\n')
+    assert SSE_HEARTBEAT not in journaled
+
+
+def test_orphaned_job_cancels_model_call(fast_timers):
+    cancelled_flights = comparison_service.flight_stats["cancelled"]
+    orphaned = stream_jobs.job_stats["orphaned"]
+
+    async def run():
+        job = stream_jobs.start_job("user", stream_comparison("Offre orpheline", "CV"))
+        follower = job.follow()
+        await anext(follower)
+        await follower.aclose()  # onglet fermé
+        with pytest.raises(asyncio.CancelledError):
+            await job.task
+        return job
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=endless_stream,
+    ):
+        job = asyncio.run(run())
+
+    assert job.status == "cancelled"
+    assert stream_jobs.job_stats["orphaned"] == orphaned + 1
+    assert comparison_service.flight_stats["cancelled"] == cancelled_flights + 1
+
+
+def test_reconnect_within_grace_keeps_job(fast_timers):
+    async def run():
+        job = stream_jobs.start_job("user", stream_comparison("Offre reprise", "CV"))
+        follower = job.follow()
+        await anext(follower)
+        await follower.aclose()
+        # Reprise avant la fin du délai de grâce
+        frames = [frame async for frame in job.follow(after=1)]
+        return job, frames
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=slow_stream,
+    ):
+        job, frames = asyncio.run(run())
+
+    assert job.status == "done"
+    assert frames[-1].endswith(b'"complete"}\n\n')
+
+
+class FakePipeline:
+    """Pipeline redis-py : enregistre les écritures et le thread qui les envoie."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append(("set", key))
+
+    def hset(self, key, mapping):
+        self.commands.append(("hset", mapping["status"]))
+
+    def expire(self, key, ttl):
+        pass
+
+    def xadd(self, key, fields, id, maxlen, approximate):
+        self.commands.append(("xadd", id, "end" in fields))
+
+    def execute(self):
+        self.redis.threads.add(threading.get_ident())
+        self.redis.commands.extend(self.commands)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.commands = []
+        self.threads = set()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def test_journal_writes_are_batched_off_the_event_loop(fast_timers, monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis_available", True)
+    monkeypatch.setattr(redis_service, "redis_client", fake)
+
+    async def run():
+        job = stream_jobs.start_job("user", stream_comparison("Offre journalisée", "CV"))
+        # Rien n'est écrit de façon synchrone pendant append
+        assert fake.commands == []
+        await job.task
+        return job
+
+    with patch(
+        "app.services.comparison_service.ai_service.stream_compare_offer_and_cv",
+        new=slow_stream,
+    ):
+        job = asyncio.run(run())
+
+    assert threading.get_ident() not in fake.threads
+    events = [command for command in fake.commands if command[0] == "xadd"]
+    assert [command[1] for command in events] == [f"{n}-0" for n in range(1, len(events) + 1)]
+    assert events[-1][2] and len(events) == job.last_id + 1
+    assert ("hset", "done") in fake.commands
+
+
+def test_cancelled_calls_are_counted_apart_from_errors():
+    llm_metrics.reset()
+    with collect_llm_calls() as calls:
+        record_llm_call(
+            use_case="compare", model="m", started=0.0, first_byte_at=None,
+            error=asyncio.CancelledError(),
+        )
+    series = llm_metrics.snapshot()["series"][0]
+    assert series["cancelled"] == 1 and series["errors"] == 0
+    assert calls[0].cancelled and calls[0].error is None
@@ -179,6 +179,8 @@ export async function deleteInterview(id: string) {
   return data
 }
 
+const STREAM_RESUME_ATTEMPTS = 3;
+
 export async function streamCompare(
   offerText: string,
   cvText: string,
@@ -189,10 +191,23 @@ export async function streamCompare(
   onComplete: () => void,
   onError: (error: string) => void
 ) {
-  try {
-    const token = getAccessToken();
+  // Identifiant du job et dernière trame reçue : reprise si la connexion tombe
+  let jobId: string | null = null;
+  let lastEventId = 0;
+  let finished = false;
 
-    const response = await fetch(`${getApiBaseURL()}/compare-stream`, {
+  const openStream = (): Promise<Response> => {
+    const token = getAccessToken();
+    if (jobId) {
+      return fetch(`${getApiBaseURL()}/compare-stream/${jobId}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+          Accept: "text/event-stream",
+          "Last-Event-ID": String(lastEventId),
+        },
+      });
+    }
+    return fetch(`${getApiBaseURL()}/compare-stream`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -204,60 +219,87 @@ export async function streamCompare(
         cv_text: cvText,
       }),
     });
+  };
 
-    if (!response.ok) {
-      throw new Error(`HTTP error! status: ${response.status}`);
-    }
-
-    const reader = response.body?.getReader();
-    if (!reader) {
-      throw new Error("Impossible de lire la réponse");
-    }
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await openStream();
 
-    const decoder = new TextDecoder();
-    let buffer = "";
-
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
-
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split("\n");
-      buffer = lines.pop() || ""; 
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
 
-      for (const line of lines) {
-        if (line.startsWith("data: ")) {
-          try {
-            const data = JSON.parse(line.slice(6));
+      const reader = response.body?.getReader();
+      if (!reader) {
+        throw new Error("Impossible de lire la réponse");
+      }
 
-            switch (data.type) {
-              case "status":
-                onStatus(data.message);
-                break;
-              case "progress":
-                onProgress(data.value, data.current, data.total);
-                break;
-              case "item":
-                onItem(data.item);
-                break;
-              case "summary":
-                onSummary(data.summary);
-                break;
-              case "complete":
-                onComplete();
-                break;
-              case "error":
-                onError(data.message);
-                break;
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() || "";
+
+        for (const line of lines) {
+          if (line.startsWith("id: ")) {
+            lastEventId = Number(line.slice(4)) || lastEventId;
+          } else if (line.startsWith("data: ")) {
+            try {
+              const data = JSON.parse(line.slice(6));
+
+              switch (data.type) {
+                case "job":
+                  jobId = data.job_id;
+                  break;
+                case "status":
+                  onStatus(data.message);
+                  break;
+                case "progress":
+                  onProgress(data.value, data.current, data.total);
+                  break;
+                case "item":
+                  onItem(data.item);
+                  break;
+                case "items":
+                  onProgress(data.progress.value, data.progress.current, data.progress.total);
+                  data.items.forEach((item: any) => onItem(item));
+                  break;
+                case "summary":
+                  onSummary(data.summary);
+                  break;
+                case "complete":
+                  finished = true;
+                  onComplete();
+                  break;
+                case "error":
+                  finished = true;
+                  onError(data.message);
+                  break;
+              }
+            } catch (e) {
+              console.error("Erreur parsing SSE:", e);
             }
-          } catch (e) {
-            console.error("Erreur parsing SSE:", e);
           }
         }
       }
+      if (finished || !jobId || attempt >= STREAM_RESUME_ATTEMPTS) {
+        if (!finished) onError("Connexion interrompue pendant l'analyse");
+        return;
+      }
+    } catch (error: any) {
+      if (finished) return;
+      if (!jobId || attempt >= STREAM_RESUME_ATTEMPTS) {
+        onError(error.message || "Erreur lors de la comparaison");
+        return;
+      }
     }
-  } catch (error: any) {
-    onError(error.message || "Erreur lors de la comparaison");
+    // Reprise du même job : pas de nouvel appel Gemini
+    await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
   }
 }
 
@@ -322,6 +364,10 @@ export async function streamFreeCompare(
               case "item":
                 onItem(data.item);
                 break;
+              case "items":
+                onProgress(data.progress.value, data.progress.current, data.progress.total);
+                data.items.forEach((item: any) => onItem(item));
+                break;
               case "summary":
                 onSummary(data.summary);
                 break;
@@ -440,13 +486,16 @@ export async function uploadFreeCV(file: File): Promise<{ success: boolean; text
 export async function generateInterviewQuestions(
   cvFile: File,
   jobText: string,
-  numQuestions: number = 5
+  numQuestions: number = 5,
+  regenerate: boolean = false
 ): Promise<{ success: boolean; interview_session?: any; message: string }> {
   try {
     const formData = new FormData();
     formData.append('cv_file', cvFile);
     formData.append('job_text', jobText);
     formData.append('num_questions', numQuestions.toString());
+    // Par défaut le backend réutilise les questions déjà générées pour ce CV / cette offre
+    formData.append('regenerate', regenerate.toString());
 
     const response = await api.post('/interview/generate-questions', formData, {
       headers: {